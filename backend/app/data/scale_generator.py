@@ -0,0 +1,541 @@
+"""
+Scalable Synthetic Data Generator
+Produces production-sized datasets with the same referential structure as
+``seed_database`` (requests -> bids -> contracts -> PRs -> POs -> invoices ->
+transactions / spend / leakage) for load and query-plan testing.
+
+One scale unit is roughly the demo seed: 100 sourcing requests and 150 PRs,
+with about 90 invoices. Units are split into shards, and every shard is
+generated by a worker process with its own deterministic seed. Workers write
+with Core executemany in large batches. Primary keys are assigned up front, so
+shards never need to read back ids. The same --seed, --scale and --as-of always
+produce the same rows.
+
+Usage (from backend/):
+    python -m app.data.scale_generator --scale 1000 --spend-per-invoice 100 --workers 8
+    python -m app.data.scale_generator --scale 10 --database-url sqlite:///./load.db
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import string
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from faker import Faker
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from app.data.mock_data_generator import (
+    BUSINESS_UNITS, CATEGORIES, COST_CENTERS, PAYMENT_TERMS, VENDOR_NAMES,
+    generate_kpi_metrics
+)
+from app.models.database import (
+    SQLALCHEMY_DATABASE_URL, Base, Contract, Invoice, InvoiceLineItem, KPIMetric, LeakageCase,
+    POLineItem, ProcurementTransaction, PurchaseOrder, PurchaseRequisition,
+    SourcingRequest, SpendRecord, SupplierBid, Vendor, configure_sqlite_pragmas
+)
+from app.models.migrations import run_migrations
+
+VENDORS_PER_UNIT = 30
+REQUESTS_PER_UNIT = 100
+PRS_PER_UNIT = 150
+TRANSACTIONS_PER_UNIT = 50
+UNITS_PER_SHARD = 10
+BATCH_SIZE = 20000
+POOL_SIZE = 500  # Faker values generated per worker and reused
+
+# Tables with pre-assigned keys; each run appends above the current MAX(id)
+OFFSET_MODELS = (Vendor, SourcingRequest, Contract, PurchaseRequisition, PurchaseOrder, Invoice)
+
+CATEGORY_NAMES = list(CATEGORIES.keys())
+
+LEAKAGE_TYPES = [
+    ("Rate Card Violation", "Invoiced rate exceeds contracted rate"),
+    ("Duplicate Invoice", "Same invoice submitted multiple times"),
+    ("Quantity Mismatch", "Invoiced quantity differs from PO quantity"),
+    ("Tax Calculation Error", "Incorrect tax rate applied"),
+    ("Pricing Discrepancy", "Unit price differs from contract"),
+    ("Scope Creep", "Services invoiced not in original scope")
+]
+
+GAP_DESCRIPTIONS = [
+    "Missing approval in procurement chain",
+    "Contract terms not validated before PO",
+    "Invoice processed without goods receipt",
+    "Unauthorized price change detected"
+]
+
+BOTTLENECK_STAGES = ["sourcing", "contracting", "pr_po_creation", "invoicing"]
+
+
+def create_generator_engine(database_url: str):
+    """Engine for bulk loading; SQLite waits out other workers' write locks"""
+    if make_url(database_url).get_backend_name() == "sqlite":
+        engine = create_engine(database_url, connect_args={"timeout": 600})
+        configure_sqlite_pragmas(engine)
+        return engine
+    return create_engine(database_url)
+
+
+class FakerPool:
+    """Small per-process pools of Faker output; Faker per row is the bottleneck at scale"""
+
+    def __init__(self, seed: int):
+        fake = Faker('en_IN')
+        fake.seed_instance(seed)
+        self.names = [fake.name() for _ in range(POOL_SIZE)]
+        self.emails = [fake.company_email() for _ in range(POOL_SIZE)]
+        self.phrases = [fake.catch_phrase() for _ in range(POOL_SIZE)]
+        self.sentences = [fake.sentence() for _ in range(POOL_SIZE)]
+        self.paragraphs = [fake.paragraph(nb_sentences=3) for _ in range(POOL_SIZE // 10)]
+        self.phones = [fake.phone_number() for _ in range(POOL_SIZE)]
+        self.addresses = [fake.address() for _ in range(POOL_SIZE)]
+        self.cities = [fake.city() for _ in range(POOL_SIZE)]
+        self.bbans = [fake.bban() for _ in range(POOL_SIZE)]
+
+
+def _bothify(rng: random.Random, pattern: str) -> str:
+    """Faker-style '?'/'#' placeholders filled from ``rng``"""
+    return "".join(
+        rng.choice(string.ascii_letters) if c == "?" else str(rng.randint(0, 9)) if c == "#" else c
+        for c in pattern
+    )
+
+
+def _between(rng: random.Random, start: datetime, end: datetime) -> datetime:
+    return start + timedelta(seconds=rng.randint(0, int((end - start).total_seconds())))
+
+
+def _fiscal(date: datetime):
+    return f"FY{(date.year % 100)}-{(date.year % 100) + 1}", f"Q{((date.month - 1) // 3) + 1}"
+
+
+class BatchWriter:
+    """Buffers rows per table and writes each full buffer in its own transaction"""
+
+    def __init__(self, engine, batch_size: int = BATCH_SIZE):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.buffers: Dict[type, List[dict]] = {}
+        self.counts = Counter()
+
+    def add(self, model, row: dict) -> None:
+        buffer = self.buffers.setdefault(model, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None) -> None:
+        for target in ([model] if model else list(self.buffers)):
+            rows = self.buffers.get(target)
+            if not rows:
+                continue
+            with self.engine.begin() as conn:
+                conn.execute(insert(target), rows)
+            self.counts[target.__tablename__] += len(rows)
+            self.buffers[target] = []
+
+
+def generate_vendors(writer: BatchWriter, rng: random.Random, pool: FakerPool, count: int, offset: int, as_of: datetime):
+    for i in range(count):
+        vendor_id = offset + i + 1
+        base_name = VENDOR_NAMES[i % len(VENDOR_NAMES)]
+        name = base_name if vendor_id <= len(VENDOR_NAMES) else f"{base_name} {vendor_id}"
+        writer.add(Vendor, {
+            "id": vendor_id,
+            "vendor_code": f"VND{str(vendor_id).zfill(5)}",
+            "vendor_name": name,
+            "legal_entity": name,
+            "contact_person": rng.choice(pool.names),
+            "contact_email": rng.choice(pool.emails),
+            "contact_phone": rng.choice(pool.phones),
+            "address": rng.choice(pool.addresses),
+            "city": rng.choice(pool.cities),
+            "state": rng.choice(["Karnataka", "Maharashtra", "Tamil Nadu", "Delhi", "Telangana"]),
+            "country": "India",
+            "bank_account_number": rng.choice(pool.bbans),
+            "bank_name": rng.choice(["HDFC Bank", "ICICI Bank", "SBI", "Axis Bank", "Kotak Mahindra"]),
+            "gstin": f"{rng.randint(10, 36)}{_bothify(rng, '?????####?')}",
+            "pan": _bothify(rng, '?????####?').upper(),
+            "onboarding_initiated_date": _between(rng, as_of - timedelta(days=730), as_of - timedelta(days=365)),
+            "vendor_activated_date": _between(rng, as_of - timedelta(days=365), as_of - timedelta(days=180)),
+            "compliance_status": rng.choice(["Compliant", "Compliant", "Compliant", "Under Review"]),
+            "risk_score": round(rng.uniform(20, 85), 2),
+            "performance_score": round(rng.uniform(50, 95), 2),
+            "categories": json.dumps(rng.sample(CATEGORY_NAMES, rng.randint(1, 3))),
+            "is_active": True
+        })
+    writer.flush()
+
+
+def generate_shard(task: dict) -> Counter:
+    """Generate and write every row for scale units [first_unit, first_unit + units)"""
+    rng = random.Random(f"{task['seed']}:{task['first_unit']}")
+    pool = FakerPool(rng.randint(0, 2 ** 31))
+    engine = create_generator_engine(task["database_url"])
+    writer = BatchWriter(engine, task["batch_size"])
+
+    offsets = task["offsets"]
+    vendor_ids = range(offsets["vendors"] + 1, offsets["vendors"] + task["vendor_count"] + 1)
+    as_of = task["as_of"]
+    year = as_of.year
+
+    for unit in range(task["first_unit"], task["first_unit"] + task["units"]):
+        # SAP Ariba: requests, bids and the contracts awarded from them
+        requests = []
+        for j in range(REQUESTS_PER_UNIT):
+            index = unit * REQUESTS_PER_UNIT + j + 1
+            category = rng.choice(CATEGORY_NAMES)
+            subcategory = rng.choice(CATEGORIES[category])
+            submitted = _between(rng, as_of - timedelta(days=540), as_of - timedelta(days=90))
+            approved = submitted + timedelta(days=rng.randint(1, 5))
+            sourcing_start = approved + timedelta(days=rng.randint(1, 3))
+            request = {
+                "id": offsets["sourcing_requests"] + index,
+                "ariba_id": f"ARB{year}{str(offsets['sourcing_requests'] + index).zfill(6)}",
+                "requirement_description": f"Procurement of {subcategory} - {rng.choice(pool.phrases)}",
+                "project_description": rng.choice(pool.paragraphs),
+                "category": category,
+                "subcategory": subcategory,
+                "business_unit": rng.choice(BUSINESS_UNITS),
+                "requestor_name": rng.choice(pool.names),
+                "requestor_email": rng.choice(pool.emails),
+                "estimated_value": round(rng.uniform(50000, 5000000), 2),
+                "currency": "INR",
+                "request_submitted_date": submitted,
+                "request_approved_date": approved,
+                "sourcing_event_start": sourcing_start,
+                "award_decision_date": sourcing_start + timedelta(days=rng.randint(7, 30)),
+                "awarded_vendor_id": rng.choice(vendor_ids),
+                "status": rng.choice(["Completed", "Completed", "Completed", "In Progress"])
+            }
+            writer.add(SourcingRequest, request)
+            requests.append((index, request))
+        writer.flush(SourcingRequest)
+
+        for _, req in requests:
+            for k, vendor_id in enumerate(rng.sample(vendor_ids, rng.randint(2, 5))):
+                writer.add(SupplierBid, {
+                    "bid_id": f"BID{req['ariba_id'][3:]}-{k + 1}",
+                    "sourcing_request_id": req["id"],
+                    "vendor_id": vendor_id,
+                    "bid_amount": round(req["estimated_value"] * rng.uniform(0.85, 1.15), 2),
+                    "technical_score": round(rng.uniform(60, 100), 2),
+                    "delivery_timeline_days": rng.randint(7, 60),
+                    "bid_submitted_date": req["sourcing_event_start"] + timedelta(days=rng.randint(3, 14)),
+                    "is_compliant": rng.choice([True, True, True, False]),
+                    "notes": rng.choice(pool.sentences)
+                })
+
+        # Contract ids mirror request indexes, leaving gaps for requests still in progress
+        contracts = []
+        for index, req in requests:
+            if req["status"] != "Completed":
+                continue
+            drafted = req["award_decision_date"] + timedelta(days=rng.randint(1, 5))
+            executed = drafted + timedelta(days=rng.randint(3, 15))
+            rate_card = {"items": [
+                {"description": f"Service Type {i + 1}", "unit": rng.choice(["per hour", "per unit", "per month"]),
+                 "rate": round(rng.uniform(500, 50000), 2)}
+                for i in range(rng.randint(3, 8))
+            ]}
+            contract = {
+                "id": offsets["contracts"] + index,
+                "contract_id": f"CNT{year}{str(offsets['contracts'] + index).zfill(6)}",
+                "sourcing_request_id": req["id"],
+                "vendor_id": req["awarded_vendor_id"],
+                "contract_purpose": req["requirement_description"],
+                "contract_type": rng.choice(["MSA", "SOW", "Service Agreement"]),
+                "contract_value": round(req["estimated_value"] * rng.uniform(0.9, 1.1), 2),
+                "currency": "INR",
+                "payment_terms": rng.choice(PAYMENT_TERMS),
+                "contract_drafted_date": drafted,
+                "contract_executed_date": executed,
+                "start_date": executed,
+                "end_date": executed + timedelta(days=rng.choice([365, 730, 1095])),
+                "renewal_date": executed + timedelta(days=rng.choice([335, 700, 1065])),
+                "auto_renewal": rng.choice([True, False]),
+                "key_obligations": json.dumps([rng.choice(pool.sentences) for _ in range(3)]),
+                "rate_card": json.dumps(rate_card),
+                "status": "Active"
+            }
+            writer.add(Contract, contract)
+            contracts.append(contract)
+        writer.flush(SupplierBid)
+        writer.flush(Contract)
+        requests_by_id = {req["id"]: req for _, req in requests}
+
+        # Oracle Fusion: PRs and the POs raised from them (PO id == PR index)
+        orders = []
+        for j in range(PRS_PER_UNIT):
+            index = unit * PRS_PER_UNIT + j + 1
+            created = _between(rng, as_of - timedelta(days=360), as_of - timedelta(days=30))
+            pr = {
+                "id": offsets["purchase_requisitions"] + index,
+                "pr_number": f"PR{year}{str(offsets['purchase_requisitions'] + index).zfill(6)}",
+                "description": f"Requisition for {rng.choice(CATEGORY_NAMES)} - {rng.choice(pool.phrases)}",
+                "requestor_name": rng.choice(pool.names),
+                "business_unit": rng.choice(BUSINESS_UNITS),
+                "cost_center": rng.choice(COST_CENTERS),
+                "total_amount": round(rng.uniform(10000, 1000000), 2),
+                "currency": "INR",
+                "pr_created_date": created,
+                "pr_approved_date": created + timedelta(days=rng.randint(1, 3)),
+                "status": "Approved"
+            }
+            writer.add(PurchaseRequisition, pr)
+
+            contract = rng.choice(contracts) if contracts and rng.random() > 0.2 else None
+            po_created = pr["pr_approved_date"] + timedelta(days=rng.randint(1, 3))
+            sent = po_created + timedelta(days=rng.randint(0, 2))
+            expected_delivery = sent + timedelta(days=rng.randint(7, 45))
+            po = {
+                "id": offsets["purchase_orders"] + index,
+                "po_number": f"PO{year}{str(offsets['purchase_orders'] + index).zfill(6)}",
+                "pr_id": pr["id"],
+                "contract_id": contract["id"] if contract else None,
+                "vendor_id": contract["vendor_id"] if contract else vendor_ids[index % len(vendor_ids)],
+                "description": pr["description"],
+                "category": rng.choice(CATEGORY_NAMES),
+                "total_amount": pr["total_amount"],
+                "currency": "INR",
+                "po_created_date": po_created,
+                "po_sent_to_vendor_date": sent,
+                "expected_delivery_date": expected_delivery,
+                "actual_delivery_date": expected_delivery + timedelta(days=rng.randint(-5, 10)),
+                "status": rng.choice(["Delivered", "Delivered", "Delivered", "In Transit", "Pending"])
+            }
+            writer.add(PurchaseOrder, po)
+
+            num_items = rng.randint(1, 5)
+            items = []
+            for k in range(num_items):
+                qty = rng.randint(1, 100)
+                unit_price = round(po["total_amount"] / num_items / qty, 2)
+                item = {
+                    "po_id": po["id"],
+                    "line_number": k + 1,
+                    "item_description": rng.choice(pool.phrases),
+                    "quantity": qty,
+                    "unit_price": unit_price,
+                    "total_price": round(qty * unit_price, 2),
+                    "uom": rng.choice(["EA", "KG", "LTR", "HR", "MTH"])
+                }
+                items.append(item)
+            orders.append((index, contract, po, items))
+        writer.flush(PurchaseRequisition)
+        writer.flush(PurchaseOrder)
+        for _, _, _, items in orders:
+            for item in items:
+                writer.add(POLineItem, item)
+        writer.flush(POLineItem)
+
+        # Oracle EBS: invoices for delivered POs (invoice id == PO index)
+        invoices = []
+        for index, contract, po, items in orders:
+            if po["status"] != "Delivered":
+                continue
+            received = po["actual_delivery_date"] + timedelta(days=rng.randint(1, 5))
+            due_date = received + timedelta(days=30)
+            payment_date = due_date + timedelta(days=rng.randint(-10, 15))
+            amount_variance = rng.uniform(1.02, 1.10) if rng.random() < 0.15 else 1.0
+            invoice_amount = round(po["total_amount"] * amount_variance, 2)
+            tax = round(invoice_amount * 0.18, 2)
+            invoice = {
+                "id": offsets["invoices"] + index,
+                "invoice_number": f"INV{year}{str(offsets['invoices'] + index).zfill(6)}",
+                "po_id": po["id"],
+                "vendor_id": po["vendor_id"],
+                "invoice_amount": invoice_amount,
+                "tax_amount": tax,
+                "total_amount": round(invoice_amount + tax, 2),
+                "currency": "INR",
+                "invoice_date": received - timedelta(days=2),
+                "invoice_received_date": received,
+                "due_date": due_date,
+                "payment_date": payment_date,
+                "payment_status": "Paid" if payment_date <= as_of else "Pending",
+                "payment_method": rng.choice(["NEFT", "RTGS", "IMPS"]),
+                "transaction_id": f"{rng.getrandbits(48):012X}"
+            }
+            writer.add(Invoice, invoice)
+            invoices.append((contract, po, items, invoice))
+        writer.flush(Invoice)
+
+        for position, (contract, po, items, invoice) in enumerate(invoices):
+            ratio = invoice["invoice_amount"] / po["total_amount"]
+            for k, item in enumerate(items):
+                writer.add(InvoiceLineItem, {
+                    "invoice_id": invoice["id"],
+                    "line_number": k + 1,
+                    "description": item["item_description"],
+                    "quantity": item["quantity"],
+                    "unit_price": item["unit_price"] * ratio,
+                    "total_price": round(item["total_price"] * ratio, 2)
+                })
+
+            if position < TRANSACTIONS_PER_UNIT:
+                sourcing_req = requests_by_id.get(contract["sourcing_request_id"]) if contract else None
+                has_bottleneck = rng.random() < 0.25
+                has_gap = rng.random() < 0.15
+                writer.add(ProcurementTransaction, {
+                    "transaction_id": f"TXN{year}{str(invoice['id']).zfill(6)}",
+                    "sourcing_request_id": sourcing_req["id"] if sourcing_req else None,
+                    "contract_id": contract["id"] if contract else None,
+                    "vendor_id": po["vendor_id"],
+                    "pr_id": po["pr_id"],
+                    "po_id": po["id"],
+                    "invoice_id": invoice["id"],
+                    "current_stage": "payment" if invoice["payment_status"] == "Paid" else "invoicing",
+                    "total_cycle_time_days": (
+                        (invoice["payment_date"] - sourcing_req["request_submitted_date"]).days
+                        if sourcing_req else rng.randint(30, 120)
+                    ),
+                    "has_bottleneck": has_bottleneck,
+                    "bottleneck_stage": rng.choice(BOTTLENECK_STAGES) if has_bottleneck else None,
+                    "has_control_gap": has_gap,
+                    "control_gap_description": rng.choice(GAP_DESCRIPTIONS) if has_gap else None,
+                    "compliance_score": round(rng.uniform(70, 100), 2)
+                })
+
+            # Spend split across records so totals still reconcile to the invoice
+            fiscal_year, fiscal_quarter = _fiscal(invoice["invoice_date"])
+            weights = [rng.random() + 0.5 for _ in range(task["spend_per_invoice"])]
+            weight_total = sum(weights)
+            for weight in weights:
+                category = rng.choice(CATEGORY_NAMES)
+                amount = round(invoice["total_amount"] * weight / weight_total, 2)
+                writer.add(SpendRecord, {
+                    "invoice_id": invoice["id"],
+                    "vendor_id": invoice["vendor_id"],
+                    "category": category,
+                    "subcategory": rng.choice(CATEGORIES[category]),
+                    "business_unit": rng.choice(BUSINESS_UNITS),
+                    "cost_center": rng.choice(COST_CENTERS),
+                    "amount": amount,
+                    "currency": "INR",
+                    "spend_date": invoice["payment_date"] or invoice["invoice_date"],
+                    "fiscal_year": fiscal_year,
+                    "fiscal_quarter": fiscal_quarter,
+                    "ai_categorized": True,
+                    "confidence_score": round(rng.uniform(0.75, 0.99), 2),
+                    "is_maverick_spend": rng.random() < 0.1,
+                    "is_tail_spend": amount < 50000
+                })
+
+            if rng.random() < 0.15:
+                leakage_type, desc_template = rng.choice(LEAKAGE_TYPES)
+                expected = invoice["invoice_amount"] / (1 + rng.uniform(0.02, 0.15))
+                leakage_amt = invoice["invoice_amount"] - expected
+                writer.add(LeakageCase, {
+                    "case_id": f"LKG{year}{str(invoice['id']).zfill(6)}",
+                    "invoice_id": invoice["id"],
+                    "leakage_type": leakage_type,
+                    "description": f"{desc_template}. Expected: INR {expected:,.2f}, Actual: INR {invoice['invoice_amount']:,.2f}",
+                    "expected_amount": round(expected, 2),
+                    "actual_amount": invoice["invoice_amount"],
+                    "leakage_amount": round(leakage_amt, 2),
+                    "currency": "INR",
+                    "severity": rng.choice(["Low", "Medium", "High"]),
+                    "status": rng.choice(["New", "Under Investigation", "Recovery Initiated", "Closed"]),
+                    "assigned_to": rng.choice(pool.names) if rng.random() > 0.3 else None,
+                    "recovered_amount": round(leakage_amt * rng.uniform(0, 1), 2) if rng.random() > 0.5 else 0
+                })
+
+        writer.flush()
+
+    engine.dispose()
+    return writer.counts
+
+
+def _offsets(engine) -> Dict[str, int]:
+    with engine.connect() as conn:
+        return {
+            model.__tablename__: conn.execute(select(func.coalesce(func.max(model.id), 0))).scalar()
+            for model in OFFSET_MODELS
+        }
+
+
+def generate(database_url: str, scale: int, spend_per_invoice: int = 1, workers: int = None,
+             seed: int = 42, as_of: datetime = None, batch_size: int = BATCH_SIZE,
+             units_per_shard: int = UNITS_PER_SHARD) -> Dict[str, int]:
+    """Append ``scale`` units of linked procurement data; returns rows written per table"""
+    as_of = as_of or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    engine = create_generator_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    offsets = _offsets(engine)
+
+    vendor_count = VENDORS_PER_UNIT * scale
+    writer = BatchWriter(engine, batch_size)
+    generate_vendors(writer, random.Random(f"{seed}:vendors"), FakerPool(seed), vendor_count, offsets["vendors"], as_of)
+    counts = Counter(writer.counts)
+
+    with sessionmaker(bind=engine)() as db:
+        if not db.query(KPIMetric.id).first():
+            random.seed(seed)
+            counts["kpi_metrics"] += len(generate_kpi_metrics(db))
+    engine.dispose()
+
+    tasks = [
+        {
+            "database_url": database_url,
+            "seed": seed,
+            "first_unit": first,
+            "units": min(units_per_shard, scale - first),
+            "offsets": offsets,
+            "vendor_count": vendor_count,
+            "spend_per_invoice": spend_per_invoice,
+            "batch_size": batch_size,
+            "as_of": as_of
+        }
+        for first in range(0, scale, units_per_shard)
+    ]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for shard_counts in map(generate_shard, tasks):
+            counts.update(shard_counts)
+    else:
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            for shard_counts in pool.imap_unordered(generate_shard, tasks):
+                counts.update(shard_counts)
+    return dict(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1, help="Number of demo-sized units to generate")
+    parser.add_argument("--spend-per-invoice", type=int, default=1,
+                        help="Spend records per invoice (100 at --scale 1000 gives ~9M spend rows)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", type=lambda s: datetime.strptime(s, "%Y-%m-%d"), default=None,
+                        help="Date the generated history is relative to (default: today)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--database-url", default=SQLALCHEMY_DATABASE_URL)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(
+        args.database_url, args.scale, spend_per_invoice=args.spend_per_invoice, workers=args.workers,
+        seed=args.seed, as_of=args.as_of, batch_size=args.batch_size
+    )
+    elapsed = time.perf_counter() - started
+
+    total = sum(counts.values())
+    print(f"{'table':<26} {'rows':>12}")
+    for table, rows in sorted(counts.items()):
+        print(f"{table:<26} {rows:>12,}")
+    print(f"{'total':<26} {total:>12,}")
+    print(f"Elapsed {elapsed:.1f}s, {total / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,22 @@
 Flipkart Procurement AI Platform
 Main FastAPI Application
 """
-from fastapi import FastAPI, Depends
+from typing import Optional
+
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.models.database import init_db, get_db, Base, engine
+from app.models.database import init_db, get_db, get_async_db, Base, engine, SessionLocal
 from app.routers import lifecycle, agent, analytics, leakage
 from app.data.mock_data_generator import seed_database
+from app.services.cache import stats_cache, invalidate_stats
+from app.services.change_tracking import track_document_changes
+from app.services.conversation_cache import conversation_cache
+from app.services.erp_ingestion import SYSTEMS, integration_status, run_sync
+from app.services.intent_engine import train_classifier
 
 # Create FastAPI app
 app = FastAPI(
@@ -39,10 +48,21 @@ app.include_router(agent.router)
 app.include_router(analytics.router)
 app.include_router(leakage.router)
 
+# Document edits bump their transactions so derived stores rebuild them
+track_document_changes()
+
 @app.on_event("startup")
 def startup_event():
     """Initialize database and seed with mock data on startup"""
     init_db()
+    with SessionLocal() as db:
+        train_classifier(db)
+    conversation_cache.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Write buffered agent conversations before the process exits"""
+    conversation_cache.close()
 
 @app.get("/")
 def root():
@@ -85,85 +105,74 @@ def seed_db(db: Session = Depends(get_db)):
     """Seed database with mock data"""
     try:
         result = seed_database(db)
+        invalidate_stats()
         return {"status": "success", "data_created": result}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 @app.get("/api/stats")
-def get_stats(db: Session = Depends(get_db)):
-    """Get overall platform statistics"""
+async def get_stats(response: Response, db: AsyncSession = Depends(get_async_db)):
+    """Get overall platform statistics
+
+    Served from a short-lived cache; ``X-Cache`` reports HIT or MISS and
+    ``Age`` how many seconds old the figures are.
+    """
+    cached = stats_cache.get()
+    if cached is not None:
+        stats, age = cached
+        response.headers["X-Cache"] = "HIT"
+        response.headers["Age"] = str(int(age))
+        return stats
+
     from app.models.database import (
         Vendor, SourcingRequest, Contract, PurchaseOrder,
         Invoice, ProcurementTransaction, SpendRecord, LeakageCase
     )
 
-    stats = {
-        "vendors": db.query(Vendor).count(),
-        "sourcing_requests": db.query(SourcingRequest).count(),
-        "contracts": db.query(Contract).count(),
-        "purchase_orders": db.query(PurchaseOrder).count(),
-        "invoices": db.query(Invoice).count(),
-        "transactions_tracked": db.query(ProcurementTransaction).count(),
-        "spend_records": db.query(SpendRecord).count(),
-        "leakage_cases": db.query(LeakageCase).count()
-    }
-
-    # Calculate totals
-    total_spend = db.query(SpendRecord).with_entities(
-        SpendRecord.amount
-    ).all()
-    stats["total_spend"] = sum(s[0] for s in total_spend) if total_spend else 0
-
-    leakage_total = db.query(LeakageCase).with_entities(
-        LeakageCase.leakage_amount
-    ).all()
-    stats["total_leakage_identified"] = sum(l[0] for l in leakage_total) if leakage_total else 0
-
+    def count(model):
+        return select(func.count()).select_from(model).scalar_subquery()
+
+    def total(column):
+        return select(func.coalesce(func.sum(column), 0)).scalar_subquery()
+
+    # Every figure as a scalar subquery of one statement: a single round trip
+    row = (await db.execute(select(
+        count(Vendor).label("vendors"),
+        count(SourcingRequest).label("sourcing_requests"),
+        count(Contract).label("contracts"),
+        count(PurchaseOrder).label("purchase_orders"),
+        count(Invoice).label("invoices"),
+        count(ProcurementTransaction).label("transactions_tracked"),
+        count(SpendRecord).label("spend_records"),
+        count(LeakageCase).label("leakage_cases"),
+        total(SpendRecord.amount).label("total_spend"),
+        total(LeakageCase.leakage_amount).label("total_leakage_identified")
+    ))).one()
+    stats = dict(row._mapping)
+
+    stats_cache.set(None, stats)
+    response.headers["X-Cache"] = "MISS"
+    response.headers["Age"] = "0"
     return stats
 
-# System integration endpoints (mock)
+# System integration endpoints, backed by ERP file-drop ingestion
 @app.get("/api/integrations")
-def get_integrations():
+def get_integrations(db: Session = Depends(get_db)):
     """Get status of system integrations"""
-    return {
-        "integrations": [
-            {
-                "system": "SAP Ariba",
-                "type": "Sourcing & Intake",
-                "status": "Connected",
-                "last_sync": "2024-01-15T10:30:00Z",
-                "data_points": ["Sourcing events", "Bids", "Awards"]
-            },
-            {
-                "system": "Simplicontract",
-                "type": "Contract Management",
-                "status": "Connected",
-                "last_sync": "2024-01-15T10:25:00Z",
-                "data_points": ["Contracts", "Rate cards", "Obligations"]
-            },
-            {
-                "system": "Vendor Portal",
-                "type": "Vendor Onboarding",
-                "status": "Connected",
-                "last_sync": "2024-01-15T10:20:00Z",
-                "data_points": ["Vendor master", "Compliance docs"]
-            },
-            {
-                "system": "Oracle Fusion",
-                "type": "Procure-to-Pay",
-                "status": "Connected",
-                "last_sync": "2024-01-15T10:15:00Z",
-                "data_points": ["PRs", "POs", "Receipts"]
-            },
-            {
-                "system": "Oracle EBS",
-                "type": "Invoicing & Payment",
-                "status": "Connected",
-                "last_sync": "2024-01-15T10:10:00Z",
-                "data_points": ["Invoices", "Payments", "Transactions"]
-            }
-        ]
-    }
+    return {"integrations": integration_status(db)}
+
+@app.post("/api/integrations/sync")
+def sync_integrations(
+    background_tasks: BackgroundTasks,
+    system: Optional[str] = None,
+    retry_failed: bool = False
+):
+    """Ingest pending file drops in the background, for one system or all of them"""
+    if system is not None and system not in SYSTEMS:
+        raise HTTPException(status_code=400, detail=f"Unknown system; expected one of {', '.join(SYSTEMS)}")
+    systems = [system] if system else list(SYSTEMS)
+    background_tasks.add_task(run_sync, systems, retry_failed)
+    return {"status": "Sync started", "systems": systems}
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,12 +1,87 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Index, Enum as SQLEnum
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from datetime import datetime
 import enum
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///./procurement.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+import os
+
+# Engine configuration, overridable per deployment through the environment.
+# SQLite (default) gets per-connection pragmas tuned for concurrent uvicorn
+# workers; PostgreSQL (e.g. postgresql+psycopg2://...) gets a sized QueuePool.
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./procurement.db")
+
+# Async driver used by the async route handlers; derived from DATABASE_URL
+# unless set explicitly (sqlite -> aiosqlite, postgresql -> asyncpg).
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+def _async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_database_url(SQLALCHEMY_DATABASE_URL))
+
+def _engine_kwargs(url: str, is_async: bool = False) -> dict:
+    pool = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    if make_url(url).get_backend_name() == "sqlite":
+        connect_args = {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if not is_async:
+            return {"connect_args": {"check_same_thread": False, **connect_args}}
+        # aiosqlite defaults to NullPool (a new thread per checkout); pool it instead.
+        # No pre-ping: a local file connection cannot go stale, and the extra
+        # round trip through the aiosqlite thread is measurable under load.
+        return {
+            "poolclass": AsyncAdaptedQueuePool,
+            "connect_args": connect_args,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+        }
+    return pool if is_async else {"poolclass": QueuePool, **pool}
+
+def configure_sqlite_pragmas(target_engine):
+    """Apply WAL and cache pragmas on every new SQLite connection"""
+    in_memory = make_url(str(target_engine.url)).database in (None, "", ":memory:")
+
+    @event.listens_for(target_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs(SQLALCHEMY_DATABASE_URL))
+if engine.dialect.name == "sqlite":
+    configure_sqlite_pragmas(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_kwargs(ASYNC_DATABASE_URL, is_async=True))
+if async_engine.dialect.name == "sqlite":
+    configure_sqlite_pragmas(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 class ProcessStage(enum.Enum):
@@ -54,7 +129,7 @@ class SourcingRequest(Base):
     request_approved_date = Column(DateTime)
     sourcing_event_start = Column(DateTime)
     award_decision_date = Column(DateTime)
-    awarded_vendor_id = Column(Integer, ForeignKey("vendors.id"))
+    awarded_vendor_id = Column(Integer, ForeignKey("vendors.id"), index=True)
     status = Column(String(50))
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -67,8 +142,8 @@ class SupplierBid(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     bid_id = Column(String(50), unique=True, index=True)
-    sourcing_request_id = Column(Integer, ForeignKey("sourcing_requests.id"))
-    vendor_id = Column(Integer, ForeignKey("vendors.id"))
+    sourcing_request_id = Column(Integer, ForeignKey("sourcing_requests.id"), index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), index=True)
     bid_amount = Column(Float)
     technical_score = Column(Float)
     delivery_timeline_days = Column(Integer)
@@ -79,6 +154,21 @@ class SupplierBid(Base):
     sourcing_request = relationship("SourcingRequest", back_populates="supplier_bids")
     vendor = relationship("Vendor", back_populates="bids")
 
+# Supplier Bid Lines - itemized prices; line_no identifies the same RFQ line across bids
+class SupplierBidLine(Base):
+    __tablename__ = "supplier_bid_lines"
+
+    id = Column(Integer, primary_key=True, index=True)
+    supplier_bid_id = Column(Integer, ForeignKey("supplier_bids.id"))
+    line_no = Column(Integer)
+    description = Column(String(200))
+    quantity = Column(Float)
+    unit_price = Column(Float)
+
+    __table_args__ = (
+        Index("ix_supplier_bid_lines_bid_line", "supplier_bid_id", "line_no"),
+    )
+
 # Vendor Portal
 class Vendor(Base):
     __tablename__ = "vendors"
@@ -119,8 +209,8 @@ class Contract(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     contract_id = Column(String(50), unique=True, index=True)
-    sourcing_request_id = Column(Integer, ForeignKey("sourcing_requests.id"))
-    vendor_id = Column(Integer, ForeignKey("vendors.id"))
+    sourcing_request_id = Column(Integer, ForeignKey("sourcing_requests.id"), index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), index=True)
     contract_purpose = Column(Text)
     contract_type = Column(String(50))  # MSA, SOW, etc.
     contract_value = Column(Float)
@@ -129,7 +219,7 @@ class Contract(Base):
     contract_drafted_date = Column(DateTime)
     contract_executed_date = Column(DateTime)
     start_date = Column(DateTime)
-    end_date = Column(DateTime)
+    end_date = Column(DateTime, index=True)
     renewal_date = Column(DateTime)
     auto_renewal = Column(Boolean, default=False)
     key_obligations = Column(Text)
@@ -165,9 +255,9 @@ class PurchaseOrder(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     po_number = Column(String(50), unique=True, index=True)
-    pr_id = Column(Integer, ForeignKey("purchase_requisitions.id"))
-    contract_id = Column(Integer, ForeignKey("contracts.id"))
-    vendor_id = Column(Integer, ForeignKey("vendors.id"))
+    pr_id = Column(Integer, ForeignKey("purchase_requisitions.id"), index=True)
+    contract_id = Column(Integer, ForeignKey("contracts.id"), index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), index=True)
     description = Column(Text)
     category = Column(String(100))
     total_amount = Column(Float)
@@ -189,7 +279,7 @@ class POLineItem(Base):
     __tablename__ = "po_line_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    po_id = Column(Integer, ForeignKey("purchase_orders.id"))
+    po_id = Column(Integer, ForeignKey("purchase_orders.id"), index=True)
     line_number = Column(Integer)
     item_description = Column(Text)
     quantity = Column(Float)
@@ -205,8 +295,8 @@ class Invoice(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     invoice_number = Column(String(50), unique=True, index=True)
-    po_id = Column(Integer, ForeignKey("purchase_orders.id"))
-    vendor_id = Column(Integer, ForeignKey("vendors.id"))
+    po_id = Column(Integer, ForeignKey("purchase_orders.id"), index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), index=True)
     invoice_amount = Column(Float)
     tax_amount = Column(Float)
     total_amount = Column(Float)
@@ -214,7 +304,7 @@ class Invoice(Base):
     invoice_date = Column(DateTime)
     invoice_received_date = Column(DateTime)
     due_date = Column(DateTime)
-    payment_date = Column(DateTime)
+    payment_date = Column(DateTime, index=True)
     payment_status = Column(String(50))
     payment_method = Column(String(50))
     transaction_id = Column(String(100))
@@ -229,7 +319,7 @@ class InvoiceLineItem(Base):
     __tablename__ = "invoice_line_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    invoice_id = Column(Integer, ForeignKey("invoices.id"))
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), index=True)
     line_number = Column(Integer)
     description = Column(Text)
     quantity = Column(Float)
@@ -238,18 +328,36 @@ class InvoiceLineItem(Base):
 
     invoice = relationship("Invoice", back_populates="line_items")
 
+# Duplicate invoice index maintained by app.services.duplicate_detection
+class InvoiceFingerprint(Base):
+    __tablename__ = "invoice_fingerprints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), unique=True, index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id"))
+    number_key = Column(String(50))  # Normalized invoice number
+    ocr_key = Column(String(50))  # number_key with OCR-confusable characters folded
+    amount_cents = Column(Integer)
+    amount_bucket = Column(Integer)  # Log-scale bucket for near-duplicate amount matching
+    invoice_date = Column(DateTime)
+    fingerprint = Column(String(40), index=True)  # sha1(vendor_id|number_key|amount_cents)
+
+    __table_args__ = (
+        Index("ix_invoice_fingerprints_vendor_bucket", "vendor_id", "amount_bucket"),
+    )
+
 # Procurement Lifecycle Transaction - Unified View
 class ProcurementTransaction(Base):
     __tablename__ = "procurement_transactions"
 
     id = Column(Integer, primary_key=True, index=True)
     transaction_id = Column(String(50), unique=True, index=True)
-    sourcing_request_id = Column(Integer, ForeignKey("sourcing_requests.id"))
-    contract_id = Column(Integer, ForeignKey("contracts.id"))
-    vendor_id = Column(Integer, ForeignKey("vendors.id"))
-    pr_id = Column(Integer, ForeignKey("purchase_requisitions.id"))
-    po_id = Column(Integer, ForeignKey("purchase_orders.id"))
-    invoice_id = Column(Integer, ForeignKey("invoices.id"))
+    sourcing_request_id = Column(Integer, ForeignKey("sourcing_requests.id"), index=True)
+    contract_id = Column(Integer, ForeignKey("contracts.id"), index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), index=True)
+    pr_id = Column(Integer, ForeignKey("purchase_requisitions.id"), index=True)
+    po_id = Column(Integer, ForeignKey("purchase_orders.id"), index=True)
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), index=True)
 
     current_stage = Column(String(50))
     total_cycle_time_days = Column(Integer)
@@ -259,7 +367,84 @@ class ProcurementTransaction(Base):
     control_gap_description = Column(Text)
     compliance_score = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        Index("ix_procurement_transactions_bottleneck", "has_bottleneck", "bottleneck_stage"),
+        Index("ix_procurement_transactions_control_gap", "has_control_gap"),
+    )
+
+# Process Mining - stage event log maintained by app.services.process_mining
+class ProcessEvent(Base):
+    __tablename__ = "process_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    transaction_id = Column(Integer, ForeignKey("procurement_transactions.id"))
+    stage = Column(String(50))
+    sequence = Column(Integer)  # Position in the transaction's path, ordered by started_at
+    started_at = Column(DateTime)
+    ended_at = Column(DateTime)  # Null while the stage is in progress
+    duration_days = Column(Integer)
+    wait_days = Column(Integer)  # Days from the previous stage's end to this start
+    elapsed_days = Column(Integer)  # Days from the transaction's first start to this end
+    source_system = Column(String(50))
+
+    __table_args__ = (
+        Index("ix_process_events_transaction_sequence", "transaction_id", "sequence"),
+    )
+
+class ProcessFlowCell(Base):
+    __tablename__ = "process_flow_cells"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20))  # duration, in_progress, edge, variant
+    key = Column(String(300))  # Stage, "from>to" edge, or comma-joined variant path
+    bucket = Column(Integer, default=0)  # Duration in days for kind=duration
+    count = Column(Integer, default=0)
+    total = Column(Integer, default=0)  # Summed wait days (edge) or cycle days (variant)
+    total_count = Column(Integer, default=0)  # Transactions contributing to total
+
+    __table_args__ = (
+        Index("ix_process_flow_cells_kind_key_bucket", "kind", "key", "bucket", unique=True),
+    )
+
+class ProcessEventLogState(Base):
+    __tablename__ = "process_event_log_state"
+
+    id = Column(Integer, primary_key=True)
+    last_transaction_id = Column(Integer, default=0)  # Highest ProcurementTransaction.id in the log
+    last_updated_at = Column(DateTime)  # Newest ProcurementTransaction.updated_at folded in
+    version = Column(Integer, default=0)  # Bumped whenever the log changes
+    refreshed_at = Column(DateTime)
+
+# Transaction timelines - denormalized stage rows maintained by app.services.timeline_store
+class TransactionStage(Base):
+    __tablename__ = "transaction_stages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    transaction_id = Column(Integer, ForeignKey("procurement_transactions.id"))
+    sequence = Column(Integer)  # Display order within the timeline
+    stage = Column(String(50))
+    stage_name = Column(String(100))
+    start_date = Column(DateTime)
+    end_date = Column(DateTime)
+    duration_days = Column(Integer)
+    status = Column(String(50))
+    source_system = Column(String(50))
+    details = Column(Text)  # JSON document fields shown on the timeline
+
+    __table_args__ = (
+        Index("ix_transaction_stages_transaction_sequence", "transaction_id", "sequence"),
+    )
+
+class TransactionStageState(Base):
+    __tablename__ = "transaction_stage_state"
+
+    id = Column(Integer, primary_key=True)
+    last_transaction_id = Column(Integer, default=0)  # Highest ProcurementTransaction.id in the store
+    last_updated_at = Column(DateTime)  # Newest ProcurementTransaction.updated_at folded in
+    version = Column(Integer, default=0)  # Bumped whenever the store changes
+    refreshed_at = Column(DateTime)
 
 # AI Agent Conversations
 class AgentConversation(Base):
@@ -283,7 +468,7 @@ class ConversationMessage(Base):
     __tablename__ = "conversation_messages"
 
     id = Column(Integer, primary_key=True, index=True)
-    conversation_id = Column(Integer, ForeignKey("agent_conversations.id"))
+    conversation_id = Column(Integer, ForeignKey("agent_conversations.id"), index=True)
     role = Column(String(20))  # user, assistant
     content = Column(Text)
     timestamp = Column(DateTime, default=datetime.utcnow)
@@ -295,15 +480,15 @@ class SpendRecord(Base):
     __tablename__ = "spend_records"
 
     id = Column(Integer, primary_key=True, index=True)
-    invoice_id = Column(Integer, ForeignKey("invoices.id"))
-    vendor_id = Column(Integer, ForeignKey("vendors.id"))
-    category = Column(String(100))
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), index=True)
+    category = Column(String(100), index=True)
     subcategory = Column(String(100))
     business_unit = Column(String(100))
     cost_center = Column(String(50))
     amount = Column(Float)
     currency = Column(String(10), default="INR")
-    spend_date = Column(DateTime)
+    spend_date = Column(DateTime, index=True)
     fiscal_year = Column(String(10))
     fiscal_quarter = Column(String(10))
     ai_categorized = Column(Boolean, default=False)
@@ -312,6 +497,133 @@ class SpendRecord(Base):
     is_tail_spend = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_spend_records_fiscal_year_business_unit", "fiscal_year", "business_unit"),
+    )
+
+# Spend Analytics - pre-aggregated cube maintained by app.services.spend_cube
+class SpendCube(Base):
+    __tablename__ = "spend_cube"
+
+    id = Column(Integer, primary_key=True, index=True)
+    category = Column(String(100), index=True)
+    subcategory = Column(String(100))
+    business_unit = Column(String(100))
+    vendor_id = Column(Integer, ForeignKey("vendors.id"))
+    fiscal_year = Column(String(10))
+    fiscal_quarter = Column(String(10))
+    month = Column(String(10), index=True)  # YYYY-MM, "Unknown" when spend_date is missing
+    total_amount = Column(Float, default=0)
+    record_count = Column(Integer, default=0)
+    min_amount = Column(Float)
+    max_amount = Column(Float)
+    tail_amount = Column(Float, default=0)
+    tail_count = Column(Integer, default=0)
+    maverick_amount = Column(Float, default=0)
+    maverick_count = Column(Integer, default=0)
+    ai_categorized_count = Column(Integer, default=0)
+    high_confidence_count = Column(Integer, default=0)
+    medium_confidence_count = Column(Integer, default=0)
+    low_confidence_count = Column(Integer, default=0)
+
+class SpendCubeState(Base):
+    __tablename__ = "spend_cube_state"
+
+    id = Column(Integer, primary_key=True)
+    last_spend_record_id = Column(Integer, default=0)  # Highest SpendRecord.id folded into the cube
+    refreshed_at = Column(DateTime)
+
+# Supplier Scorecards - per-vendor rollups maintained by app.services.supplier_scorecards
+class SupplierScorecard(Base):
+    __tablename__ = "supplier_scorecards"
+
+    id = Column(Integer, primary_key=True, index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), unique=True, index=True)
+    vendor_name = Column(String(200))
+    vendor_code = Column(String(50))
+    categories = Column(Text)  # JSON list, copied from Vendor
+    is_active = Column(Boolean, default=True)
+    risk_score = Column(Float)
+    performance_score = Column(Float)
+    risk_band = Column(String(10))  # Low, Medium, High
+    compliance_status = Column(String(50))
+    invoice_count = Column(Integer, default=0)
+    total_spend = Column(Float, default=0)  # Invoice total_amount
+    rolling_spend = Column(Float, default=0)  # Invoice total_amount over the trailing ROLLING_DAYS
+    last_invoice_date = Column(DateTime)
+    on_time_payment_count = Column(Integer, default=0)
+    on_time_payment_rate = Column(Float, default=0)
+    po_count = Column(Integer, default=0)
+    delivered_po_count = Column(Integer, default=0)
+    on_time_delivery_count = Column(Integer, default=0)
+    on_time_delivery_rate = Column(Float, default=0)
+    leakage_case_count = Column(Integer, default=0)
+    open_leakage_count = Column(Integer, default=0)
+    leakage_amount = Column(Float, default=0)
+    recovered_amount = Column(Float, default=0)
+    spend_record_amount = Column(Float, default=0)  # SpendRecord amount, used for spend at risk
+    stale = Column(Boolean, default=False, index=True)  # Set by writers; recomputed on next refresh
+    refreshed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_supplier_scorecards_active_band", "is_active", "risk_band"),
+    )
+
+class SupplierScorecardState(Base):
+    __tablename__ = "supplier_scorecard_state"
+
+    id = Column(Integer, primary_key=True)
+    last_vendor_id = Column(Integer, default=0)
+    last_invoice_id = Column(Integer, default=0)
+    last_po_id = Column(Integer, default=0)
+    last_leakage_case_id = Column(Integer, default=0)
+    last_spend_record_id = Column(Integer, default=0)
+    as_of = Column(String(10))  # Day the rolling window was computed for (YYYY-MM-DD)
+    refreshed_at = Column(DateTime)
+    version = Column(Integer, default=0)  # Bumped by each refresh; guards concurrent runs
+
+# Vendor Categories - one row per (vendor, category), rewritten with the vendor's scorecard
+class VendorCategory(Base):
+    __tablename__ = "vendor_categories"
+
+    id = Column(Integer, primary_key=True, index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), index=True)
+    category = Column(String(100))
+    is_active = Column(Boolean, default=True)
+    rank_score = Column(Float)  # performance_score * 0.4 - risk_score * 0.3, copied from the scorecard
+
+    __table_args__ = (
+        Index("ix_vendor_categories_category_rank", "category", "is_active", "rank_score", "vendor_id"),
+    )
+
+# Demand Forecasting - fitted smoothing models maintained by app.services.forecasting
+class ForecastModel(Base):
+    __tablename__ = "forecast_models"
+
+    id = Column(Integer, primary_key=True, index=True)
+    series_key = Column(String(250), unique=True, index=True)  # "category|business_unit"
+    category = Column(String(100), index=True)
+    business_unit = Column(String(100))
+    model_type = Column(String(20))  # naive, ses, holt, holt_winters
+    alpha = Column(Float)
+    beta = Column(Float)
+    gamma = Column(Float)
+    phi = Column(Float)
+    season_length = Column(Integer)
+    level = Column(Float)
+    trend = Column(Float)
+    seasonals = Column(Text)  # JSON list, indexed by observation number % season_length
+    first_month = Column(String(10))
+    last_month = Column(String(10))  # Last closed month folded into the state
+    observations = Column(Integer)
+    optimized_observations = Column(Integer)  # Series length when parameters were last searched
+    sse = Column(Float)
+    sse_count = Column(Integer)
+    backtest_months = Column(Integer)
+    backtest_abs_error = Column(Float)
+    backtest_actual = Column(Float)
+    fitted_at = Column(DateTime)
+
 # Leakage Detection
 class LeakageCase(Base):
     __tablename__ = "leakage_cases"
@@ -326,7 +638,7 @@ class LeakageCase(Base):
     leakage_amount = Column(Float)
     currency = Column(String(10), default="INR")
     severity = Column(String(20))
-    status = Column(String(50))
+    status = Column(String(50), index=True)
     assigned_to = Column(String(100))
     validated_by = Column(String(100))
     validation_date = Column(DateTime)
@@ -339,6 +651,55 @@ class LeakageCase(Base):
 
     invoice = relationship("Invoice", back_populates="leakage_cases")
 
+    __table_args__ = (
+        Index("ix_leakage_cases_invoice_type", "invoice_id", "leakage_type"),
+        Index("ix_leakage_cases_created_at", "created_at"),
+    )
+
+# Post-payment audit scans run by app.services.audit_engine
+class AuditScan(Base):
+    __tablename__ = "audit_scans"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scan_id = Column(String(50), unique=True, index=True)
+    status = Column(String(20))  # Queued, Running, Completed, Failed
+    window_start = Column(DateTime)
+    window_end = Column(DateTime)
+    batch_size = Column(Integer)
+    invoices_scanned = Column(Integer, default=0)
+    cases_created = Column(Integer, default=0)
+    leakage_identified = Column(Float, default=0)
+    rule_hits = Column(Text)  # JSON {rule_id: count}
+    error_message = Column(Text)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# ERP file drops ingested by app.services.erp_ingestion
+class IngestionFile(Base):
+    __tablename__ = "ingestion_files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_system = Column(String(50))  # Inbox slug, e.g. oracle_ebs
+    file_name = Column(String(300))
+    fingerprint = Column(String(400))  # file name, size and mtime; a changed file is a new drop
+    status = Column(String(20))  # Pending, Running, Completed, Failed, Skipped
+    rows_read = Column(Integer, default=0)  # Checkpoint: rows committed, resumed from after a restart
+    rows_inserted = Column(Integer, default=0)
+    rows_updated = Column(Integer, default=0)
+    rows_rejected = Column(Integer, default=0)
+    errors = Column(Text)  # JSON list of the first rejected rows and failures
+    processing_seconds = Column(Float, default=0)  # Summed batch time across resumes
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # Last checkpoint; a stale Running file is reclaimed
+    completed_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_ingestion_files_system_fingerprint", "source_system", "fingerprint", unique=True),
+        Index("ix_ingestion_files_system_status", "source_system", "status"),
+    )
+
 # KPI Metrics
 class KPIMetric(Base):
     __tablename__ = "kpi_metrics"
@@ -349,12 +710,28 @@ class KPIMetric(Base):
     metric_unit = Column(String(50))
     dimension = Column(String(100))  # category, vendor, business_unit
     dimension_value = Column(String(100))
-    period = Column(String(20))  # daily, weekly, monthly
+    period = Column(String(20))  # daily, weekly, monthly, quarterly
     period_date = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_kpi_metrics_name_dimension_period_date", "metric_name", "dimension", "period", "period_date"),
+    )
+
+class KPIRollupState(Base):
+    __tablename__ = "kpi_rollup_state"
+
+    id = Column(Integer, primary_key=True)
+    period = Column(String(20), unique=True)  # One row per snapshot granularity
+    version = Column(Integer, default=0)  # Bumped by each rollup; guards concurrent runs
+    period_count = Column(Integer, default=0)  # Periods written by the last rollup
+    rolled_up_at = Column(DateTime)
+
 def init_db():
+    from app.models.migrations import run_migrations
+
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
 def get_db():
     db = SessionLocal()
@@ -362,3 +739,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,130 @@
+"""
+Versioned schema migrations
+
+``Base.metadata.create_all`` only creates missing tables, so it cannot evolve
+an existing procurement.db. Each migration here runs once, in version order,
+and is recorded in ``schema_migrations``. Add new migrations to the end of
+MIGRATIONS; never renumber or edit one that has shipped.
+
+Run manually with:
+    python -m app.models.migrations
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, insert, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.models.database import Base, SupplierScorecardState
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(200)),
+    Column("applied_at", DateTime),
+)
+
+
+# (index name, table, columns); each migration's list is fixed once shipped
+FK_AND_FILTER_INDEXES = (
+    ("ix_contracts_end_date", "contracts", "end_date"),
+    ("ix_contracts_sourcing_request_id", "contracts", "sourcing_request_id"),
+    ("ix_contracts_vendor_id", "contracts", "vendor_id"),
+    ("ix_conversation_messages_conversation_id", "conversation_messages", "conversation_id"),
+    ("ix_invoice_line_items_invoice_id", "invoice_line_items", "invoice_id"),
+    ("ix_invoices_payment_date", "invoices", "payment_date"),
+    ("ix_invoices_po_id", "invoices", "po_id"),
+    ("ix_invoices_vendor_id", "invoices", "vendor_id"),
+    ("ix_leakage_cases_created_at", "leakage_cases", "created_at"),
+    ("ix_leakage_cases_invoice_type", "leakage_cases", "invoice_id, leakage_type"),
+    ("ix_leakage_cases_status", "leakage_cases", "status"),
+    ("ix_po_line_items_po_id", "po_line_items", "po_id"),
+    ("ix_procurement_transactions_bottleneck", "procurement_transactions", "has_bottleneck, bottleneck_stage"),
+    ("ix_procurement_transactions_contract_id", "procurement_transactions", "contract_id"),
+    ("ix_procurement_transactions_control_gap", "procurement_transactions", "has_control_gap"),
+    ("ix_procurement_transactions_invoice_id", "procurement_transactions", "invoice_id"),
+    ("ix_procurement_transactions_po_id", "procurement_transactions", "po_id"),
+    ("ix_procurement_transactions_pr_id", "procurement_transactions", "pr_id"),
+    ("ix_procurement_transactions_sourcing_request_id", "procurement_transactions", "sourcing_request_id"),
+    ("ix_procurement_transactions_vendor_id", "procurement_transactions", "vendor_id"),
+    ("ix_purchase_orders_contract_id", "purchase_orders", "contract_id"),
+    ("ix_purchase_orders_pr_id", "purchase_orders", "pr_id"),
+    ("ix_purchase_orders_vendor_id", "purchase_orders", "vendor_id"),
+    ("ix_sourcing_requests_awarded_vendor_id", "sourcing_requests", "awarded_vendor_id"),
+    ("ix_spend_records_category", "spend_records", "category"),
+    ("ix_spend_records_fiscal_year_business_unit", "spend_records", "fiscal_year, business_unit"),
+    ("ix_spend_records_invoice_id", "spend_records", "invoice_id"),
+    ("ix_spend_records_spend_date", "spend_records", "spend_date"),
+    ("ix_spend_records_vendor_id", "spend_records", "vendor_id"),
+    ("ix_supplier_bids_sourcing_request_id", "supplier_bids", "sourcing_request_id"),
+    ("ix_supplier_bids_vendor_id", "supplier_bids", "vendor_id"),
+)
+TRANSACTION_UPDATED_AT_INDEXES = (
+    ("ix_procurement_transactions_updated_at", "procurement_transactions", "updated_at"),
+)
+KPI_SNAPSHOT_INDEXES = (
+    ("ix_kpi_metrics_name_dimension_period_date", "kpi_metrics", "metric_name, dimension, period, period_date"),
+)
+
+
+def _create_indexes(indexes: Tuple[Tuple[str, str, str], ...]) -> Callable[[Connection], None]:
+    """Migration creating exactly ``indexes``; ones already built by create_all are skipped"""
+    def migrate(conn: Connection) -> None:
+        for name, table, columns in indexes:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+    return migrate
+
+
+def _add_scorecard_state_version(conn: Connection) -> None:
+    """create_all already adds the column to a new supplier_scorecard_state"""
+    if "version" not in {column["name"] for column in inspect(conn).get_columns("supplier_scorecard_state")}:
+        conn.execute(text("ALTER TABLE supplier_scorecard_state ADD COLUMN version INTEGER DEFAULT 0"))
+
+
+def _recompute_scorecards(conn: Connection) -> None:
+    """Force a full scorecard refresh, which also fills tables derived from it"""
+    conn.execute(update(SupplierScorecardState.__table__).values(as_of=None))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Foreign-key, filter and composite indexes for router query patterns",
+     _create_indexes(FK_AND_FILTER_INDEXES)),
+    (2, "Index procurement_transactions.updated_at for the process event log",
+     _create_indexes(TRANSACTION_UPDATED_AT_INDEXES)),
+    (3, "Index kpi_metrics snapshots by metric, dimension and period", _create_indexes(KPI_SNAPSHOT_INDEXES)),
+    (4, "Backfill vendor_categories from a full scorecard refresh", _recompute_scorecards),
+    (5, "Version supplier_scorecard_state so concurrent refreshes claim it", _add_scorecard_state_version),
+]
+
+
+def applied_versions(conn: Connection) -> set:
+    return {row[0] for row in conn.execute(select(schema_migrations.c.version))}
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply pending migrations in order; returns the versions applied"""
+    applied = []
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        done = applied_versions(conn)
+
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(insert(schema_migrations).values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        applied.append(version)
+
+    return applied
+
+
+if __name__ == "__main__":
+    from app.models.database import engine
+
+    Base.metadata.create_all(bind=engine)
+    versions = run_migrations(engine)
+    print(f"Applied migrations: {versions}" if versions else "Schema is up to date")
@@ -1,19 +1,28 @@
 """
 Use Case 2: AI Agent for Procurement Automation API
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
+import copy
 import json
+import re
 import uuid
 
 from app.models.database import (
-    get_db, AgentConversation, ConversationMessage, Vendor,
-    SourcingRequest, SupplierBid, Contract
+    get_db, SessionLocal, AgentConversation, ConversationMessage, Vendor,
+    SourcingRequest, SupplierBid, Contract, SupplierScorecard
 )
+from app.services.bid_evaluation import AWARDED_STATUS, OPEN_STATUS, evaluate_rfq, evaluation_criteria, record_bid
+from app.services.cache import invalidate_stats
+from app.services.conversation_cache import ConversationState, conversation_cache
+from app.services.event_hub import event_hub, format_event, sse_response
+from app.services.intent_engine import classify, extract_entities, extract_field
+from app.services.supplier_scorecards import categories_of, category_ranking, refresh_supplier_scorecards
 
 router = APIRouter(prefix="/api/agent", tags=["AI Procurement Agent"])
 
@@ -39,12 +48,21 @@ class RFQGenerateRequest(BaseModel):
     session_id: str
     vendor_ids: List[int]
 
+class BidLineItem(BaseModel):
+    line_no: int
+    description: Optional[str] = None
+    quantity: float
+    unit_price: float
+
 class BidSubmission(BaseModel):
     rfq_id: str
     vendor_id: int
-    bid_amount: float
+    bid_amount: Optional[float] = None  # Defaults to the line item total
     delivery_days: int
     technical_notes: str
+    technical_score: Optional[float] = None  # 0-100, from the technical evaluation
+    is_compliant: bool = True
+    line_items: Optional[List[BidLineItem]] = None
 
 class NegotiationRequest(BaseModel):
     bid_id: str
@@ -86,135 +104,128 @@ CATEGORY_QUESTIONS = {
     ]
 }
 
-def detect_category(message: str) -> str:
-    """Detect procurement category from user message"""
-    message_lower = message.lower()
-
-    if any(word in message_lower for word in ["laptop", "computer", "desktop", "monitor"]):
-        return "laptops"
-    elif any(word in message_lower for word in ["office", "supplies", "stationery", "notebook", "pen"]):
-        return "office_supplies"
-    elif any(word in message_lower for word in ["software", "saas", "license", "subscription"]):
-        return "software"
-    elif any(word in message_lower for word in ["service", "consulting", "support", "maintenance"]):
-        return "services"
-    else:
-        return "general"
+# Agent category -> vendor master categories that supply it
+VENDOR_CATEGORIES = {
+    "laptops": ["IT Hardware"],
+    "office_supplies": ["Corporate Services"],
+    "software": ["IT Software & SaaS"],
+    "services": ["Professional Services"],
+}
 
-def extract_info_from_message(message: str, field: str) -> Optional[str]:
-    """Extract relevant information from user message"""
-    # Simple extraction logic - in production, this would use NLP/LLM
-    return message.strip() if message else None
+# Words with their trailing whitespace, so streamed tokens join back into the reply
+TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
 
-def get_suggested_vendors(db: Session, category: str, requirements: dict) -> List[dict]:
-    """Get vendor suggestions based on category and requirements"""
-    vendors = db.query(Vendor).filter(
-        Vendor.is_active == True
-    ).order_by(Vendor.performance_score.desc()).limit(5).all()
+def extract_info_from_message(message: str, field: str) -> Optional[str]:
+    """Extract relevant information from user message
+
+    Quantities, budgets, deadlines and locations are normalized; other
+    answers are kept as written.
+    """
+    return extract_field(message, field) or (message.strip() if message else None)
+
+def get_suggested_vendors(db: Session, category: str, requirements: dict, limit: int = 5,
+                          background_tasks: Optional[BackgroundTasks] = None) -> List[dict]:
+    """Get vendor suggestions based on category and requirements
+
+    Vendors supplying the category come first, best ranked, from the
+    vendor-category index; the best performers overall fill any remaining places.
+    """
+    state = refresh_supplier_scorecards(db, background_tasks)
+    vendor_categories = list(VENDOR_CATEGORIES.get(category, []))
+    mentioned = requirements.get("entities", {}).get("vendor_category")
+    if mentioned and mentioned not in vendor_categories:
+        vendor_categories.append(mentioned)
+
+    specialists = set()
+    for vendor_category in vendor_categories:
+        specialists.update(category_ranking(db, state, vendor_category, limit))
+
+    cards = db.query(SupplierScorecard).filter(SupplierScorecard.vendor_id.in_(specialists)).all() if specialists else []
+    if len(cards) < limit:
+        cards += db.query(SupplierScorecard).filter(
+            SupplierScorecard.is_active == True,
+            SupplierScorecard.vendor_id.notin_(specialists)
+        ).order_by(SupplierScorecard.performance_score.desc()).limit(limit - len(cards)).all()
 
     suggestions = []
-    for vendor in vendors:
-        categories = json.loads(vendor.categories) if vendor.categories else []
-        relevance_score = 0.7 + (vendor.performance_score / 100 * 0.3)
+    for card in cards:
+        category_match = card.vendor_id in specialists
+        relevance_score = (0.7 if category_match else 0.4) + (card.performance_score / 100 * 0.3)
 
         suggestions.append({
-            "vendor_id": vendor.id,
-            "vendor_code": vendor.vendor_code,
-            "vendor_name": vendor.vendor_name,
-            "performance_score": vendor.performance_score,
-            "risk_score": vendor.risk_score,
-            "categories": categories,
+            "vendor_id": card.vendor_id,
+            "vendor_code": card.vendor_code,
+            "vendor_name": card.vendor_name,
+            "performance_score": card.performance_score,
+            "risk_score": card.risk_score,
+            "categories": categories_of(card),
+            "category_match": category_match,
             "relevance_score": round(relevance_score, 2),
-            "recommendation": "Highly Recommended" if vendor.performance_score > 80 else "Recommended"
+            "recommendation": "Highly Recommended" if card.performance_score > 80 else "Recommended"
         })
 
-    return sorted(suggestions, key=lambda x: x["relevance_score"], reverse=True)
+    return sorted(suggestions, key=lambda x: x["relevance_score"], reverse=True)[:limit]
 
 @router.post("/chat", response_model=ChatResponse)
-def chat_with_agent(request: ChatRequest, db: Session = Depends(get_db)):
+def chat_with_agent(request: ChatRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Main chat endpoint for AI agent interaction"""
 
     # Get or create conversation
-    if request.session_id:
-        conversation = db.query(AgentConversation).filter(
-            AgentConversation.session_id == request.session_id
-        ).first()
-    else:
-        conversation = None
+    conversation = conversation_cache.get(db, request.session_id) if request.session_id else None
+    is_new = conversation is None
 
-    if not conversation:
+    if is_new:
         session_id = str(uuid.uuid4())
-        category = detect_category(request.message)
+        intent = classify(request.message)
+        category = intent.category
 
-        conversation = AgentConversation(
+        conversation = conversation_cache.create(
+            db,
             session_id=session_id,
             user_id=request.user_id,
             spend_category="transactional" if category in ["office_supplies"] else "tactical",
             status="gathering_requirements",
-            requirements_gathered=json.dumps({"category": category, "fields": {}})
+            requirements_gathered=json.dumps({"category": category, "category_source": intent.source, "fields": {}})
         )
-        db.add(conversation)
-        db.commit()
     else:
         session_id = conversation.session_id
+    previous_status = conversation.status
 
     # Save user message
-    user_msg = ConversationMessage(
-        conversation_id=conversation.id,
-        role="user",
-        content=request.message
-    )
-    db.add(user_msg)
+    publish_message(conversation, conversation_cache.add_message(conversation, "user", request.message))
 
     # Parse current requirements
-    requirements = json.loads(conversation.requirements_gathered or '{"category": "general", "fields": {}}')
+    requirements = copy.deepcopy(conversation.requirements) or {"category": "general", "fields": {}}
     category = requirements.get("category", "general")
     fields = requirements.get("fields", {})
+    entities = requirements.setdefault("entities", {})
+    entities.update((k, v) for k, v in extract_entities(request.message).items() if k != "category")
 
     # Process message and generate response
     questions = CATEGORY_QUESTIONS.get(category, CATEGORY_QUESTIONS["services"])
-    answered_fields = list(fields.keys())
-
-    # Find next unanswered question
-    next_question = None
-    for q in questions:
-        if q["field"] not in answered_fields:
-            # Store the answer from current message
-            if len(answered_fields) > 0 or category != "general":
-                prev_field = questions[len(answered_fields) - 1]["field"] if answered_fields else None
-                if prev_field:
-                    fields[prev_field] = request.message
-
-            next_question = q
-            break
-
-    # If this is first message after category detection, don't store yet
-    if not answered_fields and category != "general":
-        # First question
-        response = f"I can help you with that {category.replace('_', ' ')} procurement. {questions[0]['question']}"
-        requirements_complete = False
-        suggested_vendors = None
-        rfq_ready = False
-    elif next_question:
-        # Store current answer and ask next question
-        current_field_idx = len(answered_fields)
-        if current_field_idx > 0:
-            prev_field = questions[current_field_idx - 1]["field"]
-            fields[prev_field] = request.message
-
-        response = f"Got it. {next_question['question']}"
+
+    def unanswered():
+        return next((q for q in questions if q["field"] not in fields), None)
+
+    # The opening message states the need; later ones answer the question asked last
+    if not is_new:
+        pending = unanswered()
+        if pending:
+            fields[pending["field"]] = extract_info_from_message(request.message, pending["field"])
+    next_question = unanswered()
+
+    if next_question:
+        if is_new and category != "general":
+            response = f"I can help you with that {category.replace('_', ' ')} procurement. {next_question['question']}"
+        else:
+            response = f"Got it. {next_question['question']}"
         requirements_complete = False
         suggested_vendors = None
         rfq_ready = False
     else:
-        # All questions answered - store last answer
-        if questions:
-            last_field = questions[-1]["field"]
-            fields[last_field] = request.message
-
         # Generate summary and vendor suggestions
         requirements_complete = True
-        suggested_vendors = get_suggested_vendors(db, category, fields)
+        suggested_vendors = get_suggested_vendors(db, category, requirements, background_tasks=background_tasks)
 
         summary_parts = [f"{k.replace('_', ' ').title()}: {v}" for k, v in fields.items()]
         summary = "\n".join(summary_parts)
@@ -233,21 +244,18 @@ Based on your requirements, I've identified these recommended vendors:
 Would you like me to generate an RFQ and send it to these vendors?"""
 
         rfq_ready = True
-        conversation.suggested_vendors = json.dumps([v["vendor_id"] for v in suggested_vendors[:3]])
+        conversation.suggested_vendors = [v["vendor_id"] for v in suggested_vendors[:3]]
         conversation.status = "vendors_suggested"
 
     # Update requirements
     requirements["fields"] = fields
-    conversation.requirements_gathered = json.dumps(requirements)
+    conversation.requirements = requirements
 
     # Save assistant response
-    assistant_msg = ConversationMessage(
-        conversation_id=conversation.id,
-        role="assistant",
-        content=response
-    )
-    db.add(assistant_msg)
-    db.commit()
+    publish_message(conversation, conversation_cache.add_message(conversation, "assistant", response))
+    conversation_cache.mark_dirty(conversation)
+    if conversation.status != previous_status:
+        publish_status(conversation)
 
     return ChatResponse(
         session_id=session_id,
@@ -258,16 +266,33 @@ Would you like me to generate an RFQ and send it to these vendors?"""
         next_prompt=next_question["question"] if next_question else None
     )
 
+@router.post("/chat/stream")
+async def chat_with_agent_stream(request: ChatRequest, background_tasks: BackgroundTasks,
+                                 db: Session = Depends(get_db)):
+    """Chat endpoint streaming the reply as server-sent events
+
+    Sends ``session``, then the reply as ``token`` events, then ``done`` with
+    the same body /chat returns.
+    """
+    result = await run_in_threadpool(chat_with_agent, request, background_tasks, db)
+
+    async def body():
+        yield format_event("session", {"session_id": result.session_id})
+        for token in TOKEN_PATTERN.findall(result.response):
+            yield format_event("token", {"text": token})
+        yield format_event("done", result.model_dump())
+
+    return sse_response(body())
+
 @router.get("/conversations/{session_id}")
 def get_conversation(session_id: str, db: Session = Depends(get_db)):
     """Get full conversation history"""
-    conversation = db.query(AgentConversation).filter(
-        AgentConversation.session_id == session_id
-    ).first()
+    conversation = conversation_cache.get(db, session_id)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
+    conversation_cache.flush()
     messages = db.query(ConversationMessage).filter(
         ConversationMessage.conversation_id == conversation.id
     ).order_by(ConversationMessage.timestamp).all()
@@ -276,8 +301,8 @@ def get_conversation(session_id: str, db: Session = Depends(get_db)):
         "session_id": conversation.session_id,
         "status": conversation.status,
         "spend_category": conversation.spend_category,
-        "requirements": json.loads(conversation.requirements_gathered) if conversation.requirements_gathered else {},
-        "suggested_vendors": json.loads(conversation.suggested_vendors) if conversation.suggested_vendors else [],
+        "requirements": conversation.requirements,
+        "suggested_vendors": conversation.suggested_vendors or [],
         "rfq_generated": conversation.rfq_generated,
         "rfq_id": conversation.rfq_id,
         "messages": [
@@ -293,32 +318,26 @@ def get_conversation(session_id: str, db: Session = Depends(get_db)):
 @router.post("/rfq/generate")
 def generate_rfq(request: RFQGenerateRequest, db: Session = Depends(get_db)):
     """Generate RFQ based on gathered requirements"""
-    conversation = db.query(AgentConversation).filter(
-        AgentConversation.session_id == request.session_id
-    ).first()
+    conversation = conversation_cache.get(db, request.session_id)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    requirements = json.loads(conversation.requirements_gathered) if conversation.requirements_gathered else {}
+    requirements = conversation.requirements
     category = requirements.get("category", "general")
     fields = requirements.get("fields", {})
 
     # Generate RFQ document
     rfq_id = f"RFQ{datetime.now().year}{str(uuid.uuid4())[:8].upper()}"
+    title = f"Request for Quotation - {category.replace('_', ' ').title()}"
 
     rfq_document = {
         "rfq_id": rfq_id,
-        "title": f"Request for Quotation - {category.replace('_', ' ').title()}",
+        "title": title,
         "created_date": datetime.now().isoformat(),
         "deadline": fields.get("deadline", "2 weeks from issue date"),
         "requirements": fields,
-        "evaluation_criteria": [
-            {"criterion": "Price", "weight": 40},
-            {"criterion": "Technical Compliance", "weight": 30},
-            {"criterion": "Delivery Timeline", "weight": 20},
-            {"criterion": "Vendor Performance History", "weight": 10}
-        ],
+        "evaluation_criteria": evaluation_criteria(),
         "vendors_invited": request.vendor_ids,
         "terms_and_conditions": [
             "All prices should be inclusive of applicable taxes",
@@ -328,11 +347,30 @@ def generate_rfq(request: RFQGenerateRequest, db: Session = Depends(get_db)):
         ]
     }
 
+    # Persist the RFQ as a sourcing request; bids attach to it
+    now = datetime.utcnow()
+    db.add(SourcingRequest(
+        ariba_id=rfq_id,
+        requirement_description=title,
+        project_description="\n".join(f"{k.replace('_', ' ').title()}: {v}" for k, v in fields.items()),
+        category=(VENDOR_CATEGORIES.get(category) or [None])[0],
+        subcategory=category,
+        requestor_name=conversation.user_id,
+        estimated_value=requirements.get("entities", {}).get("budget"),
+        request_submitted_date=now,
+        request_approved_date=now,
+        sourcing_event_start=now,
+        status=OPEN_STATUS
+    ))
+    db.commit()
+    invalidate_stats()
+
     # Update conversation
     conversation.rfq_generated = True
     conversation.rfq_id = rfq_id
     conversation.status = "rfq_sent"
-    db.commit()
+    conversation_cache.mark_dirty(conversation)
+    publish_status(conversation)
 
     # Get vendor details
     vendors = db.query(Vendor).filter(Vendor.id.in_(request.vendor_ids)).all()
@@ -352,60 +390,78 @@ def generate_rfq(request: RFQGenerateRequest, db: Session = Depends(get_db)):
         "message": f"RFQ {rfq_id} has been generated and sent to {len(vendor_details)} vendors."
     }
 
-@router.get("/rfq/{rfq_id}/bids")
-def get_rfq_bids(rfq_id: str, db: Session = Depends(get_db)):
-    """Get all bids for an RFQ (mock data for demo)"""
-    # In production, this would query actual bid submissions
-    mock_bids = [
-        {
-            "bid_id": f"BID-{rfq_id}-001",
-            "vendor_id": 1,
-            "vendor_name": "TechSupply Solutions Pvt Ltd",
-            "bid_amount": 2350000,
-            "delivery_days": 10,
-            "technical_score": 92,
-            "is_compliant": True,
-            "submitted_at": datetime.now().isoformat()
-        },
-        {
-            "bid_id": f"BID-{rfq_id}-002",
-            "vendor_id": 2,
-            "vendor_name": "InnovateTech Systems",
-            "bid_amount": 2480000,
-            "delivery_days": 7,
-            "technical_score": 88,
-            "is_compliant": True,
-            "submitted_at": datetime.now().isoformat()
-        },
-        {
-            "bid_id": f"BID-{rfq_id}-003",
-            "vendor_id": 3,
-            "vendor_name": "SecureIT Solutions",
-            "bid_amount": 2290000,
-            "delivery_days": 14,
-            "technical_score": 85,
-            "is_compliant": True,
-            "submitted_at": datetime.now().isoformat()
-        }
-    ]
+def get_rfq(db: Session, rfq_id: str) -> SourcingRequest:
+    request = db.query(SourcingRequest).filter(SourcingRequest.ariba_id == rfq_id).first()
+    if not request:
+        raise HTTPException(status_code=404, detail="RFQ not found")
+    return request
+
+def conversation_for_rfq(db: Session, rfq_id: str) -> Optional[ConversationState]:
+    conversation_cache.flush()  # The RFQ id may still be waiting to be written
+    session_id = db.query(AgentConversation.session_id).filter(AgentConversation.rfq_id == rfq_id).scalar()
+    return conversation_cache.get(db, session_id) if session_id else None
+
+@router.post("/bids")
+def submit_bid(request: BidSubmission, db: Session = Depends(get_db)):
+    """Submit a vendor's bid for an RFQ; a later bid from the same vendor replaces it"""
+    rfq = get_rfq(db, request.rfq_id)
+    if rfq.status != OPEN_STATUS:
+        raise HTTPException(status_code=400, detail=f"RFQ {request.rfq_id} is closed ({rfq.status})")
+    if not db.query(Vendor.id).filter(Vendor.id == request.vendor_id).first():
+        raise HTTPException(status_code=404, detail="Vendor not found")
 
-    # Bid analysis
-    analysis = {
-        "lowest_bid": min(mock_bids, key=lambda x: x["bid_amount"]),
-        "highest_technical_score": max(mock_bids, key=lambda x: x["technical_score"]),
-        "fastest_delivery": min(mock_bids, key=lambda x: x["delivery_days"]),
-        "recommendation": {
-            "vendor_name": "SecureIT Solutions",
-            "reason": "Lowest price while meeting all technical requirements",
-            "potential_savings": 190000
-        }
+    lines = [line.model_dump() for line in request.line_items or []]
+    if len({line["line_no"] for line in lines}) != len(lines):
+        raise HTTPException(status_code=400, detail="Line numbers must be unique within a bid")
+    if any(line["quantity"] <= 0 or line["unit_price"] < 0 for line in lines):
+        raise HTTPException(status_code=400, detail="Line items need a positive quantity and a non-negative price")
+    bid_amount = request.bid_amount
+    if bid_amount is None:
+        if not lines:
+            raise HTTPException(status_code=400, detail="Provide bid_amount or line_items")
+        bid_amount = round(sum(line["quantity"] * line["unit_price"] for line in lines), 2)
+    if bid_amount <= 0 or request.delivery_days <= 0:
+        raise HTTPException(status_code=400, detail="bid_amount and delivery_days must be positive")
+    if request.technical_score is not None and not 0 <= request.technical_score <= 100:
+        raise HTTPException(status_code=400, detail="technical_score must be between 0 and 100")
+
+    bid = record_bid(
+        db, rfq, request.vendor_id, bid_amount, request.delivery_days, request.technical_score,
+        request.is_compliant, request.technical_notes, lines
+    )
+    submitted = {
+        "bid_id": bid.bid_id,
+        "rfq_id": request.rfq_id,
+        "vendor_id": request.vendor_id,
+        "bid_amount": bid_amount,
+        "delivery_days": request.delivery_days,
+        "line_items": len(lines),
+        "status": "Submitted"
     }
 
+    conversation = conversation_for_rfq(db, request.rfq_id)
+    if conversation:
+        event_hub.publish(conversation.session_id, "bid", submitted)
+        if conversation.status != "bids_received":
+            conversation.status = "bids_received"
+            conversation_cache.mark_dirty(conversation)
+            publish_status(conversation)
+
+    return submitted
+
+@router.get("/rfq/{rfq_id}/bids")
+def get_rfq_bids(rfq_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Get all bids for an RFQ, ranked by weighted evaluation score"""
+    rfq = get_rfq(db, rfq_id)
+    evaluation = evaluate_rfq(db, rfq, background_tasks)
+
     return {
         "rfq_id": rfq_id,
-        "bids": mock_bids,
-        "analysis": analysis,
-        "status": "Bids Received"
+        "evaluation_criteria": evaluation["evaluation_criteria"],
+        "bids": evaluation["bids"],
+        "analysis": evaluation["analysis"],
+        "status": AWARDED_STATUS if rfq.status == AWARDED_STATUS
+                  else "Bids Received" if evaluation["bids"] else "Awaiting Bids"
     }
 
 @router.post("/negotiate")
@@ -436,6 +492,10 @@ def award_contract(rfq_id: str, vendor_id: int, db: Session = Depends(get_db)):
     if not vendor:
         raise HTTPException(status_code=404, detail="Vendor not found")
 
+    rfq = get_rfq(db, rfq_id)
+    if rfq.status != OPEN_STATUS:
+        raise HTTPException(status_code=400, detail=f"RFQ {rfq_id} is closed ({rfq.status})")
+
     award_details = {
         "rfq_id": rfq_id,
         "awarded_to": {
@@ -452,30 +512,76 @@ def award_contract(rfq_id: str, vendor_id: int, db: Session = Depends(get_db)):
         "status": "Awarded"
     }
 
-    return award_details
+    rfq.awarded_vendor_id = vendor.id
+    rfq.award_decision_date = datetime.utcnow()
+    rfq.status = AWARDED_STATUS
+    db.commit()
 
-@router.get("/status-updates/{session_id}")
-def get_status_updates(session_id: str, db: Session = Depends(get_db)):
-    """Get procurement status updates for stakeholder communication"""
-    conversation = db.query(AgentConversation).filter(
-        AgentConversation.session_id == session_id
-    ).first()
+    conversation = conversation_for_rfq(db, rfq_id)
+    if conversation:
+        conversation.status = "awarded"
+        conversation_cache.mark_dirty(conversation)
+        event_hub.publish(conversation.session_id, "award", award_details)
+        publish_status(conversation)
 
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Session not found")
+    return award_details
 
+def status_snapshot(conversation: ConversationState) -> dict:
+    """Procurement status timeline for a conversation"""
     # Mock status timeline
     statuses = [
         {"status": "Requirement Confirmed", "date": datetime.now().isoformat(), "completed": True},
         {"status": "RFQ Sent to Suppliers", "date": datetime.now().isoformat(), "completed": conversation.rfq_generated},
-        {"status": "Bids Received", "date": None, "completed": False},
-        {"status": "Award Decision Made", "date": None, "completed": False},
+        {"status": "Bids Received", "date": None, "completed": conversation.status in ("bids_received", "awarded")},
+        {"status": "Award Decision Made", "date": None, "completed": conversation.status == "awarded"},
         {"status": "PO Number Generated", "date": None, "completed": False}
     ]
 
     return {
-        "session_id": session_id,
+        "session_id": conversation.session_id,
         "rfq_id": conversation.rfq_id,
         "current_status": conversation.status,
         "timeline": statuses
     }
+
+def publish_status(conversation: ConversationState) -> None:
+    event_hub.publish(conversation.session_id, "status", status_snapshot(conversation))
+
+def publish_message(conversation: ConversationState, message: dict) -> None:
+    event_hub.publish(conversation.session_id, "message", {
+        "role": message["role"],
+        "content": message["content"],
+        "timestamp": message["timestamp"].isoformat()
+    })
+
+@router.get("/status-updates/{session_id}")
+def get_status_updates(session_id: str, db: Session = Depends(get_db)):
+    """Get procurement status updates for stakeholder communication"""
+    conversation = conversation_cache.get(db, session_id)
+
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    return status_snapshot(conversation)
+
+@router.get("/events/{session_id}")
+async def stream_session_events(session_id: str, last_event_id: Optional[int] = Header(None)):
+    """Server-sent events for a session, in place of polling /status-updates
+
+    Starts with a ``status`` snapshot, then sends ``message``, ``status`` and
+    ``award`` events as they happen. EventSource reconnects resend
+    Last-Event-ID and receive the events they missed. The stream holds no
+    database session.
+    """
+    def load():
+        with SessionLocal() as db:
+            return conversation_cache.get(db, session_id)
+
+    conversation = await run_in_threadpool(load)
+
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    return sse_response(event_hub.stream(
+        session_id, last_event_id, lambda: ("status", status_snapshot(conversation))
+    ))
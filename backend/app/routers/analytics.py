@@ -1,18 +1,28 @@
 """
 Use Case 3: AI-Powered Procurement Insights and Decision Support API
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, desc
+from sqlalchemy import func, and_, desc, select
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pydantic import BaseModel
-import json
 import random
 
+import numpy as np
+
 from app.models.database import (
-    get_db, SpendRecord, Vendor, Invoice, PurchaseOrder, Contract,
-    KPIMetric, ProcurementTransaction
+    get_db, get_async_db, SpendRecord, SpendCube, Vendor, Invoice, Contract,
+    KPIMetric, ProcurementTransaction, SupplierScorecard
+)
+from app.services.spend_cube import refresh_spend_cube, cube_freshness
+from app.services.forecasting import Z_95, forecast_demand, month_index, month_label
+from app.services.anomaly_engine import BASELINES, DEFAULT_THRESHOLD, METHODS, detect_anomalies
+from app.services.loaders import BatchLoader, get_loader
+from app.services.exports import COMPRESSION_PATTERN, FORMAT_PATTERN, export_columns, export_response
+from app.services.supplier_scorecards import (
+    categories_of, category_ranking, rank_score, refresh_supplier_scorecards, scorecard_freshness
 )
 
 router = APIRouter(prefix="/api/analytics", tags=["Procurement Analytics"])
@@ -31,125 +41,147 @@ CATEGORIES = {
 }
 
 @router.get("/spend/overview")
-def get_spend_overview(
-    db: Session = Depends(get_db),
+async def get_spend_overview(
+    db: AsyncSession = Depends(get_async_db),
     fiscal_year: Optional[str] = None,
     business_unit: Optional[str] = None
 ):
     """Get overall spend analytics overview"""
-    query = db.query(SpendRecord)
+    state = await db.run_sync(refresh_spend_cube)
 
+    filters = []
     if fiscal_year:
-        query = query.filter(SpendRecord.fiscal_year == fiscal_year)
+        filters.append(SpendCube.fiscal_year == fiscal_year)
     if business_unit:
-        query = query.filter(SpendRecord.business_unit == business_unit)
-
-    records = query.all()
+        filters.append(SpendCube.business_unit == business_unit)
 
     # Total spend
-    total_spend = sum(r.amount for r in records)
+    total_spend = await db.scalar(select(func.sum(SpendCube.total_amount)).where(*filters)) or 0
 
     # Spend by category
-    category_spend = {}
-    for record in records:
-        cat = record.category
-        if cat not in category_spend:
-            category_spend[cat] = 0
-        category_spend[cat] += record.amount
+    category_amount = func.sum(SpendCube.total_amount).label("amount")
+    category_spend = (await db.execute(
+        select(SpendCube.category, category_amount).where(*filters)
+        .group_by(SpendCube.category).order_by(desc(category_amount))
+    )).all()
 
     # Spend by business unit
-    bu_spend = {}
-    for record in records:
-        bu = record.business_unit
-        if bu not in bu_spend:
-            bu_spend[bu] = 0
-        bu_spend[bu] += record.amount
-
-    # Top vendors by spend
-    vendor_spend = {}
-    for record in records:
-        vid = record.vendor_id
-        if vid not in vendor_spend:
-            vendor = db.query(Vendor).filter(Vendor.id == vid).first()
-            vendor_spend[vid] = {
-                "vendor_id": vid,
-                "vendor_name": vendor.vendor_name if vendor else "Unknown",
-                "amount": 0
-            }
-        vendor_spend[vid]["amount"] += record.amount
-
-    top_vendors = sorted(vendor_spend.values(), key=lambda x: x["amount"], reverse=True)[:10]
+    bu_amount = func.sum(SpendCube.total_amount).label("amount")
+    bu_spend = (await db.execute(
+        select(SpendCube.business_unit, bu_amount).where(*filters)
+        .group_by(SpendCube.business_unit).order_by(desc(bu_amount))
+    )).all()
+
+    # Top vendors by spend, names resolved in the same statement
+    vendor_amount = func.sum(SpendCube.total_amount).label("amount")
+    top_vendors = (await db.execute(
+        select(SpendCube.vendor_id, Vendor.vendor_name, vendor_amount)
+        .outerjoin(Vendor, Vendor.id == SpendCube.vendor_id).where(*filters)
+        .group_by(SpendCube.vendor_id, Vendor.vendor_name)
+        .order_by(desc(vendor_amount)).limit(10)
+    )).all()
 
     # Monthly trend
-    monthly_trend = {}
-    for record in records:
-        month_key = record.spend_date.strftime("%Y-%m") if record.spend_date else "Unknown"
-        if month_key not in monthly_trend:
-            monthly_trend[month_key] = 0
-        monthly_trend[month_key] += record.amount
+    monthly_trend = (await db.execute(
+        select(SpendCube.month, func.sum(SpendCube.total_amount)).where(*filters)
+        .group_by(SpendCube.month).order_by(SpendCube.month)
+    )).all()
 
     return {
         "total_spend": total_spend,
         "currency": "INR",
         "spend_by_category": [
             {"category": k, "amount": v, "percentage": round(v/total_spend*100, 1) if total_spend > 0 else 0}
-            for k, v in sorted(category_spend.items(), key=lambda x: x[1], reverse=True)
+            for k, v in category_spend
         ],
         "spend_by_business_unit": [
             {"business_unit": k, "amount": v, "percentage": round(v/total_spend*100, 1) if total_spend > 0 else 0}
-            for k, v in sorted(bu_spend.items(), key=lambda x: x[1], reverse=True)
+            for k, v in bu_spend
+        ],
+        "top_vendors": [
+            {"vendor_id": vid, "vendor_name": name or "Unknown", "amount": amount}
+            for vid, name, amount in top_vendors
         ],
-        "top_vendors": top_vendors,
         "monthly_trend": [
             {"month": k, "amount": v}
-            for k, v in sorted(monthly_trend.items())
-        ]
+            for k, v in monthly_trend
+        ],
+        "freshness": cube_freshness(state)
     }
 
+@router.get("/spend/export")
+def export_spend_records(
+    export_format: str = Query("csv", alias="format", pattern=FORMAT_PATTERN),
+    columns: Optional[str] = None,
+    compression: str = Query("none", pattern=COMPRESSION_PATTERN),
+    category: Optional[str] = None,
+    business_unit: Optional[str] = None,
+    vendor_id: Optional[int] = None,
+    fiscal_year: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+):
+    """Stream spend records as CSV, NDJSON or Parquet
+
+    ``columns`` is a comma-separated projection; ``date_to`` is inclusive.
+    """
+    filters = []
+    if category:
+        filters.append(SpendRecord.category == category)
+    if business_unit:
+        filters.append(SpendRecord.business_unit == business_unit)
+    if vendor_id:
+        filters.append(SpendRecord.vendor_id == vendor_id)
+    if fiscal_year:
+        filters.append(SpendRecord.fiscal_year == fiscal_year)
+    if date_from:
+        filters.append(SpendRecord.spend_date >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        filters.append(SpendRecord.spend_date < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    return export_response(
+        SpendRecord, export_columns(SpendRecord, columns), filters,
+        export_format, compression, "spend_records"
+    )
+
 @router.get("/spend/categorization")
 def get_ai_categorization(db: Session = Depends(get_db)):
     """Get AI-powered spend categorization results"""
-    records = db.query(SpendRecord).all()
+    state = refresh_spend_cube(db)
 
-    categorized = [r for r in records if r.ai_categorized]
-    uncategorized = [r for r in records if not r.ai_categorized]
+    total_records, categorized, high, medium, low = db.query(
+        func.coalesce(func.sum(SpendCube.record_count), 0),
+        func.coalesce(func.sum(SpendCube.ai_categorized_count), 0),
+        func.coalesce(func.sum(SpendCube.high_confidence_count), 0),
+        func.coalesce(func.sum(SpendCube.medium_confidence_count), 0),
+        func.coalesce(func.sum(SpendCube.low_confidence_count), 0)
+    ).one()
 
     # Confidence distribution
     confidence_buckets = {
-        "High (>90%)": 0,
-        "Medium (75-90%)": 0,
-        "Low (<75%)": 0
+        "High (>90%)": high,
+        "Medium (75-90%)": medium,
+        "Low (<75%)": low
     }
 
-    for record in categorized:
-        if record.confidence_score > 0.9:
-            confidence_buckets["High (>90%)"] += 1
-        elif record.confidence_score > 0.75:
-            confidence_buckets["Medium (75-90%)"] += 1
-        else:
-            confidence_buckets["Low (<75%)"] += 1
-
     # Category hierarchy
     hierarchy = {}
-    for record in records:
-        cat = record.category
-        subcat = record.subcategory
+    subcategory_spend = db.query(
+        SpendCube.category, SpendCube.subcategory, func.sum(SpendCube.total_amount)
+    ).group_by(SpendCube.category, SpendCube.subcategory).all()
 
+    for cat, subcat, amount in subcategory_spend:
         if cat not in hierarchy:
             hierarchy[cat] = {"total": 0, "subcategories": {}}
-
-        hierarchy[cat]["total"] += record.amount
-
-        if subcat not in hierarchy[cat]["subcategories"]:
-            hierarchy[cat]["subcategories"][subcat] = 0
-        hierarchy[cat]["subcategories"][subcat] += record.amount
+        hierarchy[cat]["total"] += amount
+        hierarchy[cat]["subcategories"][subcat] = amount
 
     return {
         "categorization_stats": {
-            "total_records": len(records),
-            "ai_categorized": len(categorized),
-            "pending_review": len(uncategorized),
-            "categorization_rate": round(len(categorized)/len(records)*100, 1) if records else 0
+            "total_records": total_records,
+            "ai_categorized": categorized,
+            "pending_review": total_records - categorized,
+            "categorization_rate": round(categorized/total_records*100, 1) if total_records else 0
         },
         "confidence_distribution": confidence_buckets,
         "category_hierarchy": [
@@ -162,120 +194,110 @@ def get_ai_categorization(db: Session = Depends(get_db)):
                 ]
             }
             for cat, data in sorted(hierarchy.items(), key=lambda x: x[1]["total"], reverse=True)
-        ]
+        ],
+        "freshness": cube_freshness(state)
     }
 
 @router.get("/spend/anomalies")
-def detect_spend_anomalies(db: Session = Depends(get_db)):
-    """Detect spending anomalies and maverick spend"""
-    records = db.query(SpendRecord).all()
+def detect_spend_anomalies(
+    db: Session = Depends(get_db),
+    loader: BatchLoader = Depends(get_loader),
+    method: str = "mad",
+    baseline: str = "category",
+    threshold: float = DEFAULT_THRESHOLD,
+    sort: str = "amount",
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Detect spending anomalies and maverick spend
 
-    anomalies = []
+    Unusual amounts are rows whose robust z-score (median/MAD, or IQR) against
+    their ``baseline`` group exceeds ``threshold``. Baselines are per category,
+    per vendor within a category, or per month within a category.
+    """
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {', '.join(METHODS)}")
+    if baseline not in BASELINES:
+        raise HTTPException(status_code=400, detail=f"baseline must be one of {', '.join(BASELINES)}")
+    if sort not in ("amount", "score"):
+        raise HTTPException(status_code=400, detail="sort must be amount or score")
+
+    result = detect_anomalies(db, method, baseline, threshold, sort, skip, limit)
 
-    # Maverick spend detection
-    maverick_records = [r for r in records if r.is_maverick_spend]
+    records = loader.prime(SpendRecord, [record_id for record_id, _, _ in result["page"]])
+    loader.prime(Vendor, [r.vendor_id for r in records.values() if r is not None])
 
-    for record in maverick_records:
-        vendor = db.query(Vendor).filter(Vendor.id == record.vendor_id).first()
+    anomalies = []
+    for record_id, anomaly_type, score in result["page"]:
+        record = loader.get(SpendRecord, record_id)
+        if record is None:  # Deleted, but still in the process-wide spend columns
+            continue
+        vendor = loader.get(Vendor, record.vendor_id)
+        if anomaly_type == "Maverick Spend":
+            severity = "Medium"
+            description = "Purchase from non-preferred vendor"
+        else:
+            severity = "High" if score >= threshold * 2 else "Medium"
+            description = f"Amount is {score} robust z-scores above the {baseline} baseline"
         anomalies.append({
-            "type": "Maverick Spend",
-            "severity": "Medium",
+            "spend_record_id": record_id,
+            "type": anomaly_type,
+            "severity": severity,
             "amount": record.amount,
             "category": record.category,
             "vendor_name": vendor.vendor_name if vendor else "Unknown",
-            "description": "Purchase from non-preferred vendor",
+            "description": description,
+            "robust_z": score,
             "spend_date": record.spend_date.isoformat() if record.spend_date else None
         })
 
-    # Unusual amount detection (amounts > 2x category average)
-    category_avgs = {}
-    for record in records:
-        cat = record.category
-        if cat not in category_avgs:
-            category_avgs[cat] = {"total": 0, "count": 0}
-        category_avgs[cat]["total"] += record.amount
-        category_avgs[cat]["count"] += 1
-
-    for cat in category_avgs:
-        category_avgs[cat]["avg"] = category_avgs[cat]["total"] / category_avgs[cat]["count"]
-
-    for record in records:
-        cat_avg = category_avgs.get(record.category, {}).get("avg", 0)
-        if cat_avg > 0 and record.amount > cat_avg * 2.5:
-            vendor = db.query(Vendor).filter(Vendor.id == record.vendor_id).first()
-            anomalies.append({
-                "type": "Unusual Amount",
-                "severity": "High",
-                "amount": record.amount,
-                "category": record.category,
-                "vendor_name": vendor.vendor_name if vendor else "Unknown",
-                "description": f"Amount is {round(record.amount/cat_avg, 1)}x the category average",
-                "spend_date": record.spend_date.isoformat() if record.spend_date else None
-            })
-
-    # Summary stats
-    total_anomaly_value = sum(a["amount"] for a in anomalies)
-    total_spend = sum(r.amount for r in records)
-
     return {
-        "summary": {
-            "total_anomalies": len(anomalies),
-            "total_anomaly_value": total_anomaly_value,
-            "percentage_of_spend": round(total_anomaly_value/total_spend*100, 2) if total_spend > 0 else 0
-        },
-        "by_type": {
-            "Maverick Spend": len([a for a in anomalies if a["type"] == "Maverick Spend"]),
-            "Unusual Amount": len([a for a in anomalies if a["type"] == "Unusual Amount"])
-        },
-        "anomalies": sorted(anomalies, key=lambda x: x["amount"], reverse=True)[:50]
+        "summary": result["summary"],
+        "by_type": result["by_type"],
+        "method": method,
+        "baseline": baseline,
+        "threshold": threshold,
+        "skip": skip,
+        "limit": limit,
+        "anomalies": anomalies
     }
 
 @router.get("/spend/tail-spend")
 def analyze_tail_spend(db: Session = Depends(get_db)):
     """Analyze tail spend and consolidation opportunities"""
-    records = db.query(SpendRecord).all()
-    tail_records = [r for r in records if r.is_tail_spend]
+    state = refresh_spend_cube(db)
 
-    total_spend = sum(r.amount for r in records)
-    tail_spend = sum(r.amount for r in tail_records)
+    total_spend, tail_spend, tail_transactions = db.query(
+        func.coalesce(func.sum(SpendCube.total_amount), 0),
+        func.coalesce(func.sum(SpendCube.tail_amount), 0),
+        func.coalesce(func.sum(SpendCube.tail_count), 0)
+    ).one()
 
     # Vendor fragmentation in tail spend
-    tail_vendors = {}
-    for record in tail_records:
-        vid = record.vendor_id
-        if vid not in tail_vendors:
-            vendor = db.query(Vendor).filter(Vendor.id == vid).first()
-            tail_vendors[vid] = {
-                "vendor_id": vid,
-                "vendor_name": vendor.vendor_name if vendor else "Unknown",
-                "amount": 0,
-                "transaction_count": 0
-            }
-        tail_vendors[vid]["amount"] += record.amount
-        tail_vendors[vid]["transaction_count"] += 1
+    tail_amount = func.sum(SpendCube.tail_amount).label("amount")
+    tail_vendors = db.query(
+        SpendCube.vendor_id, Vendor.vendor_name, tail_amount, func.sum(SpendCube.tail_count)
+    ).outerjoin(Vendor, Vendor.id == SpendCube.vendor_id).filter(
+        SpendCube.tail_count > 0
+    ).group_by(SpendCube.vendor_id, Vendor.vendor_name).order_by(desc(tail_amount)).all()
 
     # Consolidation opportunities
     consolidation_opportunities = []
-    category_vendors = {}
-
-    for record in tail_records:
-        cat = record.category
-        vid = record.vendor_id
-
-        if cat not in category_vendors:
-            category_vendors[cat] = set()
-        category_vendors[cat].add(vid)
-
-    for cat, vendors in category_vendors.items():
-        if len(vendors) > 3:
-            cat_spend = sum(r.amount for r in tail_records if r.category == cat)
+    category_vendors = db.query(
+        SpendCube.category,
+        func.count(func.distinct(SpendCube.vendor_id)),
+        func.sum(SpendCube.tail_amount)
+    ).filter(SpendCube.tail_count > 0).group_by(SpendCube.category).all()
+
+    for cat, vendor_count, cat_spend in category_vendors:
+        if vendor_count > 3:
             consolidation_opportunities.append({
                 "category": cat,
-                "current_vendor_count": len(vendors),
-                "recommended_vendor_count": min(3, len(vendors)),
+                "current_vendor_count": vendor_count,
+                "recommended_vendor_count": min(3, vendor_count),
                 "current_spend": cat_spend,
                 "potential_savings": round(cat_spend * 0.15, 2),  # Estimated 15% savings
-                "recommendation": f"Consolidate from {len(vendors)} to 3 preferred vendors"
+                "recommendation": f"Consolidate from {vendor_count} to 3 preferred vendors"
             })
 
     return {
@@ -283,121 +305,122 @@ def analyze_tail_spend(db: Session = Depends(get_db)):
             "total_tail_spend": tail_spend,
             "percentage_of_total": round(tail_spend/total_spend*100, 1) if total_spend > 0 else 0,
             "tail_vendor_count": len(tail_vendors),
-            "tail_transaction_count": len(tail_records)
+            "tail_transaction_count": tail_transactions
         },
-        "vendor_distribution": sorted(tail_vendors.values(), key=lambda x: x["amount"], reverse=True)[:20],
+        "vendor_distribution": [
+            {
+                "vendor_id": vid,
+                "vendor_name": name or "Unknown",
+                "amount": amount,
+                "transaction_count": count
+            }
+            for vid, name, amount, count in tail_vendors[:20]
+        ],
         "consolidation_opportunities": sorted(
             consolidation_opportunities,
             key=lambda x: x["potential_savings"],
             reverse=True
-        )
+        ),
+        "freshness": cube_freshness(state)
     }
 
 @router.get("/suppliers/risk")
-def get_supplier_risk_analysis(db: Session = Depends(get_db)):
+def get_supplier_risk_analysis(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Get comprehensive supplier risk analysis"""
-    vendors = db.query(Vendor).filter(Vendor.is_active == True).all()
+    state = refresh_supplier_scorecards(db, background_tasks)
+    active = SupplierScorecard.is_active == True
 
-    risk_distribution = {
-        "Low": [],
-        "Medium": [],
-        "High": []
-    }
-
-    for vendor in vendors:
-        # Calculate composite risk score
-        risk_level = "Low" if vendor.risk_score < 40 else "Medium" if vendor.risk_score < 70 else "High"
-
-        vendor_data = {
-            "vendor_id": vendor.id,
-            "vendor_name": vendor.vendor_name,
-            "vendor_code": vendor.vendor_code,
-            "risk_score": vendor.risk_score,
-            "performance_score": vendor.performance_score,
-            "compliance_status": vendor.compliance_status,
-            "risk_factors": []
-        }
+    band_counts = dict(db.query(SupplierScorecard.risk_band, func.count(SupplierScorecard.id)).filter(
+        active
+    ).group_by(SupplierScorecard.risk_band).all())
 
-        # Add risk factors
-        if vendor.risk_score > 60:
-            vendor_data["risk_factors"].append("High internal risk score")
-        if vendor.performance_score < 60:
-            vendor_data["risk_factors"].append("Poor performance history")
-        if vendor.compliance_status != "Compliant":
-            vendor_data["risk_factors"].append("Compliance issues")
-
-        risk_distribution[risk_level].append(vendor_data)
-
-    # Calculate total spend at risk
-    high_risk_vendor_ids = [v["vendor_id"] for v in risk_distribution["High"]]
-    high_risk_spend = db.query(func.sum(SpendRecord.amount)).filter(
-        SpendRecord.vendor_id.in_(high_risk_vendor_ids)
+    high_risk_spend = db.query(func.sum(SupplierScorecard.spend_record_amount)).filter(
+        active, SupplierScorecard.risk_band == "High"
     ).scalar() or 0
 
+    def band_vendors(band: str) -> list:
+        cards = db.query(SupplierScorecard).filter(
+            active, SupplierScorecard.risk_band == band
+        ).order_by(SupplierScorecard.vendor_id).limit(10).all()
+        return [{
+            "vendor_id": card.vendor_id,
+            "vendor_name": card.vendor_name,
+            "vendor_code": card.vendor_code,
+            "risk_score": card.risk_score,
+            "performance_score": card.performance_score,
+            "compliance_status": card.compliance_status,
+            "risk_factors": [factor for factor, applies in (
+                ("High internal risk score", card.risk_score > 60),
+                ("Poor performance history", card.performance_score < 60),
+                ("Compliance issues", card.compliance_status != "Compliant"),
+            ) if applies]
+        } for card in cards]
+
     return {
         "summary": {
-            "total_suppliers": len(vendors),
-            "high_risk_count": len(risk_distribution["High"]),
-            "medium_risk_count": len(risk_distribution["Medium"]),
-            "low_risk_count": len(risk_distribution["Low"]),
+            "total_suppliers": sum(band_counts.values()),
+            "high_risk_count": band_counts.get("High", 0),
+            "medium_risk_count": band_counts.get("Medium", 0),
+            "low_risk_count": band_counts.get("Low", 0),
             "spend_at_high_risk": high_risk_spend
         },
         "risk_distribution": {
-            "high": risk_distribution["High"][:10],
-            "medium": risk_distribution["Medium"][:10],
-            "low": risk_distribution["Low"][:10]
-        }
+            "high": band_vendors("High"),
+            "medium": band_vendors("Medium"),
+            "low": band_vendors("Low")
+        },
+        "freshness": scorecard_freshness(state)
     }
 
 @router.get("/suppliers/{vendor_id}/performance")
-def get_supplier_performance(vendor_id: int, db: Session = Depends(get_db)):
+def get_supplier_performance(vendor_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Get detailed supplier performance scorecard"""
-    vendor = db.query(Vendor).filter(Vendor.id == vendor_id).first()
+    state = refresh_supplier_scorecards(db, background_tasks)
+    card = db.query(SupplierScorecard).filter(SupplierScorecard.vendor_id == vendor_id).first()
 
-    if not vendor:
+    if not card:
         return {"error": "Vendor not found"}
 
-    # Get all invoices for this vendor
-    invoices = db.query(Invoice).filter(Invoice.vendor_id == vendor_id).all()
-    pos = db.query(PurchaseOrder).filter(PurchaseOrder.vendor_id == vendor_id).all()
-
-    # Calculate KPIs
-    total_invoices = len(invoices)
-    on_time_payments = len([i for i in invoices if i.payment_date and i.due_date and i.payment_date <= i.due_date])
-
-    delivered_pos = [p for p in pos if p.actual_delivery_date]
-    on_time_deliveries = len([p for p in delivered_pos if p.actual_delivery_date <= p.expected_delivery_date])
-
     return {
         "vendor_info": {
-            "vendor_id": vendor.id,
-            "vendor_name": vendor.vendor_name,
-            "vendor_code": vendor.vendor_code,
-            "categories": json.loads(vendor.categories) if vendor.categories else []
+            "vendor_id": card.vendor_id,
+            "vendor_name": card.vendor_name,
+            "vendor_code": card.vendor_code,
+            "categories": categories_of(card)
         },
         "overall_scores": {
-            "performance_score": vendor.performance_score,
-            "risk_score": vendor.risk_score,
-            "compliance_status": vendor.compliance_status
+            "performance_score": card.performance_score,
+            "risk_score": card.risk_score,
+            "risk_band": card.risk_band,
+            "compliance_status": card.compliance_status
         },
         "kpis": {
             "delivery_performance": {
-                "on_time_rate": round(on_time_deliveries/len(delivered_pos)*100, 1) if delivered_pos else 0,
-                "total_orders": len(pos),
-                "delivered": len(delivered_pos)
+                "on_time_rate": card.on_time_delivery_rate,
+                "total_orders": card.po_count,
+                "delivered": card.delivered_po_count
             },
             "payment_adherence": {
-                "on_time_rate": round(on_time_payments/total_invoices*100, 1) if total_invoices else 0,
-                "total_invoices": total_invoices
+                "on_time_rate": card.on_time_payment_rate,
+                "total_invoices": card.invoice_count
             },
             "quality_score": round(random.uniform(80, 98), 1),  # Mock data
             "responsiveness_score": round(random.uniform(75, 95), 1)  # Mock data
         },
         "spend_history": {
-            "total_spend": sum(i.total_amount for i in invoices),
-            "transaction_count": total_invoices,
-            "average_transaction": round(sum(i.total_amount for i in invoices)/total_invoices, 2) if total_invoices else 0
-        }
+            "total_spend": card.total_spend,
+            "rolling_12m_spend": card.rolling_spend,
+            "transaction_count": card.invoice_count,
+            "average_transaction": round(card.total_spend/card.invoice_count, 2) if card.invoice_count else 0,
+            "last_invoice_date": card.last_invoice_date.isoformat() if card.last_invoice_date else None
+        },
+        "leakage": {
+            "total_cases": card.leakage_case_count,
+            "open_cases": card.open_leakage_count,
+            "leakage_amount": card.leakage_amount,
+            "recovered_amount": card.recovered_amount
+        },
+        "freshness": scorecard_freshness(state)
     }
 
 @router.get("/contracts/compliance")
@@ -453,94 +476,130 @@ def get_contract_compliance(db: Session = Depends(get_db)):
     }
 
 @router.get("/forecast/demand")
-def get_demand_forecast(db: Session = Depends(get_db)):
-    """Get AI-powered demand forecasting"""
-    records = db.query(SpendRecord).all()
-
-    # Group by month
-    monthly_data = {}
-    for record in records:
-        if record.spend_date:
-            month_key = record.spend_date.strftime("%Y-%m")
-            if month_key not in monthly_data:
-                monthly_data[month_key] = 0
-            monthly_data[month_key] += record.amount
-
-    # Generate forecast (simple moving average + growth)
-    historical = sorted(monthly_data.items())
-    avg_growth = 0.05  # 5% monthly growth assumption
-
-    forecast = []
-    if historical:
-        last_value = historical[-1][1]
-        last_date = datetime.strptime(historical[-1][0], "%Y-%m")
-
-        for i in range(1, 7):
-            forecast_date = last_date + timedelta(days=30*i)
-            forecast_value = last_value * (1 + avg_growth * i)
-            forecast.append({
-                "month": forecast_date.strftime("%Y-%m"),
-                "forecasted_amount": round(forecast_value, 2),
-                "confidence_interval": {
-                    "lower": round(forecast_value * 0.9, 2),
-                    "upper": round(forecast_value * 1.1, 2)
-                }
-            })
-
-    # Category-wise forecast
+def get_demand_forecast(db: Session = Depends(get_db), horizon: int = Query(6, ge=1, le=24)):
+    """Get AI-powered demand forecasting
+
+    Per category and business unit smoothing models, summed bottom-up.
+    ``model_accuracy`` is 1 - WAPE from a holdout backtest.
+    """
+    state = refresh_spend_cube(db)
+    result = forecast_demand(db, horizon)
+
+    months = result["months"]
+    history = result["history"]
+    closed = len(next(iter(history.values()))) - 1 if history else 0
+
+    total_history = sum(history.values()) if history else np.zeros(0)
+    historical = [
+        {"month": month_label(month_index(result["first_month"]) + i), "amount": float(amount)}
+        for i, amount in enumerate(total_history)
+    ] if history else []
+
+    total_forecast = np.zeros(horizon)
+    total_variance = np.zeros(horizon)
     category_forecast = {}
     for cat in CATEGORIES.keys():
-        cat_records = [r for r in records if r.category == cat]
-        cat_total = sum(r.amount for r in cat_records)
-        category_forecast[cat] = {
-            "current_spend": cat_total,
-            "forecasted_spend": round(cat_total * 1.08, 2),  # 8% growth
-            "growth_rate": "8%"
-        }
+        category_forecast[cat] = {"current_spend": 0, "forecasted_spend": 0, "growth_rate": "0%", "business_units": {}}
+
+    for (cat, bu), fit in result["series"].items():
+        total_forecast += fit["forecast"]
+        total_variance += fit["variance"]
+        entry = category_forecast.setdefault(
+            cat, {"current_spend": 0, "forecasted_spend": 0, "growth_rate": "0%", "business_units": {}}
+        )
+        # Same-length windows: the last ``horizon`` closed months vs the next ``horizon``
+        entry["current_spend"] += float(history[(cat, bu)][max(0, closed - horizon):closed].sum())
+        entry["forecasted_spend"] += float(fit["forecast"].sum())
+        entry["business_units"][bu] = {"forecasted_spend": round(float(fit["forecast"].sum()), 2), "model": fit["model_type"]}
 
+    for entry in category_forecast.values():
+        entry["forecasted_spend"] = round(entry["forecasted_spend"], 2)
+        if entry["current_spend"] > 0:
+            growth = (entry["forecasted_spend"] / entry["current_spend"] - 1) * 100
+            entry["growth_rate"] = f"{round(growth, 1)}%"
+
+    forecast = []
+    for i, month in enumerate(months):
+        margin = Z_95 * float(np.sqrt(total_variance[i]))
+        forecast.append({
+            "month": month,
+            "forecasted_amount": round(float(total_forecast[i]), 2),
+            "confidence_interval": {
+                "lower": round(max(float(total_forecast[i]) - margin, 0), 2),
+                "upper": round(float(total_forecast[i]) + margin, 2)
+            }
+        })
+
+    wape = result["backtest"]["wape"] if result["backtest"] else None
     return {
-        "historical": [{"month": k, "amount": v} for k, v in historical[-12:]],
+        "historical": historical[-12:],
         "forecast": forecast,
         "category_forecast": category_forecast,
-        "model_accuracy": 0.87,  # Mock accuracy score
-        "last_updated": datetime.now().isoformat()
+        "model_accuracy": round(max(0.0, 1 - wape), 4) if wape is not None else None,
+        "backtest": result["backtest"],
+        "last_closed_month": result["last_closed_month"],
+        "models": result["models"],
+        "last_updated": datetime.now().isoformat(),
+        "freshness": cube_freshness(state)
     }
 
 @router.get("/decision-support/supplier-recommendation")
 def get_supplier_recommendations(
     category: str,
+    background_tasks: BackgroundTasks,
     budget: Optional[float] = None,
     db: Session = Depends(get_db)
 ):
     """Get AI-powered supplier recommendations for a category"""
-    vendors = db.query(Vendor).filter(Vendor.is_active == True).all()
+    state = refresh_supplier_scorecards(db, background_tasks)
+
+    # Category expertise adds a fixed bonus, so the top 5 always comes from the
+    # best 5 specialists and the best 5 overall by performance and risk. Scores
+    # are rounded to 0.1 before ranking, so near-ties of the 5th are kept too.
+    # Specialists come from the vendor-category index.
+    base_score = rank_score(SupplierScorecard.performance_score, SupplierScorecard.risk_score)
+    ranked = db.query(SupplierScorecard).filter(SupplierScorecard.is_active == True).order_by(
+        desc(base_score), SupplierScorecard.vendor_id
+    )
+    cards = ranked.limit(5).all()
+    if len(cards) == 5:
+        cards = ranked.filter(base_score >= rank_score(cards[-1].performance_score, cards[-1].risk_score) - 0.1).all()
+    candidates = {card.vendor_id: card for card in cards}
+
+    specialist_ids = [v for v in category_ranking(db, state, category) if v not in candidates]
+    if specialist_ids:
+        candidates.update((card.vendor_id, card) for card in db.query(SupplierScorecard).filter(
+            SupplierScorecard.vendor_id.in_(specialist_ids)
+        ))
 
     recommendations = []
-    for vendor in vendors:
-        categories = json.loads(vendor.categories) if vendor.categories else []
+    for card in sorted(candidates.values(), key=lambda c: c.vendor_id):
+        categories = categories_of(card)
 
         # Calculate recommendation score
         category_match = 1.0 if category in categories else 0.5
-        performance_factor = vendor.performance_score / 100
-        risk_factor = (100 - vendor.risk_score) / 100
+        performance_factor = card.performance_score / 100
+        risk_factor = (100 - card.risk_score) / 100
 
         recommendation_score = (category_match * 0.3 + performance_factor * 0.4 + risk_factor * 0.3) * 100
 
         recommendations.append({
-            "vendor_id": vendor.id,
-            "vendor_name": vendor.vendor_name,
-            "vendor_code": vendor.vendor_code,
+            "vendor_id": card.vendor_id,
+            "vendor_name": card.vendor_name,
+            "vendor_code": card.vendor_code,
             "recommendation_score": round(recommendation_score, 1),
-            "performance_score": vendor.performance_score,
-            "risk_score": vendor.risk_score,
+            "performance_score": card.performance_score,
+            "risk_score": card.risk_score,
             "category_expertise": category in categories,
+            "on_time_delivery_rate": card.on_time_delivery_rate,
+            "open_leakage_cases": card.open_leakage_count,
             "justification": []
         })
 
         # Add justifications
-        if vendor.performance_score > 80:
+        if card.performance_score > 80:
             recommendations[-1]["justification"].append("Strong performance history")
-        if vendor.risk_score < 40:
+        if card.risk_score < 40:
             recommendations[-1]["justification"].append("Low risk profile")
         if category in categories:
             recommendations[-1]["justification"].append(f"Expertise in {category}")
@@ -561,16 +620,20 @@ def get_negotiation_support(
     db: Session = Depends(get_db)
 ):
     """Get AI-powered negotiation support and pricing insights"""
-    # Get historical pricing data
-    records = db.query(SpendRecord).filter(SpendRecord.category == category).all()
+    state = refresh_spend_cube(db)
 
-    if not records:
+    # Get historical pricing data
+    total, count, min_price, max_price = db.query(
+        func.sum(SpendCube.total_amount),
+        func.sum(SpendCube.record_count),
+        func.min(SpendCube.min_amount),
+        func.max(SpendCube.max_amount)
+    ).filter(SpendCube.category == category).one()
+
+    if not count:
         return {"error": "No historical data for this category"}
 
-    amounts = [r.amount for r in records]
-    avg_price = sum(amounts) / len(amounts)
-    min_price = min(amounts)
-    max_price = max(amounts)
+    avg_price = total / count
 
     # Calculate should-cost model (simplified)
     should_cost_components = {
@@ -604,5 +667,6 @@ def get_negotiation_support(
             "price_trend": "stable",
             "supply_availability": "adequate",
             "recommendation": "Favorable conditions for negotiation"
-        }
+        },
+        "freshness": cube_freshness(state)
     }
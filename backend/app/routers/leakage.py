@@ -1,18 +1,29 @@
 """
 Use Case 4: AI-Powered Post-Payment Audit & Leakage Detection API
 """
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, desc
+from sqlalchemy import func, and_, desc, select
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pydantic import BaseModel
 import json
 
 from app.models.database import (
-    get_db, LeakageCase, Invoice, PurchaseOrder, Contract, Vendor,
-    InvoiceLineItem, POLineItem
+    get_db, get_async_db, LeakageCase, Invoice, PurchaseOrder, Contract, Vendor,
+    InvoiceLineItem, POLineItem, AuditScan
 )
+from app.services.duplicate_detection import (
+    sync_index, check_invoice, find_exact_duplicate_groups, find_near_duplicate_pairs
+)
+from app.services.audit_engine import (
+    VALIDATION_RULES, DEFAULT_BATCH_SIZE, create_scan, run_scan, scan_summary
+)
+from app.services.sql_functions import month_key
+from app.services.exports import COMPRESSION_PATTERN, FORMAT_PATTERN, export_columns, export_response
+from app.services.cache import invalidate_stats
+from app.services.supplier_scorecards import mark_invoice_vendors_stale
 
 router = APIRouter(prefix="/api/leakage", tags=["Leakage Detection"])
 
@@ -23,6 +34,13 @@ class CaseUpdateRequest(BaseModel):
     recovered_amount: Optional[float] = None
     notes: Optional[str] = None
 
+class DuplicateCheckRequest(BaseModel):
+    vendor_id: int
+    invoice_number: str
+    total_amount: float
+    invoice_date: Optional[datetime] = None
+    near: bool = True
+
 class ValidationRequest(BaseModel):
     is_valid_leakage: bool
     validated_by: str
@@ -30,57 +48,61 @@ class ValidationRequest(BaseModel):
     notes: Optional[str] = None
 
 @router.get("/dashboard")
-def get_leakage_dashboard(db: Session = Depends(get_db)):
+async def get_leakage_dashboard(db: AsyncSession = Depends(get_async_db)):
     """Get overview dashboard for leakage detection"""
-    cases = db.query(LeakageCase).all()
-
-    total_leakage = sum(c.leakage_amount for c in cases)
-    total_recovered = sum(c.recovered_amount or 0 for c in cases)
-
-    # Status breakdown
+    # One scan grouped at the finest grain the dashboard needs; every
+    # breakdown below is rolled up from these few rows in a single pass.
+    # Ordering by first case id keeps breakdowns in first-seen order.
+    month = month_key(db, LeakageCase.created_at)
+    grouped = (await db.execute(select(
+        LeakageCase.status,
+        LeakageCase.leakage_type,
+        LeakageCase.severity,
+        month,
+        func.count(LeakageCase.id),
+        func.coalesce(func.sum(LeakageCase.leakage_amount), 0),
+        func.coalesce(func.sum(LeakageCase.recovered_amount), 0)
+    ).group_by(
+        LeakageCase.status, LeakageCase.leakage_type, LeakageCase.severity, month
+    ).order_by(func.min(LeakageCase.id)))).all()
+
+    total_cases = 0
+    total_leakage = 0
+    total_recovered = 0
+    pending_investigation = 0
     status_counts = {}
-    for case in cases:
-        status = case.status or "Unknown"
-        if status not in status_counts:
-            status_counts[status] = {"count": 0, "value": 0}
-        status_counts[status]["count"] += 1
-        status_counts[status]["value"] += case.leakage_amount
-
-    # Leakage by type
     type_breakdown = {}
-    for case in cases:
-        ltype = case.leakage_type or "Unknown"
-        if ltype not in type_breakdown:
-            type_breakdown[ltype] = {"count": 0, "value": 0}
-        type_breakdown[ltype]["count"] += 1
-        type_breakdown[ltype]["value"] += case.leakage_amount
-
-    # Severity breakdown
     severity_counts = {}
-    for case in cases:
-        sev = case.severity or "Unknown"
-        if sev not in severity_counts:
-            severity_counts[sev] = {"count": 0, "value": 0}
-        severity_counts[sev]["count"] += 1
-        severity_counts[sev]["value"] += case.leakage_amount
-
-    # Monthly trend
     monthly_trend = {}
-    for case in cases:
-        if case.created_at:
-            month_key = case.created_at.strftime("%Y-%m")
-            if month_key not in monthly_trend:
-                monthly_trend[month_key] = {"detected": 0, "recovered": 0}
-            monthly_trend[month_key]["detected"] += case.leakage_amount
-            monthly_trend[month_key]["recovered"] += case.recovered_amount or 0
+
+    for status, ltype, sev, case_month, count, value, recovered in grouped:
+        total_cases += count
+        total_leakage += value
+        total_recovered += recovered
+        if status in ["New", "Under Investigation"]:
+            pending_investigation += count
+
+        for breakdown, key in (
+            (status_counts, status or "Unknown"),
+            (type_breakdown, ltype or "Unknown"),
+            (severity_counts, sev or "Unknown")
+        ):
+            bucket = breakdown.setdefault(key, {"count": 0, "value": 0})
+            bucket["count"] += count
+            bucket["value"] += value
+
+        if case_month:
+            trend = monthly_trend.setdefault(case_month, {"detected": 0, "recovered": 0})
+            trend["detected"] += value
+            trend["recovered"] += recovered
 
     return {
         "summary": {
-            "total_cases": len(cases),
+            "total_cases": total_cases,
             "total_leakage_identified": total_leakage,
             "total_recovered": total_recovered,
             "recovery_rate": round(total_recovered/total_leakage*100, 1) if total_leakage > 0 else 0,
-            "pending_investigation": len([c for c in cases if c.status in ["New", "Under Investigation"]]),
+            "pending_investigation": pending_investigation,
             "currency": "INR"
         },
         "status_breakdown": [
@@ -148,6 +170,41 @@ def get_leakage_cases(
 
     return result
 
+@router.get("/cases/export")
+def export_leakage_cases(
+    export_format: str = Query("csv", alias="format", pattern=FORMAT_PATTERN),
+    columns: Optional[str] = None,
+    compression: str = Query("none", pattern=COMPRESSION_PATTERN),
+    status: Optional[str] = None,
+    severity: Optional[str] = None,
+    leakage_type: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None
+):
+    """Stream leakage cases as CSV, NDJSON or Parquet
+
+    ``columns`` is a comma-separated projection; ``created_to`` is inclusive.
+    """
+    filters = []
+    if status:
+        filters.append(LeakageCase.status == status)
+    if severity:
+        filters.append(LeakageCase.severity == severity)
+    if leakage_type:
+        filters.append(LeakageCase.leakage_type == leakage_type)
+    if min_amount:
+        filters.append(LeakageCase.leakage_amount >= min_amount)
+    if created_from:
+        filters.append(LeakageCase.created_at >= datetime.combine(created_from, datetime.min.time()))
+    if created_to:
+        filters.append(LeakageCase.created_at < datetime.combine(created_to + timedelta(days=1), datetime.min.time()))
+
+    return export_response(
+        LeakageCase, export_columns(LeakageCase, columns), filters,
+        export_format, compression, "leakage_cases"
+    )
+
 @router.get("/cases/{case_id}")
 def get_case_details(case_id: str, db: Session = Depends(get_db)):
     """Get detailed view of a leakage case with all supporting documents"""
@@ -282,7 +339,9 @@ def update_case(case_id: str, request: CaseUpdateRequest, db: Session = Depends(
         case.notes = request.notes
 
     case.updated_at = datetime.now()
+    mark_invoice_vendors_stale(db, [case.invoice_id])
     db.commit()
+    invalidate_stats()
 
     return {"message": "Case updated successfully", "case_id": case_id}
 
@@ -305,7 +364,9 @@ def validate_case(case_id: str, request: ValidationRequest, db: Session = Depend
         case.notes = f"False positive - {request.notes}" if request.notes else "False positive"
 
     case.updated_at = datetime.now()
+    mark_invoice_vendors_stale(db, [case.invoice_id])
     db.commit()
+    invalidate_stats()
 
     return {
         "message": "Case validated" if request.is_valid_leakage else "Case closed as false positive",
@@ -327,7 +388,9 @@ def initiate_recovery(case_id: str, db: Session = Depends(get_db)):
     case.status = "Recovery Initiated"
     case.recovery_initiated_date = datetime.now()
     case.updated_at = datetime.now()
+    mark_invoice_vendors_stale(db, [case.invoice_id])
     db.commit()
+    invalidate_stats()
 
     # Get vendor info for communication
     invoice = db.query(Invoice).filter(Invoice.id == case.invoice_id).first()
@@ -349,37 +412,62 @@ def initiate_recovery(case_id: str, db: Session = Depends(get_db)):
         ]
     }
 
+def _case_filters(
+    start_date: Optional[date],
+    end_date: Optional[date],
+    severity: Optional[str]
+) -> list:
+    """SQL filters shared by the leakage analytics endpoints (date range is inclusive)"""
+    filters = []
+    if start_date:
+        filters.append(LeakageCase.created_at >= datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        filters.append(LeakageCase.created_at < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    if severity:
+        filters.append(LeakageCase.severity == severity)
+    return filters
+
 @router.get("/analytics/by-vendor")
-def get_leakage_by_vendor(db: Session = Depends(get_db)):
+def get_leakage_by_vendor(
+    db: Session = Depends(get_db),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    severity: Optional[str] = None
+):
     """Get leakage analytics grouped by vendor"""
-    cases = db.query(LeakageCase).all()
+    rows = db.query(
+        Vendor.id,
+        Vendor.vendor_name,
+        LeakageCase.leakage_type,
+        func.count(LeakageCase.id),
+        func.coalesce(func.sum(LeakageCase.leakage_amount), 0),
+        func.coalesce(func.sum(LeakageCase.recovered_amount), 0)
+    ).join(
+        Invoice, Invoice.id == LeakageCase.invoice_id
+    ).outerjoin(
+        Vendor, Vendor.id == Invoice.vendor_id
+    ).filter(
+        *_case_filters(start_date, end_date, severity)
+    ).group_by(
+        Vendor.id, Vendor.vendor_name, LeakageCase.leakage_type
+    ).order_by(func.min(LeakageCase.id)).all()
 
     vendor_leakage = {}
-    for case in cases:
-        invoice = db.query(Invoice).filter(Invoice.id == case.invoice_id).first()
-        if invoice:
-            vendor = db.query(Vendor).filter(Vendor.id == invoice.vendor_id).first()
-            vendor_name = vendor.vendor_name if vendor else "Unknown"
-            vendor_id = vendor.id if vendor else None
-
-            if vendor_id not in vendor_leakage:
-                vendor_leakage[vendor_id] = {
-                    "vendor_id": vendor_id,
-                    "vendor_name": vendor_name,
-                    "case_count": 0,
-                    "total_leakage": 0,
-                    "recovered": 0,
-                    "leakage_types": {}
-                }
-
-            vendor_leakage[vendor_id]["case_count"] += 1
-            vendor_leakage[vendor_id]["total_leakage"] += case.leakage_amount
-            vendor_leakage[vendor_id]["recovered"] += case.recovered_amount or 0
-
-            ltype = case.leakage_type
-            if ltype not in vendor_leakage[vendor_id]["leakage_types"]:
-                vendor_leakage[vendor_id]["leakage_types"][ltype] = 0
-            vendor_leakage[vendor_id]["leakage_types"][ltype] += 1
+    for vendor_id, vendor_name, ltype, count, leakage, recovered in rows:
+        if vendor_id not in vendor_leakage:
+            vendor_leakage[vendor_id] = {
+                "vendor_id": vendor_id,
+                "vendor_name": vendor_name or "Unknown",
+                "case_count": 0,
+                "total_leakage": 0,
+                "recovered": 0,
+                "leakage_types": {}
+            }
+
+        vendor_leakage[vendor_id]["case_count"] += count
+        vendor_leakage[vendor_id]["total_leakage"] += leakage
+        vendor_leakage[vendor_id]["recovered"] += recovered
+        vendor_leakage[vendor_id]["leakage_types"][ltype] = count
 
     return sorted(
         vendor_leakage.values(),
@@ -388,108 +476,115 @@ def get_leakage_by_vendor(db: Session = Depends(get_db)):
     )[:20]
 
 @router.get("/analytics/by-category")
-def get_leakage_by_category(db: Session = Depends(get_db)):
-    """Get leakage analytics grouped by spend category"""
-    cases = db.query(LeakageCase).all()
+def get_leakage_by_category(
+    db: Session = Depends(get_db),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    severity: Optional[str] = None
+):
+    """Get leakage analytics grouped by spend category
+
+    Cases whose purchase order is missing or has no category are reported
+    as "Uncategorized".
+    """
+    category = func.coalesce(PurchaseOrder.category, "Uncategorized").label("category")
+    total_leakage = func.coalesce(func.sum(LeakageCase.leakage_amount), 0).label("total_leakage")
+
+    rows = db.query(
+        category,
+        func.count(LeakageCase.id),
+        total_leakage,
+        func.coalesce(func.sum(LeakageCase.recovered_amount), 0)
+    ).join(
+        Invoice, Invoice.id == LeakageCase.invoice_id
+    ).outerjoin(
+        PurchaseOrder, PurchaseOrder.id == Invoice.po_id
+    ).filter(
+        *_case_filters(start_date, end_date, severity)
+    ).group_by(category).order_by(desc(total_leakage), func.min(LeakageCase.id)).all()
+
+    return [
+        {
+            "category": cat,
+            "case_count": count,
+            "total_leakage": leakage,
+            "recovered": recovered
+        }
+        for cat, count, leakage, recovered in rows
+    ]
 
-    category_leakage = {}
-    for case in cases:
-        invoice = db.query(Invoice).filter(Invoice.id == case.invoice_id).first()
-        if invoice:
-            po = db.query(PurchaseOrder).filter(PurchaseOrder.id == invoice.po_id).first()
-            category = po.category if po else "Uncategorized"
-
-            if category not in category_leakage:
-                category_leakage[category] = {
-                    "category": category,
-                    "case_count": 0,
-                    "total_leakage": 0,
-                    "recovered": 0
-                }
+@router.get("/duplicates")
+def get_duplicate_invoices(
+    db: Session = Depends(get_db),
+    mode: str = Query("exact", pattern="^(exact|near)$"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """List duplicate invoice groups (exact) or probable OCR/typo duplicates (near) from the fingerprint index"""
+    sync_index(db)
 
-            category_leakage[category]["case_count"] += 1
-            category_leakage[category]["total_leakage"] += case.leakage_amount
-            category_leakage[category]["recovered"] += case.recovered_amount or 0
+    if mode == "exact":
+        matches = find_exact_duplicate_groups(db, limit=limit)
+    else:
+        matches = find_near_duplicate_pairs(db, limit=limit)
 
-    return sorted(
-        category_leakage.values(),
-        key=lambda x: x["total_leakage"],
-        reverse=True
+    return {
+        "mode": mode,
+        "total_matches": len(matches),
+        "matches": matches
+    }
+
+@router.post("/duplicates/check")
+def check_duplicate_invoice(request: DuplicateCheckRequest, db: Session = Depends(get_db)):
+    """Check an incoming invoice against the fingerprint index before payment"""
+    sync_index(db)
+
+    result = check_invoice(
+        db,
+        vendor_id=request.vendor_id,
+        invoice_number=request.invoice_number,
+        total_amount=request.total_amount,
+        invoice_date=request.invoice_date,
+        near=request.near
     )
 
+    return {
+        "is_duplicate": bool(result["exact_matches"]),
+        "is_possible_duplicate": bool(result["near_matches"]),
+        **result
+    }
+
 @router.get("/validation-rules")
 def get_validation_rules():
     """Get the validation rules used for leakage detection"""
-    rules = [
-        {
-            "rule_id": "RATE_001",
-            "name": "Rate Card Adherence",
-            "category": "Logistics",
-            "description": "Compare invoiced rate against contracted rate for transportation services",
-            "severity": "High",
-            "threshold": "Any variance > 2%"
-        },
-        {
-            "rule_id": "LIC_001",
-            "name": "License Compliance",
-            "category": "IT Software & SaaS",
-            "description": "Compare billed licenses against PO/contract quantity",
-            "severity": "Medium",
-            "threshold": "Billed > Contracted"
-        },
-        {
-            "rule_id": "DUP_001",
-            "name": "Duplicate Invoice Detection",
-            "category": "All",
-            "description": "Identify invoices with same vendor, number, and amount paid multiple times",
-            "severity": "High",
-            "threshold": "Exact match"
-        },
-        {
-            "rule_id": "TAX_001",
-            "name": "Tax Calculation Verification",
-            "category": "All",
-            "description": "Verify tax amounts against applicable rates",
-            "severity": "Medium",
-            "threshold": "Variance > 0.5%"
-        },
-        {
-            "rule_id": "QTY_001",
-            "name": "Quantity Mismatch",
-            "category": "All",
-            "description": "Compare invoiced quantity against PO quantity",
-            "severity": "Medium",
-            "threshold": "Invoice > PO"
-        },
-        {
-            "rule_id": "ADD_001",
-            "name": "Addendum Timing",
-            "category": "All",
-            "description": "Verify payment uses correct rate card version based on service date",
-            "severity": "High",
-            "threshold": "Wrong addendum applied"
-        }
-    ]
-
     return {
-        "rules": rules,
-        "total_rules": len(rules),
+        "rules": VALIDATION_RULES,
+        "total_rules": len(VALIDATION_RULES),
         "last_updated": datetime.now().isoformat()
     }
 
 @router.post("/run-audit")
-def run_audit_scan(db: Session = Depends(get_db)):
-    """Trigger a new audit scan on recent payments (mock)"""
-    # In production, this would trigger the actual audit process
+def run_audit_scan(
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    days: int = Query(30, ge=1),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=10000)
+):
+    """Trigger a new audit scan on recent payments; poll /run-audit/{scan_id} for progress"""
+    scan = create_scan(db, days=days, batch_size=batch_size)
+    background_tasks.add_task(run_scan, scan.scan_id)
 
     return {
         "message": "Audit scan initiated",
-        "scan_id": f"SCAN-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-        "status": "Running",
-        "parameters": {
-            "date_range": "Last 30 days",
-            "categories": "All",
-            "rules_applied": 6
-        },
+        **scan_summary(scan),
         "estimated_completion": "Processing will complete in background"
     }
+
+@router.get("/run-audit/{scan_id}")
+def get_audit_scan_status(scan_id: str, db: Session = Depends(get_db)):
+    """Get progress and results of an audit scan"""
+    scan = db.query(AuditScan).filter(AuditScan.scan_id == scan_id).first()
+
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+
+    return scan_summary(scan)
@@ -1,21 +1,30 @@
 """
 Use Case 1: End-to-End Procurement Lifecycle Tracking API
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, select
 from typing import List, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 import json
 
-from app.models.database import (
-    get_db, ProcurementTransaction, SourcingRequest, Contract,
-    PurchaseOrder, Invoice, Vendor, PurchaseRequisition
+from app.models.database import get_db, get_async_db, ProcurementTransaction, Invoice, Vendor
+from app.services.exports import COMPRESSION_PATTERN, FORMAT_PATTERN, export_columns, export_response
+from app.services.kpi_engine import (
+    METRICS, STAGE_LABELS, STAGE_METRIC, TRANSACTIONS_METRIC, WINDOWS, kpi_freshness, kpi_totals, kpi_trend,
+    queue_rollup, rollup_due, rollup_kpis, rollup_state, run_queued_rollup, trend_direction
 )
+from app.services.loaders import AsyncBatchLoader, BatchLoader, get_async_loader, get_loader
+from app.services.process_mining import event_log_freshness, process_flow
+from app.services.timeline_store import load_stages, refresh_timeline_store, timeline_freshness, timeline_payload
 
 router = APIRouter(prefix="/api/lifecycle", tags=["Procurement Lifecycle"])
 
+MAX_TIMELINE_BATCH = 1000
+
 class TimelineEvent(BaseModel):
     stage: str
     stage_name: str
@@ -39,6 +48,9 @@ class TransactionTimeline(BaseModel):
     compliance_score: float
     timeline: List[TimelineEvent]
 
+class TimelineBatchRequest(BaseModel):
+    transaction_ids: List[str]
+
 class ProcessFlowNode(BaseModel):
     stage: str
     count: int
@@ -60,30 +72,49 @@ class KPISummary(BaseModel):
     change_percentage: float
 
 @router.get("/transactions", response_model=List[dict])
-def get_transactions(
-    db: Session = Depends(get_db),
+async def get_transactions(
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    loader: AsyncBatchLoader = Depends(get_async_loader),
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[int] = None,
     has_bottleneck: Optional[bool] = None,
     has_control_gap: Optional[bool] = None,
     vendor_id: Optional[int] = None
 ):
-    """Get all procurement transactions with lifecycle data"""
-    query = db.query(ProcurementTransaction)
+    """Get all procurement transactions with lifecycle data
+
+    Pass the ``X-Next-Cursor`` response header back as ``cursor`` to page by
+    keyset instead of ``skip``, which stays fast on deep pages.
+    """
+    query = select(ProcurementTransaction)
 
     if has_bottleneck is not None:
-        query = query.filter(ProcurementTransaction.has_bottleneck == has_bottleneck)
+        query = query.where(ProcurementTransaction.has_bottleneck == has_bottleneck)
     if has_control_gap is not None:
-        query = query.filter(ProcurementTransaction.has_control_gap == has_control_gap)
+        query = query.where(ProcurementTransaction.has_control_gap == has_control_gap)
     if vendor_id:
-        query = query.filter(ProcurementTransaction.vendor_id == vendor_id)
+        query = query.where(ProcurementTransaction.vendor_id == vendor_id)
+
+    query = query.order_by(ProcurementTransaction.id)
+    if cursor is not None:
+        query = query.where(ProcurementTransaction.id > cursor)
+    else:
+        query = query.offset(skip)
+
+    transactions = (await db.scalars(query.limit(limit))).all()
 
-    transactions = query.offset(skip).limit(limit).all()
+    if len(transactions) == limit:
+        response.headers["X-Next-Cursor"] = str(transactions[-1].id)
+
+    await loader.prime(Vendor, [txn.vendor_id for txn in transactions])
+    await loader.prime(Invoice, [txn.invoice_id for txn in transactions])
 
     result = []
     for txn in transactions:
-        vendor = db.query(Vendor).filter(Vendor.id == txn.vendor_id).first()
-        invoice = db.query(Invoice).filter(Invoice.id == txn.invoice_id).first() if txn.invoice_id else None
+        vendor = loader.get(Vendor, txn.vendor_id)
+        invoice = loader.get(Invoice, txn.invoice_id)
 
         result.append({
             "id": txn.id,
@@ -103,9 +134,39 @@ def get_transactions(
 
     return result
 
+@router.get("/transactions/export")
+def export_transactions(
+    export_format: str = Query("csv", alias="format", pattern=FORMAT_PATTERN),
+    columns: Optional[str] = None,
+    compression: str = Query("none", pattern=COMPRESSION_PATTERN),
+    has_bottleneck: Optional[bool] = None,
+    has_control_gap: Optional[bool] = None,
+    vendor_id: Optional[int] = None,
+    current_stage: Optional[str] = None
+):
+    """Stream procurement transactions as CSV, NDJSON or Parquet
+
+    ``columns`` is a comma-separated projection; filters match /transactions.
+    """
+    filters = []
+    if has_bottleneck is not None:
+        filters.append(ProcurementTransaction.has_bottleneck == has_bottleneck)
+    if has_control_gap is not None:
+        filters.append(ProcurementTransaction.has_control_gap == has_control_gap)
+    if vendor_id:
+        filters.append(ProcurementTransaction.vendor_id == vendor_id)
+    if current_stage:
+        filters.append(ProcurementTransaction.current_stage == current_stage)
+
+    return export_response(
+        ProcurementTransaction, export_columns(ProcurementTransaction, columns), filters,
+        export_format, compression, "procurement_transactions"
+    )
+
 @router.get("/transactions/{transaction_id}/timeline")
 def get_transaction_timeline(transaction_id: str, db: Session = Depends(get_db)):
     """Get detailed timeline for a specific transaction"""
+    refresh_timeline_store(db)
     txn = db.query(ProcurementTransaction).filter(
         ProcurementTransaction.transaction_id == transaction_id
     ).first()
@@ -113,192 +174,76 @@ def get_transaction_timeline(transaction_id: str, db: Session = Depends(get_db))
     if not txn:
         return {"error": "Transaction not found"}
 
-    timeline = []
-
-    # Request Intake (SAP Ariba)
-    if txn.sourcing_request_id:
-        sr = db.query(SourcingRequest).filter(SourcingRequest.id == txn.sourcing_request_id).first()
-        if sr:
-            duration = (sr.request_approved_date - sr.request_submitted_date).days if sr.request_approved_date else None
-            timeline.append({
-                "stage": "request_intake",
-                "stage_name": "Request Intake",
-                "start_date": sr.request_submitted_date.isoformat() if sr.request_submitted_date else None,
-                "end_date": sr.request_approved_date.isoformat() if sr.request_approved_date else None,
-                "duration_days": duration,
-                "status": "completed" if sr.request_approved_date else "in_progress",
-                "source_system": "SAP Ariba",
-                "details": {
-                    "ariba_id": sr.ariba_id,
-                    "requirement": sr.requirement_description,
-                    "estimated_value": sr.estimated_value
-                }
-            })
-
-            # Sourcing
-            if sr.sourcing_event_start:
-                sourcing_duration = (sr.award_decision_date - sr.sourcing_event_start).days if sr.award_decision_date else None
-                timeline.append({
-                    "stage": "sourcing",
-                    "stage_name": "Sourcing",
-                    "start_date": sr.sourcing_event_start.isoformat(),
-                    "end_date": sr.award_decision_date.isoformat() if sr.award_decision_date else None,
-                    "duration_days": sourcing_duration,
-                    "status": "completed" if sr.award_decision_date else "in_progress",
-                    "source_system": "SAP Ariba",
-                    "details": {
-                        "category": sr.category,
-                        "subcategory": sr.subcategory
-                    }
-                })
-
-    # Contracting (Simplicontract)
-    if txn.contract_id:
-        contract = db.query(Contract).filter(Contract.id == txn.contract_id).first()
-        if contract:
-            duration = (contract.contract_executed_date - contract.contract_drafted_date).days if contract.contract_executed_date else None
-            timeline.append({
-                "stage": "contracting",
-                "stage_name": "Contracting",
-                "start_date": contract.contract_drafted_date.isoformat() if contract.contract_drafted_date else None,
-                "end_date": contract.contract_executed_date.isoformat() if contract.contract_executed_date else None,
-                "duration_days": duration,
-                "status": "completed" if contract.contract_executed_date else "in_progress",
-                "source_system": "Simplicontract",
-                "details": {
-                    "contract_id": contract.contract_id,
-                    "contract_type": contract.contract_type,
-                    "contract_value": contract.contract_value,
-                    "payment_terms": contract.payment_terms
-                }
-            })
-
-    # PR/PO Creation (Oracle Fusion)
-    if txn.po_id:
-        po = db.query(PurchaseOrder).filter(PurchaseOrder.id == txn.po_id).first()
-        pr = db.query(PurchaseRequisition).filter(PurchaseRequisition.id == txn.pr_id).first() if txn.pr_id else None
-
-        if pr:
-            pr_duration = (pr.pr_approved_date - pr.pr_created_date).days if pr.pr_approved_date else None
-            timeline.append({
-                "stage": "pr_creation",
-                "stage_name": "PR Creation",
-                "start_date": pr.pr_created_date.isoformat() if pr.pr_created_date else None,
-                "end_date": pr.pr_approved_date.isoformat() if pr.pr_approved_date else None,
-                "duration_days": pr_duration,
-                "status": "completed",
-                "source_system": "Oracle Fusion",
-                "details": {
-                    "pr_number": pr.pr_number,
-                    "business_unit": pr.business_unit
-                }
-            })
-
-        if po:
-            po_duration = (po.po_sent_to_vendor_date - po.po_created_date).days if po.po_sent_to_vendor_date else None
-            timeline.append({
-                "stage": "po_creation",
-                "stage_name": "PO Creation",
-                "start_date": po.po_created_date.isoformat() if po.po_created_date else None,
-                "end_date": po.po_sent_to_vendor_date.isoformat() if po.po_sent_to_vendor_date else None,
-                "duration_days": po_duration,
-                "status": "completed" if po.po_sent_to_vendor_date else "in_progress",
-                "source_system": "Oracle Fusion",
-                "details": {
-                    "po_number": po.po_number,
-                    "total_amount": po.total_amount,
-                    "category": po.category
-                }
-            })
-
-    # Payment (Oracle EBS)
-    if txn.invoice_id:
-        invoice = db.query(Invoice).filter(Invoice.id == txn.invoice_id).first()
-        if invoice:
-            payment_duration = (invoice.payment_date - invoice.invoice_received_date).days if invoice.payment_date else None
-            timeline.append({
-                "stage": "payment",
-                "stage_name": "Payment",
-                "start_date": invoice.invoice_received_date.isoformat() if invoice.invoice_received_date else None,
-                "end_date": invoice.payment_date.isoformat() if invoice.payment_date else None,
-                "duration_days": payment_duration,
-                "status": invoice.payment_status.lower(),
-                "source_system": "Oracle EBS",
-                "details": {
-                    "invoice_number": invoice.invoice_number,
-                    "invoice_amount": invoice.invoice_amount,
-                    "total_amount": invoice.total_amount,
-                    "payment_method": invoice.payment_method
-                }
-            })
-
+    stages = load_stages(db, [txn.id]).get(txn.id, [])
     vendor = db.query(Vendor).filter(Vendor.id == txn.vendor_id).first()
-    invoice = db.query(Invoice).filter(Invoice.id == txn.invoice_id).first() if txn.invoice_id else None
+    return timeline_payload(txn, stages, vendor)
 
-    return {
-        "transaction_id": txn.transaction_id,
-        "vendor_name": vendor.vendor_name if vendor else "Unknown",
-        "total_value": invoice.total_amount if invoice else 0,
-        "currency": "INR",
-        "current_stage": txn.current_stage,
-        "total_cycle_time_days": txn.total_cycle_time_days,
-        "has_bottleneck": txn.has_bottleneck,
-        "bottleneck_stage": txn.bottleneck_stage,
-        "has_control_gap": txn.has_control_gap,
-        "control_gap_description": txn.control_gap_description,
-        "compliance_score": txn.compliance_score,
-        "timeline": timeline
-    }
+@router.post("/transactions/timelines")
+def get_transaction_timelines(
+    request: TimelineBatchRequest,
+    db: Session = Depends(get_db),
+    loader: BatchLoader = Depends(get_loader)
+):
+    """Get timelines for many transactions at once, e.g. for a Gantt view
+
+    Served from the timeline store with one IN query each for transactions,
+    stages and vendors. Timelines come back in request order; unknown IDs
+    are listed under ``not_found``.
+    """
+    transaction_ids = list(dict.fromkeys(request.transaction_ids))
+    if len(transaction_ids) > MAX_TIMELINE_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TIMELINE_BATCH} transaction IDs per request")
+
+    state = refresh_timeline_store(db)
+    txns = {
+        txn.transaction_id: txn
+        for txn in db.query(ProcurementTransaction).filter(
+            ProcurementTransaction.transaction_id.in_(transaction_ids)
+        )
+    } if transaction_ids else {}
+    stages = load_stages(db, [txn.id for txn in txns.values()])
+    vendors = loader.prime(Vendor, [txn.vendor_id for txn in txns.values()])
+
+    # The payload is already JSON-native, so skip the response encoder's per-field walk
+    return JSONResponse({
+        "timelines": [
+            timeline_payload(txns[tid], stages.get(txns[tid].id, []), vendors.get(txns[tid].vendor_id))
+            for tid in transaction_ids if tid in txns
+        ],
+        "not_found": [tid for tid in transaction_ids if tid not in txns],
+        "freshness": timeline_freshness(state)
+    })
 
 @router.get("/process-flow")
 def get_process_flow(db: Session = Depends(get_db)):
     """Get process mining visualization data"""
-    stages = ["request_intake", "sourcing", "contracting", "pr_po_creation", "invoicing", "payment"]
+    flow, state = process_flow(db)
 
-    nodes = []
-    for stage in stages:
-        txn_count = db.query(ProcurementTransaction).count()
-        bottleneck_count = db.query(ProcurementTransaction).filter(
-            ProcurementTransaction.bottleneck_stage == stage
-        ).count()
+    bottlenecks = dict(db.query(
+        ProcurementTransaction.bottleneck_stage, func.count(ProcurementTransaction.id)
+    ).filter(
+        ProcurementTransaction.has_bottleneck == True
+    ).group_by(ProcurementTransaction.bottleneck_stage).all())
 
+    nodes = []
+    for stage, stats in flow["stages"].items():
         nodes.append({
             "stage": stage,
             "stage_name": stage.replace("_", " ").title(),
-            "transaction_count": txn_count,
-            "bottleneck_count": bottleneck_count,
-            "avg_duration_days": round(5 + (stages.index(stage) * 2) + (bottleneck_count * 0.5), 1)
+            "transaction_count": stats["transaction_count"],
+            "in_progress_count": stats["in_progress_count"],
+            "bottleneck_count": bottlenecks.get(stage, 0),
+            "avg_duration_days": stats["duration"]["mean"],
+            "duration_distribution": stats["duration"]
         })
 
-    # Process variants (different paths)
-    variants = [
-        {
-            "variant_id": "standard",
-            "name": "Standard Flow",
-            "path": stages,
-            "count": int(txn_count * 0.7),
-            "avg_cycle_time": 45
-        },
-        {
-            "variant_id": "expedited",
-            "name": "Expedited (No Sourcing)",
-            "path": ["request_intake", "contracting", "pr_po_creation", "payment"],
-            "count": int(txn_count * 0.2),
-            "avg_cycle_time": 25
-        },
-        {
-            "variant_id": "deviation",
-            "name": "Contract Before Sourcing",
-            "path": ["request_intake", "contracting", "sourcing", "pr_po_creation", "payment"],
-            "count": int(txn_count * 0.1),
-            "avg_cycle_time": 55
-        }
-    ]
-
     return {
         "nodes": nodes,
-        "variants": variants,
-        "total_transactions": txn_count
+        "edges": flow["edges"],
+        "variants": flow["variants"],
+        "variant_count": flow["variant_count"],
+        "total_transactions": flow["total_cases"],
+        "freshness": event_log_freshness(state)
     }
 
 @router.get("/bottlenecks")
@@ -341,16 +286,19 @@ def get_bottleneck_analysis(db: Session = Depends(get_db)):
     return sorted(result, key=lambda x: x["transaction_count"], reverse=True)
 
 @router.get("/control-gaps")
-def get_control_gaps(db: Session = Depends(get_db)):
+def get_control_gaps(db: Session = Depends(get_db), loader: BatchLoader = Depends(get_loader)):
     """Detect and list control gaps/compliance violations"""
     gap_txns = db.query(ProcurementTransaction).filter(
         ProcurementTransaction.has_control_gap == True
     ).all()
 
+    loader.prime(Vendor, [txn.vendor_id for txn in gap_txns])
+    loader.prime(Invoice, [txn.invoice_id for txn in gap_txns])
+
     result = []
     for txn in gap_txns:
-        vendor = db.query(Vendor).filter(Vendor.id == txn.vendor_id).first()
-        invoice = db.query(Invoice).filter(Invoice.id == txn.invoice_id).first() if txn.invoice_id else None
+        vendor = loader.get(Vendor, txn.vendor_id)
+        invoice = loader.get(Invoice, txn.invoice_id)
 
         result.append({
             "transaction_id": txn.transaction_id,
@@ -364,74 +312,99 @@ def get_control_gaps(db: Session = Depends(get_db)):
 
     return result
 
-@router.get("/kpis")
-def get_kpis(db: Session = Depends(get_db)):
-    """Get procurement KPIs"""
-    total_txns = db.query(ProcurementTransaction).count()
+def _kpi_period(window: str) -> str:
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of: {', '.join(WINDOWS)}")
+    return WINDOWS[window]
 
-    # End-to-End Cycle Time
-    avg_cycle_time = db.query(func.avg(ProcurementTransaction.total_cycle_time_days)).scalar() or 0
+def _snapshot_freshness(db: Session, period: str, background_tasks: BackgroundTasks) -> dict:
+    """Freshness of the stored snapshots
 
-    # Stage-Level Cycle Times (mock calculation)
-    stage_times = {
-        "Request Intake": 3.5,
-        "Sourcing": 12.4,
-        "Contracting": 8.2,
-        "PR/PO Creation": 4.1,
-        "Payment": 15.6
+    The first rollup runs in the request, so a new database never reports
+    empty KPIs; later ones run after the response once the snapshot is stale.
+    """
+    state = rollup_state(db, period)
+    if state is None or state.rolled_up_at is None:
+        state = rollup_kpis(db, period) or rollup_state(db, period)
+    elif rollup_due(state) and queue_rollup(period):
+        background_tasks.add_task(run_queued_rollup, period)
+    return kpi_freshness(state, period)
+
+@router.get("/kpis")
+def get_kpis(background_tasks: BackgroundTasks, window: str = "month", db: Session = Depends(get_db)):
+    """Get procurement KPIs
+
+    Values cover all transactions; trend and change_percentage compare the
+    two latest closed ``window`` periods. Both are read from the stored KPI
+    snapshots, and a due rollup runs after the response.
+    """
+    period = _kpi_period(window)
+    freshness = _snapshot_freshness(db, period, background_tasks)
+    totals = kpi_totals(db, period)
+    series, current = kpi_trend(db, period, periods=3)
+
+    summary = []
+    for metric, unit, lower_is_better in METRICS:
+        trend, change = trend_direction(series.get((metric, "all"), []), current, lower_is_better)
+        summary.append({
+            "metric_name": metric,
+            "value": round(totals.get((metric, "all")) or 0, 1),
+            "unit": unit,
+            "trend": trend,
+            "change_percentage": change
+        })
+
+    return {
+        "summary": summary,
+        "stage_cycle_times": {
+            label: round(totals[(STAGE_METRIC, label)], 1)
+            for label in STAGE_LABELS.values() if (STAGE_METRIC, label) in totals
+        },
+        "total_transactions": int(totals.get((TRANSACTIONS_METRIC, "all")) or 0),
+        "trend_window": window,
+        "freshness": freshness
     }
 
-    # First-Pass Yield
-    transactions_with_issues = db.query(ProcurementTransaction).filter(
-        (ProcurementTransaction.has_bottleneck == True) |
-        (ProcurementTransaction.has_control_gap == True)
-    ).count()
-    first_pass_yield = ((total_txns - transactions_with_issues) / total_txns * 100) if total_txns > 0 else 0
-
-    # On-Time Payment
-    on_time_payments = db.query(Invoice).filter(
-        Invoice.payment_date <= Invoice.due_date
-    ).count()
-    total_paid = db.query(Invoice).filter(Invoice.payment_status == "Paid").count()
-    on_time_percentage = (on_time_payments / total_paid * 100) if total_paid > 0 else 0
-
-    # Compliance Deviation Rate
-    compliance_deviations = db.query(ProcurementTransaction).filter(
-        ProcurementTransaction.has_control_gap == True
-    ).count()
-    deviation_rate = (compliance_deviations / total_txns * 100) if total_txns > 0 else 0
+@router.get("/kpis/trend")
+def get_kpi_trend(
+    background_tasks: BackgroundTasks,
+    window: str = "month",
+    periods: int = Query(12, ge=2, le=366),
+    db: Session = Depends(get_db)
+):
+    """KPI history per ``window`` period, read from the stored snapshots
+
+    Points in the current, still open period are marked closed: false.
+    """
+    period = _kpi_period(window)
+    freshness = _snapshot_freshness(db, period, background_tasks)
+    series, current = kpi_trend(db, period, periods)
+
+    def points(values):
+        return [
+            {"period_date": period_date.isoformat(), "value": round(value, 2), "closed": period_date < current}
+            for period_date, value in values
+        ]
+
+    metrics = []
+    for metric, unit, lower_is_better in METRICS:
+        values = series.get((metric, "all"), [])
+        trend, change = trend_direction(values, current, lower_is_better)
+        metrics.append({
+            "metric_name": metric,
+            "unit": unit,
+            "trend": trend,
+            "change_percentage": change,
+            "points": points(values)
+        })
 
     return {
-        "summary": [
-            {
-                "metric_name": "End-to-End Cycle Time",
-                "value": round(avg_cycle_time, 1),
-                "unit": "days",
-                "trend": "improving",
-                "change_percentage": -5.2
-            },
-            {
-                "metric_name": "First-Pass Yield",
-                "value": round(first_pass_yield, 1),
-                "unit": "%",
-                "trend": "stable",
-                "change_percentage": 1.3
-            },
-            {
-                "metric_name": "On-Time Payment",
-                "value": round(on_time_percentage, 1),
-                "unit": "%",
-                "trend": "improving",
-                "change_percentage": 3.8
-            },
-            {
-                "metric_name": "Compliance Deviation Rate",
-                "value": round(deviation_rate, 1),
-                "unit": "%",
-                "trend": "improving",
-                "change_percentage": -2.1
-            }
-        ],
-        "stage_cycle_times": stage_times,
-        "total_transactions": total_txns
+        "window": window,
+        "periods": periods,
+        "metrics": metrics,
+        "stage_cycle_times": {
+            label: points(series.get((STAGE_METRIC, label), []))
+            for label in STAGE_LABELS.values()
+        },
+        "freshness": freshness
     }
@@ -0,0 +1,237 @@
+"""
+Spend anomaly engine
+
+Keeps the spend columns the detector needs (amount, category, vendor, month,
+maverick flag) as NumPy arrays, extended incrementally by id watermark like
+the spend cube. Robust z-scores are computed per baseline group in one
+vectorized pass: values are sorted by (group, amount) and each group's
+median and MAD (or quartiles) are read off by position, so no Python loop
+runs over rows or groups.
+"""
+import threading
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.database import SpendRecord
+from app.services.sql_functions import month_key
+
+METHODS = ("mad", "iqr")
+BASELINES = {
+    "category": ("category",),
+    "vendor": ("category", "vendor"),
+    "month": ("category", "month"),
+}
+DEFAULT_THRESHOLD = 3.5
+MIN_GROUP_SIZE = 8
+LOAD_CHUNK_SIZE = 200000
+
+MAD_SCALE = 0.6745  # z = 0.6745 * (x - median) / MAD is ~N(0, 1) for normal data
+IQR_SCALE = 1.349   # IQR / 1.349 estimates sigma for normal data
+
+
+class SpendSnapshot(NamedTuple):
+    """Consistent view of the columns at one watermark; every array has the same length"""
+    last_id: int
+    ids: np.ndarray
+    amount: np.ndarray
+    vendor: np.ndarray
+    category: np.ndarray
+    month: np.ndarray
+    maverick: np.ndarray
+    labels: Dict[str, Tuple[str, ...]]
+
+
+class SpendColumns:
+    """Append-only columnar copy of SpendRecord; strings are stored as integer codes
+
+    ``append`` swaps the arrays one at a time, so only read them through a
+    ``snapshot`` taken under the lock that guards the appends.
+    """
+
+    def __init__(self):
+        self.last_id = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.amount = np.empty(0, dtype=np.float64)
+        self.vendor = np.empty(0, dtype=np.int64)
+        self.category = np.empty(0, dtype=np.int32)
+        self.month = np.empty(0, dtype=np.int32)
+        self.maverick = np.empty(0, dtype=bool)
+        self.labels: Dict[str, List[str]] = {"category": [], "month": []}
+        self._codes: Dict[str, Dict[str, int]] = {"category": {}, "month": {}}
+
+    def _encode(self, name: str, values) -> np.ndarray:
+        local, uniques = pd.factorize(pd.Series(values, dtype=object).fillna("Unknown"))
+        codes = self._codes[name]
+        for value in uniques:
+            if value not in codes:
+                codes[value] = len(codes)
+                self.labels[name].append(value)
+        return np.array([codes[v] for v in uniques], dtype=np.int32)[local]
+
+    def append(self, rows) -> None:
+        ids, amount, vendor, category, month, maverick = zip(*rows)
+        self.ids = np.concatenate([self.ids, np.array(ids, dtype=np.int64)])
+        self.amount = np.concatenate([self.amount, np.array(amount, dtype=np.float64)])
+        self.vendor = np.concatenate([self.vendor, np.array([v or 0 for v in vendor], dtype=np.int64)])
+        self.category = np.concatenate([self.category, self._encode("category", category)])
+        self.month = np.concatenate([self.month, self._encode("month", month)])
+        self.maverick = np.concatenate([self.maverick, np.array(maverick, dtype=bool)])
+        self.last_id = int(self.ids[-1])
+
+    def snapshot(self) -> SpendSnapshot:
+        # append replaces the arrays rather than resizing them, so sharing them is safe
+        return SpendSnapshot(
+            self.last_id, self.ids, self.amount, self.vendor, self.category, self.month, self.maverick,
+            {name: tuple(values) for name, values in self.labels.items()}
+        )
+
+
+_columns = SpendColumns()
+_columns_lock = threading.Lock()
+
+
+def load_spend_columns(db: Session) -> SpendSnapshot:
+    """Snapshot of the process-wide columns, first appending rows above the watermark
+
+    A watermark above MAX(id) means the table was rebuilt, so start over.
+    """
+    global _columns
+    with _columns_lock:
+        high_id = db.query(func.max(SpendRecord.id)).scalar() or 0
+        if high_id < _columns.last_id:
+            _columns = SpendColumns()
+        if high_id == _columns.last_id:
+            return _columns.snapshot()
+
+        # Core execution on the session's connection skips ORM row loading
+        result = db.connection().execute(
+            select(
+                SpendRecord.id,
+                func.coalesce(SpendRecord.amount, 0),
+                SpendRecord.vendor_id,
+                SpendRecord.category,
+                month_key(db, SpendRecord.spend_date),
+                func.coalesce(SpendRecord.is_maverick_spend, False)
+            ).where(
+                SpendRecord.id > _columns.last_id,
+                SpendRecord.id <= high_id
+            ).order_by(SpendRecord.id).execution_options(yield_per=LOAD_CHUNK_SIZE)
+        )
+        for chunk in result.partitions():
+            _columns.append(chunk)
+        return _columns.snapshot()
+
+
+def _group_keys(columns: SpendSnapshot, baseline: str) -> np.ndarray:
+    key = np.zeros(len(columns.amount), dtype=np.int64)
+    for dim in BASELINES[baseline]:
+        values = getattr(columns, dim).astype(np.int64)
+        key = key * (int(values.max(initial=0)) + 1) + values
+    return key
+
+
+def _quantile_at(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Per-group quantile with linear interpolation, groups laid out contiguously"""
+    position = starts + q * (counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, starts + counts - 1)
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def _group_order(keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Permutation sorting by (key, value) for non-negative integer keys
+
+    Folds each value's rank into the key so a single int64 argsort does the
+    work; about 3x faster than np.lexsort on 10M rows.
+    """
+    n = len(values)
+    if n == 0 or int(keys.max()) >= np.iinfo(np.int64).max // n:
+        return np.lexsort((values, keys))
+    rank = np.empty(n, dtype=np.int64)
+    rank[np.argsort(values)] = np.arange(n)
+    return np.argsort(keys * n + rank)
+
+
+def robust_scores(values: np.ndarray, keys: np.ndarray, method: str = "mad") -> np.ndarray:
+    """Robust z-score of every value against its own group; NaN where the group is too small or flat"""
+    order = _group_order(keys, values)
+    sorted_keys = keys[order]
+    sorted_values = values[order]
+
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    counts = np.diff(np.r_[starts, len(sorted_keys)])
+    group = np.repeat(np.arange(len(starts)), counts)
+
+    median = _quantile_at(sorted_values, starts, counts, 0.5)
+    if method == "iqr":
+        spread = (_quantile_at(sorted_values, starts, counts, 0.75)
+                  - _quantile_at(sorted_values, starts, counts, 0.25)) / IQR_SCALE
+    else:
+        deviation = np.abs(sorted_values - median[group])
+        # Groups are contiguous, so re-sorting deviations within them keeps the layout
+        deviation = deviation[_group_order(group, deviation)]
+        spread = _quantile_at(deviation, starts, counts, 0.5) / MAD_SCALE
+
+    valid = (counts >= MIN_GROUP_SIZE) & (spread > 0)
+    safe_spread = np.where(valid, spread, 1.0)
+    sorted_scores = np.where(valid[group], (sorted_values - median[group]) / safe_spread[group], np.nan)
+
+    scores = np.empty_like(sorted_scores)
+    scores[order] = sorted_scores
+    return scores
+
+
+def detect_anomalies(
+    db: Session,
+    method: str = "mad",
+    baseline: str = "category",
+    threshold: float = DEFAULT_THRESHOLD,
+    sort: str = "amount",
+    skip: int = 0,
+    limit: int = 50
+) -> dict:
+    """Rank maverick and unusually large spend rows
+
+    Totals cover every anomaly; ``page`` holds (spend_record_id, type, score)
+    for the requested slice only, so callers resolve just those rows.
+    """
+    columns = load_spend_columns(db)
+    amount = columns.amount
+
+    scores = robust_scores(amount, _group_keys(columns, baseline), method) if len(amount) else np.empty(0)
+    unusual = np.flatnonzero(np.nan_to_num(scores, nan=-np.inf) > threshold)
+    maverick = np.flatnonzero(columns.maverick)
+
+    # A row can be both maverick and unusual; it is reported once per type
+    rows = np.concatenate([maverick, unusual])
+    types = np.r_[np.zeros(len(maverick), dtype=bool), np.ones(len(unusual), dtype=bool)]
+    rank_by = np.nan_to_num(scores[rows], nan=0.0) if sort == "score" else amount[rows]
+    page = np.argsort(-rank_by, kind="stable")[skip:skip + limit]
+
+    total_spend = float(amount.sum())
+    total_anomaly_value = float(amount[rows].sum())
+
+    return {
+        "summary": {
+            "total_anomalies": len(rows),
+            "total_anomaly_value": total_anomaly_value,
+            "percentage_of_spend": round(total_anomaly_value / total_spend * 100, 2) if total_spend > 0 else 0
+        },
+        "by_type": {
+            "Maverick Spend": len(maverick),
+            "Unusual Amount": len(unusual)
+        },
+        "page": [
+            (
+                int(columns.ids[rows[i]]),
+                "Unusual Amount" if types[i] else "Maverick Spend",
+                None if np.isnan(scores[rows[i]]) else round(float(scores[rows[i]]), 2)
+            )
+            for i in page
+        ]
+    }
@@ -0,0 +1,443 @@
+"""
+Post-payment audit engine
+
+Streams paid invoices in keyset-paginated batches together with their invoice
+lines, PO lines, PO category and contract rate card, evaluates every
+validation rule as a vectorized pandas pass over the batch, and bulk inserts
+new LeakageCase rows. Memory is bounded by ``batch_size`` regardless of how
+many invoices fall inside the scan window.
+"""
+import json
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.database import (
+    SessionLocal, AuditScan, Contract, Invoice, InvoiceLineItem, LeakageCase,
+    POLineItem, PurchaseOrder
+)
+from app.services.cache import invalidate_stats
+from app.services.duplicate_detection import exact_duplicate_ids, sync_index
+
+VALIDATION_RULES = [
+    {
+        "rule_id": "RATE_001",
+        "name": "Rate Card Adherence",
+        "category": "Logistics",
+        "description": "Compare invoiced rate against contracted rate for transportation services",
+        "severity": "High",
+        "threshold": "Any variance > 2%"
+    },
+    {
+        "rule_id": "LIC_001",
+        "name": "License Compliance",
+        "category": "IT Software & SaaS",
+        "description": "Compare billed licenses against PO/contract quantity",
+        "severity": "Medium",
+        "threshold": "Billed > Contracted"
+    },
+    {
+        "rule_id": "DUP_001",
+        "name": "Duplicate Invoice Detection",
+        "category": "All",
+        "description": "Identify invoices with same vendor, number, and amount paid multiple times",
+        "severity": "High",
+        "threshold": "Exact match"
+    },
+    {
+        "rule_id": "TAX_001",
+        "name": "Tax Calculation Verification",
+        "category": "All",
+        "description": "Verify tax amounts against applicable rates",
+        "severity": "Medium",
+        "threshold": "Variance > 0.5%"
+    },
+    {
+        "rule_id": "QTY_001",
+        "name": "Quantity Mismatch",
+        "category": "All",
+        "description": "Compare invoiced quantity against PO quantity",
+        "severity": "Medium",
+        "threshold": "Invoice > PO"
+    },
+    {
+        "rule_id": "ADD_001",
+        "name": "Addendum Timing",
+        "category": "All",
+        "description": "Verify payment uses correct rate card version based on service date",
+        "severity": "High",
+        "threshold": "Wrong addendum applied"
+    }
+]
+
+RULES_BY_ID = {rule["rule_id"]: rule for rule in VALIDATION_RULES}
+
+# leakage_type written for each rule; matches the types used by the seed data
+LEAKAGE_TYPES = {
+    "RATE_001": "Rate Card Violation",
+    "LIC_001": "License Overbilling",
+    "DUP_001": "Duplicate Invoice",
+    "TAX_001": "Tax Calculation Error",
+    "QTY_001": "Quantity Mismatch",
+    "ADD_001": "Addendum Timing"
+}
+
+RATE_VARIANCE_THRESHOLD = 0.02
+TAX_VARIANCE_THRESHOLD = 0.005
+STANDARD_GST_RATE = 0.18
+LOGISTICS_CATEGORY = "Logistics"
+LICENSE_CATEGORY = "IT Software & SaaS"
+DEFAULT_BATCH_SIZE = 500
+
+
+def normalize_description(value) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(value).lower()) if value else ""
+
+
+# --- Batch loading -----------------------------------------------------------
+
+def _frame(rows, columns: List[str], keys: List[str]) -> pd.DataFrame:
+    """DataFrame with float join keys, so empty and NULL-bearing frames still merge"""
+    frame = pd.DataFrame(rows, columns=columns)
+    for key in keys:
+        frame[key] = pd.to_numeric(frame[key], errors="coerce").astype(float)
+    return frame
+
+
+def _load_batch(db: Session, scan: AuditScan, after_id: int) -> pd.DataFrame:
+    rows = db.query(
+        Invoice.id, Invoice.invoice_number, Invoice.po_id, Invoice.vendor_id,
+        Invoice.invoice_amount, Invoice.tax_amount, Invoice.total_amount,
+        Invoice.invoice_date
+    ).filter(
+        Invoice.id > after_id,
+        Invoice.payment_date >= scan.window_start,
+        Invoice.payment_date <= scan.window_end
+    ).order_by(Invoice.id).limit(scan.batch_size).all()
+
+    return _frame(rows, [
+        "invoice_id", "invoice_number", "po_id", "vendor_id",
+        "invoice_amount", "tax_amount", "total_amount", "invoice_date"
+    ], ["invoice_id", "po_id", "vendor_id"])
+
+
+def _load_context(db: Session, invoices: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Fetch every document the rules need for one batch with IN-list queries"""
+    invoice_ids = invoices["invoice_id"].astype(int).tolist()
+    po_ids = invoices["po_id"].dropna().astype(int).unique().tolist()
+
+    invoice_lines = _frame(db.query(
+        InvoiceLineItem.invoice_id, InvoiceLineItem.line_number, InvoiceLineItem.description,
+        InvoiceLineItem.quantity, InvoiceLineItem.unit_price
+    ).filter(InvoiceLineItem.invoice_id.in_(invoice_ids)).all(), [
+        "invoice_id", "line_number", "description", "quantity", "unit_price"
+    ], ["invoice_id", "line_number"])
+
+    po_lines = _frame(db.query(
+        POLineItem.po_id, POLineItem.line_number, POLineItem.quantity, POLineItem.unit_price
+    ).filter(POLineItem.po_id.in_(po_ids)).all(), [
+        "po_id", "line_number", "po_quantity", "po_unit_price"
+    ], ["po_id", "line_number"])
+
+    pos = _frame(db.query(
+        PurchaseOrder.id, PurchaseOrder.category, PurchaseOrder.contract_id, PurchaseOrder.total_amount
+    ).filter(PurchaseOrder.id.in_(po_ids)).all(), [
+        "po_id", "category", "contract_id", "po_total"
+    ], ["po_id", "contract_id"])
+
+    contract_ids = pos["contract_id"].dropna().astype(int).unique().tolist()
+    contracts = db.query(
+        Contract.id, Contract.start_date, Contract.end_date, Contract.rate_card
+    ).filter(Contract.id.in_(contract_ids)).all()
+
+    rate_items = []
+    for contract_id, _, _, rate_card in contracts:
+        items = json.loads(rate_card).get("items", []) if rate_card else []
+        for item in items:
+            rate_items.append((contract_id, normalize_description(item.get("description")), item.get("rate")))
+
+    return {
+        "invoice_lines": invoice_lines,
+        "po_lines": po_lines,
+        "pos": pos,
+        "contracts": _frame(
+            [(c[0], c[1], c[2]) for c in contracts],
+            ["contract_id", "contract_start", "contract_end"], ["contract_id"]
+        ),
+        "rate_items": _frame(
+            rate_items, ["contract_id", "rate_key", "contract_rate"], ["contract_id", "contract_rate"]
+        ).drop_duplicates(["contract_id", "rate_key"])
+    }
+
+
+# --- Rule evaluation -----------------------------------------------------------
+
+def _finding_frame(rule_id: str, invoice_ids, leakage, actual, detail: str) -> pd.DataFrame:
+    frame = pd.DataFrame({
+        "invoice_id": np.asarray(invoice_ids),
+        "leakage_amount": np.asarray(leakage, dtype=float),
+        "actual_amount": np.asarray(actual, dtype=float)
+    })
+    frame["rule_id"] = rule_id
+    frame["detail"] = detail
+    return frame[frame["leakage_amount"] > 0]
+
+
+def _line_rules(invoices: pd.DataFrame, context: Dict[str, pd.DataFrame]) -> List[pd.DataFrame]:
+    """RATE_001, LIC_001 and QTY_001 over joined invoice/PO/rate-card lines"""
+    lines = context["invoice_lines"]
+    if lines.empty:
+        return []
+
+    lines = lines.merge(invoices[["invoice_id", "po_id", "invoice_amount"]], on="invoice_id")
+    lines = lines.merge(context["po_lines"], on=["po_id", "line_number"], how="left")
+    lines = lines.merge(context["pos"][["po_id", "category", "contract_id"]], on="po_id", how="left")
+    lines["rate_key"] = lines["description"].map(normalize_description)
+    lines = lines.merge(context["rate_items"], on=["contract_id", "rate_key"], how="left")
+
+    category = lines["category"].fillna("")
+    quantity = lines["quantity"].fillna(0)
+    unit_price = lines["unit_price"].fillna(0)
+    findings = []
+
+    # RATE_001: contracted rate is the matching rate-card entry, else the PO price agreed under contract
+    contracted = lines["contract_rate"].fillna(lines["po_unit_price"])
+    rate_mask = (
+        category.str.contains(LOGISTICS_CATEGORY, regex=False)
+        & lines["contract_id"].notna()
+        & (contracted > 0)
+        & ((unit_price - contracted) / contracted > RATE_VARIANCE_THRESHOLD)
+    )
+    if rate_mask.any():
+        rate_leak = ((unit_price - contracted) * quantity).where(rate_mask, 0)
+        per_invoice = rate_leak.groupby(lines["invoice_id"]).sum()
+        actual = lines.groupby("invoice_id")["invoice_amount"].first().reindex(per_invoice.index)
+        findings.append(_finding_frame(
+            "RATE_001", per_invoice.index, per_invoice.values, actual.values,
+            "Invoiced rate exceeds contracted rate by more than 2%"
+        ))
+
+    excess_qty = (quantity - lines["po_quantity"].fillna(0)).clip(lower=0)
+    excess_value = excess_qty * unit_price
+    is_license = category == LICENSE_CATEGORY
+
+    # LIC_001: billed licences above PO quantity, summed per invoice
+    if (is_license & (excess_qty > 0)).any():
+        per_invoice = excess_value.where(is_license, 0).groupby(lines["invoice_id"]).sum()
+        actual = lines.groupby("invoice_id")["invoice_amount"].first().reindex(per_invoice.index)
+        findings.append(_finding_frame(
+            "LIC_001", per_invoice.index, per_invoice.values, actual.values,
+            "Billed licenses exceed PO quantity"
+        ))
+
+    # QTY_001: every other category, line by line against the PO
+    if (~is_license & (excess_qty > 0)).any():
+        per_invoice = excess_value.where(~is_license, 0).groupby(lines["invoice_id"]).sum()
+        actual = lines.groupby("invoice_id")["invoice_amount"].first().reindex(per_invoice.index)
+        findings.append(_finding_frame(
+            "QTY_001", per_invoice.index, per_invoice.values, actual.values,
+            "Invoiced quantity exceeds PO quantity"
+        ))
+
+    return findings
+
+
+def _tax_rule(invoices: pd.DataFrame) -> List[pd.DataFrame]:
+    """TAX_001: tax charged above the standard GST rate"""
+    expected_tax = invoices["invoice_amount"].fillna(0) * STANDARD_GST_RATE
+    tax = invoices["tax_amount"].fillna(0)
+    mask = (expected_tax > 0) & ((tax - expected_tax) / expected_tax > TAX_VARIANCE_THRESHOLD)
+    return [_finding_frame(
+        "TAX_001", invoices["invoice_id"], (tax - expected_tax).where(mask, 0),
+        invoices["invoice_amount"], "Tax charged exceeds 18% GST"
+    )]
+
+
+def _addendum_rule(invoices: pd.DataFrame, context: Dict[str, pd.DataFrame]) -> List[pd.DataFrame]:
+    """ADD_001: invoice dated outside the contract term its rate card belongs to"""
+    frame = invoices.merge(context["pos"], on="po_id", how="left")
+    frame = frame.merge(context["contracts"], on="contract_id", how="left")
+    if frame.empty:
+        return []
+
+    invoice_date = pd.to_datetime(frame["invoice_date"])
+    outside = frame["contract_id"].notna() & (
+        (invoice_date < pd.to_datetime(frame["contract_start"]))
+        | (invoice_date > pd.to_datetime(frame["contract_end"]))
+    )
+    overbilled = (frame["invoice_amount"].fillna(0) - frame["po_total"].fillna(0)).clip(lower=0)
+    return [_finding_frame(
+        "ADD_001", frame["invoice_id"], overbilled.where(outside, 0),
+        frame["invoice_amount"], "Service date falls outside the contract rate card term"
+    )]
+
+
+def _duplicate_rule(db: Session, invoices: pd.DataFrame) -> List[pd.DataFrame]:
+    """DUP_001: an earlier invoice has the same vendor, number and amount fingerprint"""
+    sync_index(db)
+    duplicate_ids = exact_duplicate_ids(db, invoices["invoice_id"].astype(int).tolist())
+    duplicates = invoices[invoices["invoice_id"].isin(duplicate_ids)]
+    return [_finding_frame(
+        "DUP_001", duplicates["invoice_id"], duplicates["total_amount"],
+        duplicates["total_amount"], "Invoice matches an earlier invoice with the same vendor, number and amount"
+    )]
+
+
+def evaluate_batch(db: Session, invoices: pd.DataFrame) -> pd.DataFrame:
+    """Run every rule over one batch and return one row per (invoice, rule) finding"""
+    context = _load_context(db, invoices)
+    frames = (
+        _line_rules(invoices, context)
+        + _tax_rule(invoices)
+        + _addendum_rule(invoices, context)
+        + _duplicate_rule(db, invoices)
+    )
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=["invoice_id", "leakage_amount", "actual_amount", "rule_id", "detail"])
+    return pd.concat(frames, ignore_index=True)
+
+
+# --- Persistence -------------------------------------------------------------
+
+def _existing_findings(db: Session, invoice_ids: List[int]) -> set:
+    return set(db.query(LeakageCase.invoice_id, LeakageCase.leakage_type).filter(
+        LeakageCase.invoice_id.in_(invoice_ids),
+        LeakageCase.leakage_type.in_(LEAKAGE_TYPES.values())
+    ).all())
+
+
+def _write_cases(db: Session, scan: AuditScan, findings: pd.DataFrame, sequence: int) -> List[dict]:
+    """Bulk insert findings not already recorded for the same invoice and rule"""
+    existing = _existing_findings(db, findings["invoice_id"].astype(int).unique().tolist())
+    now = datetime.now()
+    case_prefix = scan.scan_id.replace("SCAN", "LKG", 1)
+
+    rows = []
+    for finding in findings.itertuples(index=False):
+        leakage_type = LEAKAGE_TYPES[finding.rule_id]
+        if (int(finding.invoice_id), leakage_type) in existing:
+            continue
+        sequence += 1
+        leakage = round(float(finding.leakage_amount), 2)
+        actual = float(finding.actual_amount) if pd.notna(finding.actual_amount) else leakage
+        rows.append({
+            "rule_id": finding.rule_id,
+            "case_id": f"{case_prefix}-{str(sequence).zfill(5)}",
+            "invoice_id": int(finding.invoice_id),
+            "leakage_type": leakage_type,
+            "description": f"[{finding.rule_id}] {finding.detail}. Leakage: INR {leakage:,.2f}",
+            "expected_amount": round(actual - leakage, 2),
+            "actual_amount": actual,
+            "leakage_amount": leakage,
+            "currency": "INR",
+            "severity": RULES_BY_ID[finding.rule_id]["severity"],
+            "status": "New",
+            "recovered_amount": 0,
+            "created_at": now,
+            "updated_at": now
+        })
+
+    if rows:
+        db.execute(insert(LeakageCase), [
+            {k: v for k, v in row.items() if k != "rule_id"} for row in rows
+        ])
+    return rows
+
+
+# --- Scan lifecycle ----------------------------------------------------------
+
+def create_scan(db: Session, days: int = 30, batch_size: int = DEFAULT_BATCH_SIZE) -> AuditScan:
+    now = datetime.now()
+    scan = AuditScan(
+        scan_id=f"SCAN-{now.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:4].upper()}",
+        status="Queued",
+        window_start=now - timedelta(days=days),
+        window_end=now,
+        batch_size=batch_size,
+        rule_hits=json.dumps({})
+    )
+    db.add(scan)
+    db.commit()
+    return scan
+
+
+def run_scan(scan_id: str) -> None:
+    """Background job body; opens its own session and commits after every batch"""
+    db = SessionLocal()
+    try:
+        scan = db.query(AuditScan).filter(AuditScan.scan_id == scan_id).first()
+        if not scan:
+            return
+
+        scan.status = "Running"
+        scan.started_at = datetime.now()
+        db.commit()
+
+        rule_hits = {rule_id: 0 for rule_id in RULES_BY_ID}
+        after_id = 0
+        while True:
+            invoices = _load_batch(db, scan, after_id)
+            if invoices.empty:
+                break
+            after_id = int(invoices["invoice_id"].iloc[-1])
+
+            findings = evaluate_batch(db, invoices)
+            if not findings.empty:
+                created = _write_cases(db, scan, findings, scan.cases_created)
+                scan.cases_created += len(created)
+                for row in created:
+                    scan.leakage_identified += row["leakage_amount"]
+                    rule_hits[row["rule_id"]] += 1
+
+            scan.invoices_scanned += len(invoices)
+            scan.rule_hits = json.dumps(rule_hits)
+            db.commit()
+            if not findings.empty:
+                invalidate_stats()
+
+        scan.status = "Completed"
+        scan.completed_at = datetime.now()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        scan = db.query(AuditScan).filter(AuditScan.scan_id == scan_id).first()
+        if scan:
+            scan.status = "Failed"
+            scan.error_message = str(e)
+            scan.completed_at = datetime.now()
+            db.commit()
+        raise
+    finally:
+        db.close()
+
+
+def scan_summary(scan: AuditScan) -> dict:
+    return {
+        "scan_id": scan.scan_id,
+        "status": scan.status,
+        "parameters": {
+            "date_range": {
+                "start": scan.window_start.isoformat() if scan.window_start else None,
+                "end": scan.window_end.isoformat() if scan.window_end else None
+            },
+            "categories": "All",
+            "rules_applied": len(VALIDATION_RULES),
+            "batch_size": scan.batch_size
+        },
+        "progress": {
+            "invoices_scanned": scan.invoices_scanned,
+            "cases_created": scan.cases_created,
+            "leakage_identified": round(scan.leakage_identified or 0, 2),
+            "rule_hits": json.loads(scan.rule_hits) if scan.rule_hits else {}
+        },
+        "started_at": scan.started_at.isoformat() if scan.started_at else None,
+        "completed_at": scan.completed_at.isoformat() if scan.completed_at else None,
+        "error": scan.error_message
+    }
@@ -0,0 +1,274 @@
+"""
+RFQ bid storage and weighted bid evaluation
+
+Agent RFQs are SourcingRequest rows (ariba_id holds the RFQ id) and bids are
+SupplierBid rows, with optional itemized prices in SupplierBidLine. A vendor
+has at most one bid per RFQ; a revised bid replaces the earlier one.
+
+Bids are scored on four criteria, each scaled to 0..1 and weighted by
+CRITERIA:
+
+* price - lowest compliant amount / bid amount. Itemized bids are compared
+  line by line instead: lowest unit price / quoted unit price, weighted by
+  line value, with unquoted lines scoring 0
+* technical - technical_score / 100; bids not yet scored get 0
+* delivery - shortest compliant timeline / bid timeline
+* vendor risk - 1 - scorecard risk_score / 100, 0.5 without a scorecard
+
+Scoring is vectorized: bids are arrays and line prices one bids x lines
+matrix, so a tender with hundreds of bidders and thousands of lines is a few
+numpy passes. Results are cached per RFQ and reused until its bid count,
+latest bid id or latest submission time changes, or the scorecards refresh.
+
+Benchmark the scoring on a synthetic tender with:
+    python -m app.services.bid_evaluation
+"""
+from datetime import datetime
+from itertools import chain
+from typing import Iterable, List, Optional
+
+import numpy as np
+from fastapi import BackgroundTasks
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.database import SourcingRequest, SupplierBid, SupplierBidLine, SupplierScorecard, Vendor
+from app.services.cache import bid_evaluation_cache
+from app.services.supplier_scorecards import refresh_supplier_scorecards
+
+OPEN_STATUS = "In Progress"
+AWARDED_STATUS = "Awarded"
+NEUTRAL_VENDOR_SCORE = 0.5  # Vendors without a scorecard
+
+# (key, label, weight in percent)
+CRITERIA = (
+    ("price", "Price", 40),
+    ("technical", "Technical Compliance", 30),
+    ("delivery", "Delivery Timeline", 20),
+    ("vendor_risk", "Vendor Risk", 10),
+)
+WEIGHTS = np.array([weight for _, _, weight in CRITERIA], dtype=float)
+
+
+def evaluation_criteria() -> List[dict]:
+    return [{"criterion": label, "weight": weight} for _, label, weight in CRITERIA]
+
+
+def bid_code(rfq_id: str, vendor_id: int) -> str:
+    return f"BID{rfq_id[3:]}-V{vendor_id}"
+
+
+def record_bid(db: Session, request: SourcingRequest, vendor_id: int, bid_amount: float,
+               delivery_days: int, technical_score: Optional[float], is_compliant: bool,
+               notes: Optional[str], lines: Iterable[dict] = ()) -> SupplierBid:
+    """Store a vendor's bid and its lines, replacing any earlier bid from the vendor"""
+    previous = [bid_id for (bid_id,) in db.query(SupplierBid.id).filter(
+        SupplierBid.sourcing_request_id == request.id, SupplierBid.vendor_id == vendor_id
+    )]
+    if previous:
+        db.execute(delete(SupplierBidLine).where(SupplierBidLine.supplier_bid_id.in_(previous)))
+        db.execute(delete(SupplierBid).where(SupplierBid.id.in_(previous)))
+
+    bid = SupplierBid(
+        bid_id=bid_code(request.ariba_id, vendor_id),
+        sourcing_request_id=request.id,
+        vendor_id=vendor_id,
+        bid_amount=bid_amount,
+        technical_score=technical_score,
+        delivery_timeline_days=delivery_days,
+        bid_submitted_date=datetime.utcnow(),
+        is_compliant=is_compliant,
+        notes=notes
+    )
+    db.add(bid)
+    db.flush()
+    rows = [{"supplier_bid_id": bid.id, **line} for line in lines]
+    if rows:
+        db.execute(insert(SupplierBidLine), rows)
+    db.commit()
+    return bid
+
+
+# Scoring
+
+def _ratio(best: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """best / values capped at 1; 0 where a value is missing, 1 where it is zero"""
+    ratio = np.divide(best, values, out=np.zeros_like(values), where=values > 0)
+    return np.minimum(np.nan_to_num(np.where(values == 0, 1.0, ratio), nan=0.0), 1.0)
+
+
+def line_price_scores(bid_pos: np.ndarray, line_no: np.ndarray, quantity: np.ndarray,
+                      unit_price: np.ndarray, pool: np.ndarray) -> np.ndarray:
+    """Line-by-line price score per bid; NaN for bids without lines
+
+    ``bid_pos`` gives each line's bid position. Reference prices are the lowest
+    quotes among the ``pool`` bids, or among all bids for lines nobody in the
+    pool quoted.
+    """
+    lines, column = np.unique(line_no, return_inverse=True)
+    prices = np.full((len(pool), len(lines)), np.inf)
+    prices[bid_pos, column] = unit_price
+    quoted = np.isfinite(prices)
+
+    best = prices[pool].min(axis=0) if pool.any() else np.full(len(lines), np.inf)
+    best = np.where(np.isinf(best), prices.min(axis=0), best)
+    quantities = np.zeros(prices.shape)
+    quantities[bid_pos, column] = quantity
+    value = quantities.max(axis=0) * best
+    weight = value / value.sum() if value.sum() > 0 else np.full(len(lines), 1.0 / len(lines))
+
+    ratio = np.divide(best, prices, out=np.ones_like(prices), where=quoted & (prices > 0))
+    scores = np.where(quoted, np.minimum(ratio, 1.0), 0.0) @ weight
+    itemized = np.zeros(len(pool), dtype=bool)
+    itemized[bid_pos] = True
+    return np.where(itemized, scores, np.nan)
+
+
+def score_bids(amount: np.ndarray, technical: np.ndarray, delivery_days: np.ndarray,
+               risk: np.ndarray, compliant: np.ndarray, line_price: Optional[np.ndarray] = None) -> np.ndarray:
+    """Bids x CRITERIA matrix of 0..1 scores; inputs use NaN for missing values"""
+    pool = compliant if compliant.any() else np.ones(len(amount), dtype=bool)
+    price = _ratio(np.nanmin(np.where(pool, amount, np.nan)), amount)
+    if line_price is not None:
+        price = np.where(np.isnan(line_price), price, line_price)
+
+    delivery = _ratio(np.nanmin(np.where(pool, delivery_days, np.nan)), delivery_days)
+    technical = np.clip(np.nan_to_num(technical / 100, nan=0.0), 0.0, 1.0)
+    vendor = np.clip(np.nan_to_num(1 - risk / 100, nan=NEUTRAL_VENDOR_SCORE), 0.0, 1.0)
+    return np.column_stack([price, technical, delivery, vendor])
+
+
+# Evaluation
+
+def _load(db: Session, request_id: int):
+    connection = db.connection()  # Plain rows; ORM result processing costs more than the scoring
+    bids = connection.execute(
+        select(SupplierBid.id, SupplierBid.bid_id, SupplierBid.vendor_id, Vendor.vendor_name,
+               SupplierBid.bid_amount, SupplierBid.technical_score, SupplierBid.delivery_timeline_days,
+               SupplierBid.is_compliant, SupplierBid.bid_submitted_date, SupplierScorecard.risk_score)
+        .outerjoin(Vendor, Vendor.id == SupplierBid.vendor_id)
+        .outerjoin(SupplierScorecard, SupplierScorecard.vendor_id == SupplierBid.vendor_id)
+        .where(SupplierBid.sourcing_request_id == request_id)
+        .order_by(SupplierBid.id)
+    ).all()
+    lines = connection.execute(
+        select(SupplierBidLine.supplier_bid_id, SupplierBidLine.line_no,
+               SupplierBidLine.quantity, SupplierBidLine.unit_price)
+        .join(SupplierBid, SupplierBid.id == SupplierBidLine.supplier_bid_id)
+        .where(SupplierBid.sourcing_request_id == request_id)
+    ).all()
+    table = np.fromiter(chain.from_iterable(lines), dtype=float, count=len(lines) * 4).reshape(-1, 4)
+    return bids, table
+
+
+def _column(rows, index: int) -> np.ndarray:
+    return np.array([np.nan if row[index] is None else row[index] for row in rows], dtype=float)
+
+
+def evaluate_rfq(db: Session, request: SourcingRequest, background_tasks: Optional[BackgroundTasks] = None) -> dict:
+    """Ranked bids with per-criterion scores and a recommendation, cached per RFQ
+
+    ``background_tasks`` is passed on to ``refresh_supplier_scorecards``.
+    """
+    bids_version = db.query(
+        func.count(SupplierBid.id), func.max(SupplierBid.id), func.max(SupplierBid.bid_submitted_date)
+    ).filter(SupplierBid.sourcing_request_id == request.id).one()
+    state = refresh_supplier_scorecards(db, background_tasks)
+    version = (*bids_version, state.refreshed_at)
+    cached = bid_evaluation_cache.get(request.id)
+    if cached and cached[0][0] == version:
+        return cached[0][1]
+
+    bids, lines = _load(db, request.id)
+    result = {"evaluation_criteria": evaluation_criteria(), "bids": [], "analysis": None}
+    if bids:
+        result = _evaluate(bids, lines, result)
+    bid_evaluation_cache.set(request.id, (version, result))
+    return result
+
+
+def _evaluate(bids, lines: np.ndarray, result: dict) -> dict:
+    """Score and rank ``bids``; ``lines`` holds (bid id, line_no, quantity, unit_price) rows"""
+    amount, technical, delivery_days, risk = (_column(bids, i) for i in (4, 5, 6, 9))
+    compliant = np.array([bool(row[7]) for row in bids])
+    pool = compliant if compliant.any() else np.ones(len(bids), dtype=bool)
+
+    line_price = None
+    line_counts = np.zeros(len(bids), dtype=int)
+    if len(lines):
+        bid_pos = np.searchsorted(np.array([row[0] for row in bids]), lines[:, 0])
+        line_price = line_price_scores(bid_pos, lines[:, 1], lines[:, 2], lines[:, 3], pool)
+        line_counts = np.bincount(bid_pos, minlength=len(bids))
+
+    scores = score_bids(amount, technical, delivery_days, risk, compliant, line_price)
+    total = scores @ WEIGHTS
+    order = np.lexsort((-total, ~compliant))  # Compliant bids first, then by score
+
+    ranked = []
+    for rank, i in enumerate(order, start=1):
+        row = bids[i]
+        ranked.append({
+            "bid_id": row[1],
+            "vendor_id": row[2],
+            "vendor_name": row[3],
+            "bid_amount": row[4],
+            "delivery_days": row[6],
+            "technical_score": row[5],
+            "is_compliant": bool(row[7]),
+            "submitted_at": row[8].isoformat() if row[8] else None,
+            "line_items": int(line_counts[i]),
+            "scores": {key: round(float(scores[i, k]) * 100, 1) for k, (key, _, _) in enumerate(CRITERIA)},
+            "total_score": round(float(total[i]), 2),
+            "rank": rank
+        })
+
+    by_position = {i: ranked[rank] for rank, i in enumerate(order)}
+    candidates = np.flatnonzero(pool)
+    best = order[0]
+    leads = [label.lower() for k, (_, label, _) in enumerate(CRITERIA)
+             if scores[best, k] >= scores[candidates, k].max() - 1e-9]
+    reason = f"Highest weighted score ({total[best]:.1f}/100)"
+    if leads:
+        reason += f"; best on {', '.join(leads)}"
+
+    result["bids"] = ranked
+    result["analysis"] = {
+        "bid_count": len(bids),
+        "compliant_bids": int(compliant.sum()),
+        "lowest_bid": by_position[candidates[np.nanargmin(amount[candidates])]],
+        "highest_technical_score": by_position[candidates[np.argmax(np.nan_to_num(technical[candidates], nan=-1))]],
+        "fastest_delivery": by_position[candidates[np.nanargmin(np.nan_to_num(delivery_days[candidates], nan=np.inf))]],
+        "recommendation": {
+            "bid_id": ranked[0]["bid_id"],
+            "vendor_id": ranked[0]["vendor_id"],
+            "vendor_name": ranked[0]["vendor_name"],
+            "total_score": ranked[0]["total_score"],
+            "reason": reason,
+            "potential_savings": round(float(np.nanmax(amount[candidates]) - amount[best]), 2)
+        }
+    }
+    return result
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(7)
+    bidders, items = 500, 5000
+    amount = rng.uniform(0.85, 1.15, bidders) * 1e7
+    technical = rng.uniform(60, 100, bidders)
+    delivery_days = rng.integers(7, 60, bidders).astype(float)
+    risk = rng.uniform(0, 80, bidders)
+    compliant = rng.random(bidders) > 0.1
+    bid_pos = np.repeat(np.arange(bidders), items)
+    line_no = np.tile(np.arange(1, items + 1), bidders)
+    quantity = np.tile(rng.integers(1, 500, items).astype(float), bidders)
+    unit_price = np.tile(rng.uniform(100, 5000, items), bidders) * rng.uniform(0.8, 1.2, bidders * items)
+
+    started = time.perf_counter()
+    line_price = line_price_scores(bid_pos, line_no, quantity, unit_price, compliant)
+    total = score_bids(amount, technical, delivery_days, risk, compliant, line_price) @ WEIGHTS
+    order = np.lexsort((-total, ~compliant))
+    elapsed = time.perf_counter() - started
+    print(f"{bidders} bids x {items} lines ({bidders * items:,} prices) scored in {elapsed * 1000:.0f} ms; "
+          f"best total {total[order[0]]:.1f}")
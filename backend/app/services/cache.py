@@ -0,0 +1,58 @@
+"""
+Process-local TTL cache for computed responses
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Holds computed values for ``ttl_seconds`` or until invalidated.
+
+    Each uvicorn worker has its own copy, so writers call ``invalidate`` for
+    the process that served the write and the TTL bounds staleness elsewhere.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable = None) -> Optional[Tuple[Any, float]]:
+        """Return ``(value, age_seconds)`` for a live entry, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = time.monotonic() - entry[0]
+            if age >= self.ttl_seconds:
+                del self._entries[key]
+                return None
+            return entry[1], age
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """Drop one entry, or every entry when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+stats_cache = TTLCache(float(os.getenv("STATS_CACHE_TTL_SECONDS", "30")))
+
+# Entries carry the scorecard refresh time, so a refresh in any worker retires them
+category_ranking_cache = TTLCache(float(os.getenv("CATEGORY_RANKING_TTL_SECONDS", "300")))
+
+# One entry per RFQ, reused while its bids and the scorecards are unchanged
+bid_evaluation_cache = TTLCache(float(os.getenv("BID_EVALUATION_TTL_SECONDS", "600")))
+
+
+def invalidate_stats() -> None:
+    """Call after any write that changes the /api/stats counts or totals"""
+    stats_cache.invalidate()
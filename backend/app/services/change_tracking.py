@@ -0,0 +1,133 @@
+"""
+Propagate source document edits to their procurement transactions
+
+The event log and timeline store rebuild a transaction when its
+``updated_at`` moves, but most edits land on the underlying sourcing
+request, contract, requisition, PO or invoice instead. A ``before_flush``
+hook bumps ``updated_at`` on every transaction that references a document
+modified or deleted through the ORM. Core bulk writers bypass the hook and
+call ``touch_transactions`` themselves.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import event, func, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.database import (
+    Contract, Invoice, ProcurementTransaction, PurchaseOrder, PurchaseRequisition, SourcingRequest
+)
+
+# Document model -> ProcurementTransaction foreign key column
+DOCUMENT_LINKS = {
+    SourcingRequest: "sourcing_request_id",
+    Contract: "contract_id",
+    PurchaseRequisition: "pr_id",
+    PurchaseOrder: "po_id",
+    Invoice: "invoice_id",
+}
+CHUNK_SIZE = 500
+
+
+def touch_transactions(conn: Connection, document_ids: Dict[str, Iterable[int]]) -> None:
+    """Bump ``updated_at`` on transactions linked to ``{fk_column: document ids}``"""
+    table = ProcurementTransaction.__table__
+    now = datetime.utcnow()
+    for column, ids in document_ids.items():
+        ids = sorted({i for i in ids if i is not None})
+        for start in range(0, len(ids), CHUNK_SIZE):
+            conn.execute(update(table).where(
+                table.c[column].in_(ids[start:start + CHUNK_SIZE])
+            ).values(updated_at=now))
+
+
+def _changed_documents(session: Session) -> Dict[str, set]:
+    changed: Dict[str, set] = {}
+    candidates = [(obj, True) for obj in session.dirty] + [(obj, False) for obj in session.deleted]
+    for obj, check_modified in candidates:
+        column = DOCUMENT_LINKS.get(type(obj))
+        if column is None or obj.id is None:
+            continue
+        if check_modified and not session.is_modified(obj, include_collections=False):
+            continue
+        changed.setdefault(column, set()).add(obj.id)
+    return changed
+
+
+def _touch_on_flush(session: Session, flush_context, instances) -> None:
+    changed = _changed_documents(session)
+    if changed:
+        touch_transactions(session.connection(), changed)
+
+
+def track_document_changes() -> None:
+    """Install the flush hook on every ORM session; safe to call more than once"""
+    if not event.contains(Session, "before_flush", _touch_on_flush):
+        event.listen(Session, "before_flush", _touch_on_flush)
+
+
+class TransactionDelta(NamedTuple):
+    """Work claimed by one refresh of a transaction-derived store"""
+    low_id: int  # Transactions above this id are new; 0 means rebuild everything
+    high_id: int
+    updated_ids: List[int]  # Existing transactions whose updated_at moved
+
+
+def claim_transaction_delta(db: Session, state_model) -> Optional[TransactionDelta]:
+    """Claim the transactions a store must (re)build since its last refresh
+
+    ``state_model`` is a single-row table with last_transaction_id,
+    last_updated_at, version and refreshed_at. Returns None when nothing
+    changed or another worker claimed the change first (the session is then
+    committed or rolled back). Otherwise the watermarks are already advanced
+    in the open transaction, so the caller writes its rows and commits.
+    A watermark above MAX(id) means transactions were reloaded, and
+    ``low_id`` is 0 so the caller rebuilds from scratch.
+    """
+    state = db.query(state_model).filter(state_model.id == 1).first()
+    if not state:
+        state = state_model(id=1, last_transaction_id=0, version=0)
+        db.add(state)
+        try:
+            db.flush()
+        except IntegrityError:
+            # Another worker created it first
+            db.rollback()
+            state = db.query(state_model).filter(state_model.id == 1).one()
+
+    low_id, last_updated, version = state.last_transaction_id or 0, state.last_updated_at, state.version or 0
+    high_id, high_updated = db.query(
+        func.max(ProcurementTransaction.id), func.max(ProcurementTransaction.updated_at)
+    ).one()
+    high_id = high_id or 0
+
+    if high_id == low_id and high_updated == last_updated:
+        db.commit()
+        return None
+
+    claimed = db.query(state_model).filter(
+        state_model.id == 1,
+        state_model.version == version
+    ).update({
+        state_model.last_transaction_id: high_id,
+        state_model.last_updated_at: high_updated,
+        state_model.version: version + 1,
+        state_model.refreshed_at: datetime.utcnow()
+    }, synchronize_session=False)
+
+    if not claimed:
+        # Another worker applied this change first
+        db.rollback()
+        return None
+
+    if high_id < low_id or not low_id:
+        return TransactionDelta(0, high_id, [])
+
+    moved = ProcurementTransaction.updated_at.isnot(None) if last_updated is None \
+        else ProcurementTransaction.updated_at > last_updated
+    updated_ids = [row[0] for row in db.query(ProcurementTransaction.id).filter(
+        ProcurementTransaction.id <= low_id, moved
+    )]
+    return TransactionDelta(low_id, high_id, updated_ids)
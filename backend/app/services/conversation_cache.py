@@ -0,0 +1,207 @@
+"""
+Write-behind cache for agent conversations
+
+The chat loop reads and updates a conversation on every turn. Conversation
+state (requirements, status, suggested vendors, RFQ fields) lives in an
+in-process LRU here, so a turn touches no database rows. Messages are queued
+and written in batches. A background thread flushes every
+AGENT_FLUSH_INTERVAL_SECONDS, or sooner once AGENT_FLUSH_BATCH messages are
+waiting. Each flush inserts the queued messages with one executemany and
+writes each changed conversation once, however many turns it took since the
+last flush.
+
+Only new conversations are written immediately, because their id is needed
+for the messages. A failed flush puts its work back and retries on the next
+tick. Dirty entries are never evicted. ``close`` stops the thread and flushes
+whatever is left, and the app calls it on shutdown.
+
+Each uvicorn worker holds its own cache, so a session must stay on one worker
+(sticky routing, or a single worker) for its state to be current. Readers of
+the stored history call ``flush`` first.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.models.database import AgentConversation, ConversationMessage, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationState:
+    """One conversation's state; handlers assign new values and then call ``mark_dirty``
+
+    ``requirements`` is replaced, never edited in place, so a flush always
+    serializes a complete dict.
+    """
+
+    def __init__(self, row: AgentConversation):
+        self.id = row.id
+        self.session_id = row.session_id
+        self.user_id = row.user_id
+        self.spend_category = row.spend_category
+        self.status = row.status
+        self.requirements = json.loads(row.requirements_gathered) if row.requirements_gathered else {}
+        self.suggested_vendors = json.loads(row.suggested_vendors) if row.suggested_vendors else None
+        self.rfq_generated = bool(row.rfq_generated)
+        self.rfq_id = row.rfq_id
+        self.updated_at = row.updated_at
+        self.dirty = False
+        self.touched_at = time.monotonic()
+
+    def _row(self) -> dict:
+        return {
+            "id": self.id,
+            "spend_category": self.spend_category,
+            "status": self.status,
+            "requirements_gathered": json.dumps(self.requirements),
+            "suggested_vendors": json.dumps(self.suggested_vendors) if self.suggested_vendors is not None else None,
+            "rfq_generated": self.rfq_generated,
+            "rfq_id": self.rfq_id,
+            "updated_at": self.updated_at,
+        }
+
+
+class ConversationCache:
+    def __init__(self, capacity: int, ttl_seconds: float, flush_interval: float, flush_batch: int):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._states: "OrderedDict[str, ConversationState]" = OrderedDict()
+        self._messages: List[dict] = []
+        self._lock = threading.Lock()  # Guards _states and _messages
+        self._flush_lock = threading.Lock()  # One flush at a time
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Reads and writes
+
+    def get(self, db: Session, session_id: str) -> Optional[ConversationState]:
+        """Cached state for ``session_id``, loaded from the database on a miss"""
+        with self._lock:
+            state = self._states.get(session_id)
+            if state is not None:
+                state.touched_at = time.monotonic()
+                self._states.move_to_end(session_id)
+                return state
+
+        row = db.query(AgentConversation).filter(AgentConversation.session_id == session_id).first()
+        if row is None:
+            return None
+        with self._lock:
+            state = self._states.setdefault(session_id, ConversationState(row))  # Keep a concurrent loader's copy
+            self._evict()
+        return state
+
+    def create(self, db: Session, **values) -> ConversationState:
+        """Insert a conversation row right away, so its id is known, and cache it"""
+        row = AgentConversation(**values)
+        db.add(row)
+        db.commit()
+        state = ConversationState(row)
+        with self._lock:
+            self._states[state.session_id] = state
+            self._evict()
+        return state
+
+    def add_message(self, state: ConversationState, role: str, content: str) -> dict:
+        """Queue a message and return its row; timestamps are taken now so history keeps turn order"""
+        message = {"conversation_id": state.id, "role": role, "content": content, "timestamp": datetime.utcnow()}
+        with self._lock:
+            self._messages.append(message)
+            backlog = len(self._messages)
+        if backlog >= self.flush_batch:
+            self._wakeup.set()
+        return message
+
+    def mark_dirty(self, state: ConversationState) -> None:
+        """Record that ``state`` changed; the next flush writes it"""
+        state.updated_at = datetime.utcnow()
+        state.dirty = True
+
+    # Flushing
+
+    def flush(self) -> int:
+        """Write queued messages and changed conversations; returns messages written"""
+        with self._flush_lock:
+            with self._lock:
+                messages, self._messages = self._messages, []
+                dirty = [state for state in self._states.values() if state.dirty]
+
+            rows = []
+            for state in dirty:
+                state.dirty = False  # Cleared first, so a change made during the flush marks it again
+                rows.append(state._row())
+            if not messages and not rows:
+                return 0
+
+            try:
+                with SessionLocal() as db, db.begin():
+                    if messages:
+                        db.execute(insert(ConversationMessage), messages)
+                    if rows:
+                        db.execute(update(AgentConversation), rows)
+            except Exception:
+                with self._lock:
+                    self._messages[:0] = messages
+                for state in dirty:
+                    state.dirty = True
+                raise
+            return len(messages)
+
+    def _evict(self, expire: bool = False) -> None:
+        """Drop least recently used clean entries past capacity, and past the TTL when ``expire``; needs _lock"""
+        overflow = len(self._states) - self.capacity
+        if overflow <= 0 and not expire:
+            return
+        expired = time.monotonic() - self.ttl_seconds
+        for session_id, state in list(self._states.items()):
+            if overflow <= 0 and (not expire or state.touched_at >= expired):
+                break  # Entries are in last-use order, so the rest are newer
+            if not state.dirty:
+                del self._states[session_id]
+                overflow -= 1
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Conversation flush failed; retrying on the next tick")
+            with self._lock:
+                self._evict(expire=True)
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="conversation-flush", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """Stop the flush thread and write everything still queued"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+conversation_cache = ConversationCache(
+    capacity=int(os.getenv("AGENT_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("AGENT_CACHE_TTL_SECONDS", "1800")),
+    flush_interval=float(os.getenv("AGENT_FLUSH_INTERVAL_SECONDS", "1.0")),
+    flush_batch=int(os.getenv("AGENT_FLUSH_BATCH", "500")),
+)
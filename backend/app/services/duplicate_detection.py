@@ -0,0 +1,277 @@
+"""
+Duplicate invoice detection (DUP_001) backed by a persisted hash index
+
+Every invoice gets one InvoiceFingerprint row keyed by
+sha1(vendor_id | normalized invoice number | amount in cents). An exact
+duplicate is an indexed lookup on that hash; a near duplicate is a lookup on
+(vendor_id, log-scale amount bucket) followed by a date-window and
+invoice-number similarity check over the few rows in neighbouring buckets.
+Invoices are indexed incrementally above the highest fingerprinted id, so new
+invoices never trigger a rescan.
+"""
+import hashlib
+import math
+import re
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import and_, func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from app.models.database import Invoice, InvoiceFingerprint
+
+NEAR_AMOUNT_TOLERANCE = 0.01  # Amounts within ~1% share or neighbour a bucket
+NEAR_DATE_WINDOW_DAYS = 7
+INDEX_BATCH_SIZE = 5000
+
+# Characters commonly confused by OCR, folded to one canonical form
+OCR_FOLD = str.maketrans({"O": "0", "Q": "0", "D": "0", "I": "1", "L": "1", "S": "5", "B": "8", "Z": "2", "G": "6"})
+
+
+def normalize_invoice_number(value) -> str:
+    """Uppercase alphanumerics only, so 'inv-0012' and 'INV 0012' compare equal"""
+    return re.sub(r"[^A-Z0-9]", "", str(value).upper()) if value else ""
+
+
+def ocr_key(number_key: str) -> str:
+    return number_key.translate(OCR_FOLD)
+
+
+def amount_cents(total_amount: Optional[float]) -> Optional[int]:
+    return int(round(total_amount * 100)) if total_amount is not None else None
+
+
+def amount_bucket(total_amount: Optional[float]) -> Optional[int]:
+    if not total_amount or total_amount <= 0:
+        return None
+    return int(math.floor(math.log(total_amount) / math.log1p(NEAR_AMOUNT_TOLERANCE)))
+
+
+def fingerprint(vendor_id, invoice_number, total_amount) -> str:
+    key = f"{vendor_id}|{normalize_invoice_number(invoice_number)}|{amount_cents(total_amount)}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _fingerprint_row(invoice_id, vendor_id, invoice_number, total_amount, invoice_date) -> dict:
+    number_key = normalize_invoice_number(invoice_number)
+    return {
+        "invoice_id": invoice_id,
+        "vendor_id": vendor_id,
+        "number_key": number_key,
+        "ocr_key": ocr_key(number_key),
+        "amount_cents": amount_cents(total_amount),
+        "amount_bucket": amount_bucket(total_amount),
+        "invoice_date": invoice_date,
+        "fingerprint": fingerprint(vendor_id, invoice_number, total_amount)
+    }
+
+
+def sync_index(db: Session, batch_size: int = INDEX_BATCH_SIZE) -> int:
+    """Fingerprint every invoice above the highest indexed id; returns rows added
+
+    Invoices are append-only by id, so this costs one MAX() lookup when the
+    index is current. A concurrent writer indexing the same rows is tolerated.
+    """
+    indexed = 0
+    while True:
+        last_id = db.query(func.max(InvoiceFingerprint.invoice_id)).scalar() or 0
+        invoices = db.query(
+            Invoice.id, Invoice.vendor_id, Invoice.invoice_number,
+            Invoice.total_amount, Invoice.invoice_date
+        ).filter(Invoice.id > last_id).order_by(Invoice.id).limit(batch_size).all()
+
+        if not invoices:
+            return indexed
+
+        try:
+            db.execute(insert(InvoiceFingerprint), [_fingerprint_row(*inv) for inv in invoices])
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            continue
+        indexed += len(invoices)
+
+
+def reindex_invoices(db: Session, invoice_ids: Iterable[int]) -> None:
+    """Recompute fingerprints of invoices edited in place; joins the caller's transaction
+
+    Only invoices already in the index are rewritten, so sync_index's id
+    watermark still picks up everything above it.
+    """
+    ids = sorted(set(invoice_ids))
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        indexed = [row[0] for row in db.query(InvoiceFingerprint.invoice_id).filter(
+            InvoiceFingerprint.invoice_id.in_(chunk)
+        )]
+        if not indexed:
+            continue
+        db.query(InvoiceFingerprint).filter(
+            InvoiceFingerprint.invoice_id.in_(indexed)
+        ).delete(synchronize_session=False)
+        invoices = db.query(
+            Invoice.id, Invoice.vendor_id, Invoice.invoice_number,
+            Invoice.total_amount, Invoice.invoice_date
+        ).filter(Invoice.id.in_(indexed)).all()
+        db.execute(insert(InvoiceFingerprint), [_fingerprint_row(*inv) for inv in invoices])
+
+
+def exact_duplicate_ids(db: Session, invoice_ids: Iterable[int]) -> List[int]:
+    """Subset of ``invoice_ids`` whose fingerprint belongs to an earlier invoice"""
+    invoice_ids = list(invoice_ids)
+    if not invoice_ids:
+        return []
+
+    current = aliased(InvoiceFingerprint)
+    earlier = aliased(InvoiceFingerprint)
+    rows = db.query(current.invoice_id).join(
+        earlier, and_(
+            earlier.fingerprint == current.fingerprint,
+            earlier.invoice_id < current.invoice_id
+        )
+    ).filter(current.invoice_id.in_(invoice_ids)).distinct().all()
+    return [r[0] for r in rows]
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if ``a`` and ``b`` differ by one substitution, insertion, deletion or adjacent transposition"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return len(diffs) == 2 and diffs[1] == diffs[0] + 1 and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]]
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+def is_similar_number(a: InvoiceFingerprint, b: InvoiceFingerprint) -> bool:
+    """Same number after OCR folding, or one keystroke/transposition apart"""
+    return a.ocr_key == b.ocr_key or _within_one_edit(a.number_key, b.number_key)
+
+
+def _near_candidates(db: Session, vendor_id, bucket, invoice_date, exclude_invoice_id=None):
+    if bucket is None:
+        return []
+    query = db.query(InvoiceFingerprint).filter(
+        InvoiceFingerprint.vendor_id == vendor_id,
+        InvoiceFingerprint.amount_bucket.between(bucket - 1, bucket + 1)
+    )
+    if invoice_date:
+        window = timedelta(days=NEAR_DATE_WINDOW_DAYS)
+        query = query.filter(InvoiceFingerprint.invoice_date.between(invoice_date - window, invoice_date + window))
+    if exclude_invoice_id is not None:
+        query = query.filter(InvoiceFingerprint.invoice_id != exclude_invoice_id)
+    return query.all()
+
+
+def _amounts_close(a_cents, b_cents) -> bool:
+    if a_cents is None or b_cents is None:
+        return False
+    return abs(a_cents - b_cents) <= max(abs(a_cents), abs(b_cents)) * NEAR_AMOUNT_TOLERANCE
+
+
+def check_invoice(
+    db: Session,
+    vendor_id: int,
+    invoice_number: str,
+    total_amount: float,
+    invoice_date: Optional[datetime] = None,
+    near: bool = True,
+    exclude_invoice_id: Optional[int] = None
+) -> dict:
+    """Match a (possibly not yet stored) invoice against the index"""
+    probe = InvoiceFingerprint(**_fingerprint_row(
+        exclude_invoice_id, vendor_id, invoice_number, total_amount, invoice_date
+    ))
+
+    exact_query = db.query(InvoiceFingerprint.invoice_id).filter(
+        InvoiceFingerprint.fingerprint == probe.fingerprint
+    )
+    if exclude_invoice_id is not None:
+        exact_query = exact_query.filter(InvoiceFingerprint.invoice_id != exclude_invoice_id)
+    exact = [r[0] for r in exact_query.all()]
+
+    near_matches = []
+    if near:
+        for candidate in _near_candidates(db, vendor_id, probe.amount_bucket, invoice_date, exclude_invoice_id):
+            if candidate.invoice_id in exact:
+                continue
+            if _amounts_close(candidate.amount_cents, probe.amount_cents) and is_similar_number(candidate, probe):
+                near_matches.append(candidate.invoice_id)
+
+    return {"exact_matches": exact, "near_matches": near_matches}
+
+
+def find_exact_duplicate_groups(db: Session, limit: int = 50) -> List[dict]:
+    """Fingerprints shared by more than one invoice, largest groups first"""
+    invoice_count = func.count(InvoiceFingerprint.invoice_id).label("invoice_count")
+    groups = db.query(
+        InvoiceFingerprint.fingerprint,
+        InvoiceFingerprint.vendor_id,
+        InvoiceFingerprint.number_key,
+        InvoiceFingerprint.amount_cents,
+        invoice_count
+    ).group_by(
+        InvoiceFingerprint.fingerprint, InvoiceFingerprint.vendor_id,
+        InvoiceFingerprint.number_key, InvoiceFingerprint.amount_cents
+    ).having(invoice_count > 1).order_by(invoice_count.desc()).limit(limit).all()
+
+    fingerprints = [g.fingerprint for g in groups]
+    members = {}
+    for fp, invoice_id in db.query(
+        InvoiceFingerprint.fingerprint, InvoiceFingerprint.invoice_id
+    ).filter(InvoiceFingerprint.fingerprint.in_(fingerprints)).order_by(InvoiceFingerprint.invoice_id):
+        members.setdefault(fp, []).append(invoice_id)
+
+    return [
+        {
+            "match_type": "exact",
+            "vendor_id": g.vendor_id,
+            "invoice_number_key": g.number_key,
+            "total_amount": g.amount_cents / 100 if g.amount_cents is not None else None,
+            "invoice_ids": members.get(g.fingerprint, [])
+        }
+        for g in groups
+    ]
+
+
+def find_near_duplicate_pairs(db: Session, limit: int = 50) -> List[dict]:
+    """Pairs in the same vendor and neighbouring amount bucket, within the date window, with similar numbers"""
+    a = aliased(InvoiceFingerprint)
+    b = aliased(InvoiceFingerprint)
+    window_seconds = NEAR_DATE_WINDOW_DAYS * 86400
+
+    candidates = db.query(a, b).join(
+        b, and_(
+            b.vendor_id == a.vendor_id,
+            b.amount_bucket.between(a.amount_bucket - 1, a.amount_bucket + 1),
+            b.invoice_id > a.invoice_id,
+            b.fingerprint != a.fingerprint
+        )
+    ).yield_per(1000)
+
+    pairs = []
+    for left, right in candidates:
+        if left.invoice_date and right.invoice_date:
+            if abs((right.invoice_date - left.invoice_date).total_seconds()) > window_seconds:
+                continue
+        if _amounts_close(left.amount_cents, right.amount_cents) and is_similar_number(left, right):
+            pairs.append({
+                "match_type": "near",
+                "vendor_id": left.vendor_id,
+                "invoice_ids": [left.invoice_id, right.invoice_id],
+                "invoice_number_keys": [left.number_key, right.number_key],
+                "total_amounts": [left.amount_cents / 100, right.amount_cents / 100]
+            })
+            if len(pairs) >= limit:
+                break
+    return pairs
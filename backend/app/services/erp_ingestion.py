@@ -0,0 +1,655 @@
+"""
+ERP ingestion from file drops
+
+Each source system has an inbox directory, ERP_INBOX_DIR/<system slug>,
+standing in for its export feed. CSV, JSON, NDJSON and XLSX files dropped
+there are loaded into the feeds the system owns. A CSV or JSON file is
+matched to a feed by its file name, and each workbook sheet by its sheet
+name, so procurement_master_data.xlsx can be dropped as-is and every system
+takes the sheets it owns. Headers match model column names or the
+workbook's display headers ("Invoice ID", "Invoiced Amount (INR)").
+
+Rows are validated and their references (vendor, PO, requisition, contract)
+resolved with one IN query per batch. They are then upserted on the feed's
+natural key, BATCH_SIZE rows at a time. Each batch commits together with
+the file's checkpoint (``rows_read``), so a restarted sync resumes after the
+last committed batch. The checkpoint advances by compare-and-set, and a
+Running file whose heartbeat is older than LEASE is reclaimed by the next
+sync. Updated documents bump their transactions and flag supplier
+scorecards stale, just like ORM edits.
+
+Cron can sync every inbox with:
+    python -m app.services.erp_ingestion [--retry-failed] [system ...]
+"""
+import csv
+import json
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from dateutil import parser as date_parser
+from openpyxl import load_workbook
+from sqlalchemy import Boolean, DateTime, Float, Integer, case, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.database import (
+    Contract, IngestionFile, Invoice, PurchaseOrder, PurchaseRequisition, SessionLocal, SourcingRequest, Vendor
+)
+from app.services.cache import invalidate_stats
+from app.services.change_tracking import DOCUMENT_LINKS, touch_transactions
+from app.services.duplicate_detection import reindex_invoices
+from app.services.supplier_scorecards import mark_scorecards_stale
+
+INBOX_DIR = os.getenv("ERP_INBOX_DIR", "./erp_inbox")
+BATCH_SIZE = 5000
+LOOKUP_CHUNK_SIZE = 500  # Keeps IN lists under SQLite's bound-parameter limit
+LEASE = timedelta(minutes=2)
+SETTLE_SECONDS = 2  # Files modified more recently may still be being written
+MAX_ERRORS = 50
+EXTENSIONS = (".csv", ".json", ".ndjson", ".jsonl", ".xlsx")
+
+TRUE_VALUES = {"true", "yes", "y", "1", "active"}
+FALSE_VALUES = {"false", "no", "n", "0", "inactive", "blocked", "suspended"}
+
+
+class Feed(NamedTuple):
+    """One entity a source system delivers"""
+    name: str
+    model: type
+    key: str  # Natural key column the upsert matches on
+    aliases: Dict[str, str]  # Display header -> column, on top of the model's own column names
+    references: Dict[str, Tuple[str, object]]  # Header -> (foreign key column, looked-up column)
+    required: Tuple[str, ...] = ()  # Columns a new row must have
+
+
+class SourceSystem(NamedTuple):
+    name: str
+    type: str
+    data_points: List[str]
+    feeds: Tuple[str, ...]  # In load order
+
+
+VENDOR_REFERENCES = {
+    "Vendor Code": ("vendor_id", Vendor.vendor_code),
+    "Vendor": ("vendor_id", Vendor.vendor_name),
+    "Vendor Name": ("vendor_id", Vendor.vendor_name),
+}
+
+FEEDS = {feed.name: feed for feed in (
+    Feed("vendors", Vendor, "vendor_code", {
+        "Location": "city",
+        "GST Number": "gstin",
+        "Category": "categories",
+        "Status": "is_active",
+        "Onboarded Date": "vendor_activated_date",
+    }, {}, ("vendor_name",)),
+    Feed("sourcing_requests", SourcingRequest, "ariba_id", {
+        "Request ID": "ariba_id",
+        "Requirement": "requirement_description",
+        "Requestor": "requestor_name",
+        "Estimated Value (INR)": "estimated_value",
+        "Submitted Date": "request_submitted_date",
+        "Approved Date": "request_approved_date",
+    }, {
+        "Awarded Vendor Code": ("awarded_vendor_id", Vendor.vendor_code),
+        "Awarded Vendor": ("awarded_vendor_id", Vendor.vendor_name),
+    }),
+    Feed("contracts", Contract, "contract_id", {
+        "Contract Start": "start_date",
+        "Contract End": "end_date",
+        "Total Contract Value": "contract_value",
+        "Contract Value (INR)": "contract_value",
+    }, {
+        **VENDOR_REFERENCES,
+        "Ariba ID": ("sourcing_request_id", SourcingRequest.ariba_id),
+    }, ("vendor_id",)),
+    Feed("purchase_requisitions", PurchaseRequisition, "pr_number", {
+        "PR Number": "pr_number",
+        "Requestor": "requestor_name",
+        "Total Amount (INR)": "total_amount",
+        "Created Date": "pr_created_date",
+        "Approved Date": "pr_approved_date",
+    }, {}),
+    Feed("purchase_orders", PurchaseOrder, "po_number", {
+        "PO Number": "po_number",
+        "Total Amount (INR)": "total_amount",
+        "Created Date": "po_created_date",
+        "Sent Date": "po_sent_to_vendor_date",
+    }, {
+        **VENDOR_REFERENCES,
+        "PR Number": ("pr_id", PurchaseRequisition.pr_number),
+        "Contract Ref": ("contract_id", Contract.contract_id),
+    }, ("vendor_id",)),
+    Feed("invoices", Invoice, "invoice_number", {
+        "Invoice ID": "invoice_number",
+        "Invoiced Amount (INR)": "invoice_amount",
+        "Billed Amount (INR)": "invoice_amount",
+        "Tax Amount (INR)": "tax_amount",
+        "Total Amount (INR)": "total_amount",
+    }, {
+        **VENDOR_REFERENCES,
+        "PO Number": ("po_id", PurchaseOrder.po_number),
+    }, ("vendor_id",)),
+)}
+
+# Inbox slug -> system, in the order syncs run so referenced rows load first
+SYSTEMS = {
+    "vendor_portal": SourceSystem("Vendor Portal", "Vendor Onboarding",
+                                  ["Vendor master", "Compliance docs"], ("vendors",)),
+    "sap_ariba": SourceSystem("SAP Ariba", "Sourcing & Intake",
+                              ["Sourcing events", "Bids", "Awards"], ("sourcing_requests",)),
+    "simplicontract": SourceSystem("Simplicontract", "Contract Management",
+                                   ["Contracts", "Rate cards", "Obligations"], ("contracts",)),
+    "oracle_fusion": SourceSystem("Oracle Fusion", "Procure-to-Pay",
+                                  ["PRs", "POs", "Receipts"], ("purchase_requisitions", "purchase_orders")),
+    "oracle_ebs": SourceSystem("Oracle EBS", "Invoicing & Payment",
+                               ["Invoices", "Payments", "Transactions"], ("invoices",)),
+}
+DISPLAY_ORDER = ("sap_ariba", "simplicontract", "vendor_portal", "oracle_fusion", "oracle_ebs")
+
+
+def inbox_path(system: str) -> str:
+    return os.path.join(INBOX_DIR, system)
+
+
+def _normalize(header) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(header).lower()) if header is not None else ""
+
+
+# Parsing
+
+def _to_bool(value) -> bool:
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    text = str(value).lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def _to_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return date_parser.parse(str(value))
+
+
+def _json_list(value) -> str:
+    if isinstance(value, list):
+        return json.dumps(value)
+    text = str(value)
+    if text.startswith("["):
+        return json.dumps(json.loads(text))
+    return json.dumps([part.strip() for part in text.split(",") if part.strip()])
+
+
+def _coerce(column, value):
+    """``value`` as the Python type of ``column``; blanks become None"""
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == "":
+        return None
+    if column.name == "categories":
+        return _json_list(value)
+    if isinstance(column.type, Boolean):
+        return _to_bool(value)
+    if isinstance(column.type, Integer):
+        return int(float(value)) if isinstance(value, str) else int(value)
+    if isinstance(column.type, Float):
+        return float(value.replace(",", "")) if isinstance(value, str) else float(value)
+    if isinstance(column.type, DateTime):
+        return _to_datetime(value)
+    return str(value)
+
+
+class HeaderMapping(NamedTuple):
+    columns: Dict[str, object]  # Header -> model column
+    references: Dict[str, Tuple[str, object]]  # Header -> (foreign key column, looked-up column)
+
+
+def _header_mapping(feed: Feed, headers: Iterable[str]) -> HeaderMapping:
+    table = feed.model.__table__
+    by_name = {
+        _normalize(column.name): column for column in table.columns
+        if column.name not in ("id", "created_at") and not column.foreign_keys
+    }
+    by_name.update({_normalize(alias): table.columns[name] for alias, name in feed.aliases.items()})
+    references = {_normalize(header): target for header, target in feed.references.items()}
+
+    mapping = HeaderMapping({}, {})
+    for header in headers:
+        key = _normalize(header)
+        if key in by_name:
+            mapping.columns[header] = by_name[key]
+        elif key in references:
+            mapping.references[header] = references[key]
+    return mapping
+
+
+def _feed_for(system: str, table_name: str, headers: List[str]) -> Optional[Tuple[Feed, HeaderMapping]]:
+    """The system feed a file or sheet holds: its name mentions the feed and it has the key column"""
+    name = _normalize(table_name)
+    for feed_name in SYSTEMS[system].feeds:
+        feed = FEEDS[feed_name]
+        if _normalize(feed_name) not in name:
+            continue
+        mapping = _header_mapping(feed, headers)
+        if any(column.name == feed.key for column in mapping.columns.values()):
+            return feed, mapping
+    return None
+
+
+def _feed_rank(system: str, table_name: str) -> int:
+    name = _normalize(table_name)
+    feeds = SYSTEMS[system].feeds
+    return next((rank for rank, feed in enumerate(feeds) if _normalize(feed) in name), len(feeds))
+
+
+def _read_tables(path: str, rank=None) -> Iterator[Tuple[str, List[str], Iterator[dict]]]:
+    """(table name, headers, row dicts) per CSV/JSON file or workbook sheet, streamed"""
+    stem, extension = os.path.splitext(os.path.basename(path))
+    extension = extension.lower()
+
+    if extension == ".xlsx":
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheets = sorted(workbook.worksheets, key=lambda s: rank(s.title)) if rank else workbook.worksheets
+            for sheet in sheets:
+                rows = sheet.iter_rows(values_only=True)
+                headers = [str(h) if h is not None else "" for h in next(rows, None) or ()]
+                if headers:
+                    yield sheet.title, headers, (
+                        dict(zip(headers, row)) for row in rows if any(v is not None for v in row)
+                    )
+        finally:
+            workbook.close()
+    elif extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as handle:
+            reader = csv.DictReader(handle)
+            yield stem, list(reader.fieldnames or []), reader
+    elif extension == ".json":
+        with open(path, encoding="utf-8") as handle:
+            records = json.load(handle)
+        if not isinstance(records, list):
+            raise ValueError("JSON drops must hold a list of row objects")
+        yield stem, list(dict.fromkeys(key for record in records for key in record)), iter(records)
+    else:
+        with open(path, encoding="utf-8") as handle:
+            records = (json.loads(line) for line in handle if line.strip())
+            first = next(records, None)
+            if first is not None:
+                yield stem, list(first), chain([first], records)
+
+
+# Upserts
+
+class BatchResult(NamedTuple):
+    inserted: int
+    updated: int
+    errors: List[dict]
+
+
+def _lookup_ids(db: Session, column, values: Set[str]) -> Dict[str, int]:
+    model = column.class_
+    ids: Dict[str, int] = {}
+    values = sorted(values)
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        ids.update(db.query(column, func.min(model.id)).filter(
+            column.in_(values[start:start + LOOKUP_CHUNK_SIZE])
+        ).group_by(column))
+    return ids
+
+
+def _parse_rows(db: Session, feed: Feed, mapping: HeaderMapping, batch: List[Tuple[int, dict]]):
+    """Validated column values keyed by natural key, later rows merged over earlier ones"""
+    errors, parsed = [], []
+    for position, raw in batch:
+        values = {}
+        try:
+            for header, column in mapping.columns.items():
+                values[column.name] = _coerce(column, raw.get(header))
+        except (TypeError, ValueError) as exc:
+            errors.append({"row": position, "error": f"{header}: {exc}"})
+            continue
+        if not values.get(feed.key):
+            errors.append({"row": position, "error": f"Missing {feed.key}"})
+            continue
+        references = {
+            header: str(raw[header]).strip() for header in mapping.references
+            if raw.get(header) is not None and str(raw[header]).strip()
+        }
+        parsed.append((position, values, references))
+
+    lookups = {
+        header: _lookup_ids(db, column, {refs[header] for _, _, refs in parsed if header in refs})
+        for header, (_, column) in mapping.references.items()
+    }
+
+    rows: Dict[str, Tuple[int, dict]] = {}
+    for position, values, references in parsed:
+        unresolved = None
+        for fk in dict.fromkeys(fk for fk, _ in mapping.references.values()):
+            headers = [h for h, (target, _) in mapping.references.items() if target == fk and h in references]
+            resolved = [lookups[h][references[h]] for h in headers if references[h] in lookups[h]]
+            if resolved:
+                values[fk] = resolved[0]
+            elif headers:
+                unresolved = f"Unknown {headers[0]} {references[headers[0]]!r}"
+                break
+        if unresolved:
+            errors.append({"row": position, "error": unresolved})
+            continue
+        key = values[feed.key]
+        rows[key] = (position, {**rows[key][1], **values} if key in rows else values)
+    return rows, errors
+
+
+def _upsert_batch(db: Session, feed: Feed, mapping: HeaderMapping, batch: List[Tuple[int, dict]]) -> BatchResult:
+    """Insert or update one batch in the caller's transaction"""
+    model = feed.model
+    rows, errors = _parse_rows(db, feed, mapping, batch)
+    key_column = getattr(model, feed.key)
+    has_vendor = hasattr(model, "vendor_id")
+
+    existing: Dict[str, Tuple[int, Optional[int]]] = {}
+    keys = sorted(rows)
+    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        query = db.query(key_column, model.id, model.vendor_id if has_vendor else model.id).filter(
+            key_column.in_(keys[start:start + LOOKUP_CHUNK_SIZE])
+        )
+        existing.update((key, (row_id, vendor_id)) for key, row_id, vendor_id in query)
+
+    inserts, updates, stale_vendors = [], [], set()
+    fks = set(fk for fk, _ in mapping.references.values())
+    for key, (position, values) in rows.items():
+        if key in existing:
+            row_id, old_vendor = existing[key]
+            updates.append({"id": row_id, **values})
+            stale_vendors.update((row_id if model is Vendor else old_vendor, values.get("vendor_id")))
+            continue
+        if model is Invoice and values.get("total_amount") is None and values.get("invoice_amount") is not None:
+            values["total_amount"] = values["invoice_amount"] + (values.get("tax_amount") or 0)
+        missing = [column for column in feed.required if values.get(column) is None]
+        if missing:
+            errors.append({"row": position, "error": f"Missing {', '.join(missing)}"})
+            continue
+        inserts.append({**{fk: None for fk in fks}, **values})
+
+    if inserts:
+        db.execute(insert(model), inserts)
+    if updates:
+        db.execute(update(model), updates)
+        updated_ids = [row["id"] for row in updates]
+        if model in DOCUMENT_LINKS:
+            touch_transactions(db.connection(), {DOCUMENT_LINKS[model]: updated_ids})
+        if model is Invoice:
+            reindex_invoices(db, updated_ids)
+        if model is Vendor or has_vendor:
+            mark_scorecards_stale(db, stale_vendors)
+
+    errors.sort(key=lambda e: e["row"])
+    return BatchResult(len(inserts), len(updates), errors)
+
+
+# Files
+
+def _checkpoint(db: Session, record: IngestionFile, committed: int, position: int, result: BatchResult,
+                errors: List[dict], seconds: float) -> bool:
+    """Advance the file's checkpoint in the batch's transaction; False when another worker took it over"""
+    errors.extend(result.errors[:MAX_ERRORS - len(errors)])
+    claimed = db.query(IngestionFile).filter(
+        IngestionFile.id == record.id,
+        IngestionFile.rows_read == committed
+    ).update({
+        IngestionFile.rows_read: position,
+        IngestionFile.rows_inserted: IngestionFile.rows_inserted + result.inserted,
+        IngestionFile.rows_updated: IngestionFile.rows_updated + result.updated,
+        IngestionFile.rows_rejected: IngestionFile.rows_rejected + len(result.errors),
+        IngestionFile.errors: json.dumps(errors),
+        IngestionFile.processing_seconds: IngestionFile.processing_seconds + seconds,
+        IngestionFile.heartbeat_at: datetime.utcnow()
+    }, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        return False
+    db.commit()
+    return True
+
+
+def _finish(db: Session, record: IngestionFile, status: str, errors: List[dict]) -> IngestionFile:
+    db.query(IngestionFile).filter(IngestionFile.id == record.id).update({
+        IngestionFile.status: status,
+        IngestionFile.errors: json.dumps(errors),
+        IngestionFile.completed_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.commit()
+    db.refresh(record)
+    return record
+
+
+def ingest_file(db: Session, record: IngestionFile) -> IngestionFile:
+    """Load a claimed file from its checkpoint onwards, committing after every batch"""
+    system = record.source_system
+    path = os.path.join(inbox_path(system), record.file_name)
+    errors = json.loads(record.errors) if record.errors else []
+    committed = record.rows_read or 0
+    position, matched = 0, []
+
+    def flush(feed, mapping, batch, started) -> bool:
+        nonlocal committed
+        result = _upsert_batch(db, feed, mapping, batch)
+        if not _checkpoint(db, record, committed, position, result, errors, time.monotonic() - started):
+            return False
+        committed = position
+        return True
+
+    try:
+        for table_name, headers, rows in _read_tables(path, rank=lambda name: _feed_rank(system, name)):
+            match = _feed_for(system, table_name, headers)
+            if match is None:
+                continue
+            feed, mapping = match
+            matched.append(table_name)
+            batch, started = [], time.monotonic()
+            for raw in rows:
+                position += 1
+                if position <= committed:
+                    continue
+                batch.append((position, raw))
+                if len(batch) >= BATCH_SIZE:
+                    if not flush(feed, mapping, batch, started):
+                        return record
+                    batch, started = [], time.monotonic()
+            if batch and not flush(feed, mapping, batch, started):
+                return record
+    except Exception as exc:
+        db.rollback()
+        errors.append({"row": None, "error": f"{type(exc).__name__}: {exc}"})
+        return _finish(db, record, "Failed", errors)
+
+    if not matched:
+        errors.append({"row": None, "error": f"No {', '.join(SYSTEMS[system].feeds)} data found"})
+        return _finish(db, record, "Skipped", errors)
+    return _finish(db, record, "Completed", errors)
+
+
+def discover_files(db: Session, system: str, retry_failed: bool = False) -> None:
+    """Register new or changed drops in the system's inbox as Pending"""
+    directory = inbox_path(system)
+    if not os.path.isdir(directory):
+        return
+    known = {row[0] for row in db.query(IngestionFile.fingerprint).filter(IngestionFile.source_system == system)}
+    now = time.time()
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if (not entry.is_file() or entry.name.startswith((".", "~$"))
+                or not entry.name.lower().endswith(EXTENSIONS)):
+            continue
+        stat = entry.stat()
+        fingerprint = f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns}"
+        if fingerprint in known or now - stat.st_mtime < SETTLE_SECONDS:
+            continue
+        db.add(IngestionFile(source_system=system, file_name=entry.name, fingerprint=fingerprint,
+                             status="Pending", rows_read=0, rows_inserted=0, rows_updated=0,
+                             rows_rejected=0, processing_seconds=0))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # Registered by a concurrent sync
+
+    if retry_failed:
+        db.query(IngestionFile).filter(
+            IngestionFile.source_system == system,
+            IngestionFile.status == "Failed"
+        ).update({IngestionFile.status: "Pending"}, synchronize_session=False)
+        db.commit()
+
+
+def _claim(db: Session, record: IngestionFile) -> bool:
+    now = datetime.utcnow()
+    claimed = db.query(IngestionFile).filter(
+        IngestionFile.id == record.id,
+        (IngestionFile.status == "Pending") |
+        ((IngestionFile.status == "Running") & (IngestionFile.heartbeat_at < now - LEASE))
+    ).update({
+        IngestionFile.status: "Running",
+        IngestionFile.heartbeat_at: now,
+        IngestionFile.started_at: func.coalesce(IngestionFile.started_at, now)
+    }, synchronize_session=False)
+    db.commit()
+    return bool(claimed)
+
+
+def sync_inbox(db: Session, system: str, retry_failed: bool = False) -> List[IngestionFile]:
+    """Ingest every pending drop of one system; returns the files this call processed"""
+    discover_files(db, system, retry_failed)
+    pending = db.query(IngestionFile).filter(
+        IngestionFile.source_system == system,
+        IngestionFile.status.in_(("Pending", "Running"))
+    ).order_by(IngestionFile.id).all()
+    pending.sort(key=lambda record: _feed_rank(system, record.file_name))
+
+    processed = []
+    for record in pending:
+        if _claim(db, record):
+            db.refresh(record)
+            processed.append(ingest_file(db, record))
+    if processed:
+        invalidate_stats()
+    return processed
+
+
+def sync_all(db: Session, systems: Optional[Iterable[str]] = None,
+             retry_failed: bool = False) -> Dict[str, List[IngestionFile]]:
+    wanted = set(systems or SYSTEMS)
+    return {system: sync_inbox(db, system, retry_failed) for system in SYSTEMS if system in wanted}
+
+
+def run_sync(systems: Optional[List[str]] = None, retry_failed: bool = False) -> None:
+    """Background job body; opens its own session"""
+    db = SessionLocal()
+    try:
+        sync_all(db, systems, retry_failed)
+    finally:
+        db.close()
+
+
+# Status
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def integration_status(db: Session) -> List[dict]:
+    """Per-system sync status, last sync time, row counts and throughput"""
+    totals = {row.source_system: row for row in db.query(
+        IngestionFile.source_system,
+        _count_if(IngestionFile.status == "Completed").label("completed"),
+        _count_if(IngestionFile.status == "Pending").label("pending"),
+        _count_if(IngestionFile.status == "Running").label("running"),
+        _count_if(IngestionFile.status == "Failed").label("failed"),
+        _count_if(IngestionFile.status == "Skipped").label("skipped"),
+        func.sum(IngestionFile.rows_read).label("rows_read"),
+        func.sum(IngestionFile.rows_inserted).label("inserted"),
+        func.sum(IngestionFile.rows_updated).label("updated"),
+        func.sum(IngestionFile.rows_rejected).label("rejected"),
+        func.sum(IngestionFile.processing_seconds).label("seconds"),
+        func.max(case((IngestionFile.status == "Completed", IngestionFile.completed_at))).label("last_sync"),
+        func.max(IngestionFile.id).label("latest_id"),
+    ).group_by(IngestionFile.source_system)}
+
+    latest_ids = [row.latest_id for row in totals.values()]
+    latest = {record.source_system: record for record in
+              db.query(IngestionFile).filter(IngestionFile.id.in_(latest_ids))} if latest_ids else {}
+
+    integrations = []
+    for slug in DISPLAY_ORDER:
+        system, row, last_file = SYSTEMS[slug], totals.get(slug), latest.get(slug)
+        if not os.path.isdir(inbox_path(slug)):
+            status = "Not Configured"
+        elif row is not None and row.running:
+            status = "Syncing"
+        elif last_file is not None and last_file.status == "Failed":
+            status = "Error"
+        else:
+            status = "Connected"
+        last_errors = json.loads(last_file.errors) if last_file is not None and last_file.errors else []
+
+        integrations.append({
+            "system": system.name,
+            "type": system.type,
+            "status": status,
+            "last_sync": row.last_sync.isoformat() + "Z" if row is not None and row.last_sync else None,
+            "data_points": system.data_points,
+            "inbox": inbox_path(slug),
+            "feeds": list(system.feeds),
+            "files": {
+                "completed": row.completed if row else 0,
+                "pending": row.pending if row else 0,
+                "running": row.running if row else 0,
+                "failed": row.failed if row else 0,
+                "skipped": row.skipped if row else 0,
+            },
+            "rows": {
+                "inserted": row.inserted or 0 if row else 0,
+                "updated": row.updated or 0 if row else 0,
+                "rejected": row.rejected or 0 if row else 0,
+            },
+            "throughput_rows_per_sec": round(row.rows_read / row.seconds, 1) if row and row.seconds else None,
+            "last_file": {
+                "file_name": last_file.file_name,
+                "status": last_file.status,
+                "rows_read": last_file.rows_read,
+                "last_error": last_errors[-1]["error"] if last_errors else None,
+            } if last_file is not None else None,
+        })
+    return integrations
+
+
+if __name__ == "__main__":
+    import sys
+
+    from app.models.database import init_db
+
+    args = sys.argv[1:]
+    retry = "--retry-failed" in args
+    names = [arg for arg in args if arg != "--retry-failed"]
+    unknown = [name for name in names if name not in SYSTEMS]
+    if unknown:
+        sys.exit(f"Unknown systems: {', '.join(unknown)}; expected {', '.join(SYSTEMS)}")
+
+    init_db()
+    with SessionLocal() as session:
+        for slug, files in sync_all(session, names or None, retry).items():
+            for record in files:
+                print(f"{slug}/{record.file_name}: {record.status}, {record.rows_inserted} inserted, "
+                      f"{record.rows_updated} updated, {record.rows_rejected} rejected")
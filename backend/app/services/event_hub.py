@@ -0,0 +1,192 @@
+"""
+In-process pub/sub hub for server-sent events
+
+Handlers publish events to a topic (the agent uses the session id) and any
+number of SSE listeners receive them. Nothing is polled: a listener waits on
+its own asyncio queue, and ``publish`` fans an event out to every queue of the
+topic with one callback on the event loop. Sync handlers run in the threadpool
+and may publish from there.
+
+Event ids come from one counter, so they only go up. Each topic keeps its last
+EVENT_HISTORY events, and a client that reconnects with ``Last-Event-ID`` gets
+the ones it missed. A listener whose queue fills (EVENT_QUEUE_SIZE) is cut off
+instead of holding up the rest. Its browser reconnects and catches up from the
+history. Topics without listeners are dropped past EVENT_HUB_TOPICS, oldest
+first.
+
+Each uvicorn worker has its own hub, so listeners see events published by
+their own worker. That is the same sticky-session requirement as the
+conversation cache.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Callable, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from fastapi.responses import StreamingResponse
+
+RETRY_MS = 3000  # Reconnect delay suggested to EventSource clients
+
+
+class Event(NamedTuple):
+    id: int
+    name: str
+    data: dict
+
+
+class _Topic:
+    __slots__ = ("history", "queues")
+
+    def __init__(self, history: int):
+        self.history: "deque[Event]" = deque(maxlen=history)
+        self.queues: Set[asyncio.Queue] = set()
+
+
+class Subscription:
+    """A listener's view of one topic; iterate it for events, None marks a heartbeat"""
+
+    def __init__(self, hub: "EventHub", topic: str, entry: _Topic, backlog: List[Event]):
+        self.hub = hub
+        self.topic = topic
+        self.backlog = backlog  # Missed events, oldest first
+        self.queue: asyncio.Queue = asyncio.Queue(hub.queue_size)
+        self._entry = entry
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Optional[Event]:
+        try:
+            event = await asyncio.wait_for(self.queue.get(), self.hub.heartbeat_seconds)
+        except asyncio.TimeoutError:
+            return None
+        if event is None:  # Cut off by an overflow
+            raise StopAsyncIteration
+        return event
+
+    def close(self) -> None:
+        with self.hub._lock:
+            self._entry.queues.discard(self.queue)
+
+
+class EventHub:
+    def __init__(self, capacity: int, history: int, queue_size: int, heartbeat_seconds: float):
+        self.capacity = capacity
+        self.history = history
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self._topics: "OrderedDict[str, _Topic]" = OrderedDict()
+        self._last_id = 0
+        self._lock = threading.Lock()  # Guards _topics, _last_id and every topic's queues
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _topic(self, topic: str) -> _Topic:
+        """Topic entry, created if needed; needs _lock"""
+        entry = self._topics.get(topic)
+        if entry is None:
+            entry = self._topics[topic] = _Topic(self.history)
+            if len(self._topics) > self.capacity:
+                for name in [name for name, other in self._topics.items() if not other.queues]:
+                    del self._topics[name]
+                    if len(self._topics) <= self.capacity:
+                        break
+        else:
+            self._topics.move_to_end(topic)
+        return entry
+
+    def publish(self, topic: str, name: str, data: dict) -> None:
+        """Send ``name``/``data`` to the topic's listeners; safe to call from any thread"""
+        with self._lock:
+            entry = self._topic(topic)
+            self._last_id += 1
+            event = Event(self._last_id, name, data)
+            entry.history.append(event)
+            queues = list(entry.queues)
+        if not queues:
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(entry, queues, event)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, entry, queues, event)
+
+    def _deliver(self, entry: _Topic, queues: Iterable[asyncio.Queue], event: Event) -> None:
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                with self._lock:
+                    entry.queues.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def subscribe(self, topic: str, last_event_id: Optional[int] = None) -> Subscription:
+        """Start listening to ``topic``; call from the event loop and ``close`` when done
+
+        With ``last_event_id`` the subscription's backlog holds the newer events
+        still in the topic's history.
+        """
+        self._loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._topic(topic)
+            backlog = [e for e in entry.history if e.id > last_event_id] if last_event_id is not None else []
+            subscription = Subscription(self, topic, entry, backlog)
+            entry.queues.add(subscription.queue)
+        return subscription
+
+    async def stream(self, topic: str, last_event_id: Optional[int] = None,
+                     snapshot: Optional[Callable[[], Tuple[str, dict]]] = None) -> AsyncIterator[str]:
+        """SSE body: missed events, then ``snapshot()`` sent without an id, then live events
+
+        The snapshot is taken after subscribing, so no change falls between it
+        and the live events.
+        """
+        subscription = self.subscribe(topic, last_event_id)
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            for event in subscription.backlog:
+                yield format_event(event.name, event.data, event.id)
+            if snapshot is not None:
+                yield format_event(*snapshot())
+            async for event in subscription:
+                if event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield format_event(event.name, event.data, event.id)
+        finally:
+            subscription.close()
+
+    def listeners(self, topic: str) -> int:
+        with self._lock:
+            entry = self._topics.get(topic)
+            return len(entry.queues) if entry else 0
+
+
+# SSE encoding
+
+def format_event(name: str, data: dict, event_id: Optional[int] = None) -> str:
+    """One SSE message; events without an id leave the client's Last-Event-ID alone"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def sse_response(body) -> StreamingResponse:
+    return StreamingResponse(body, media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Stop nginx from buffering the stream
+    })
+
+
+event_hub = EventHub(
+    capacity=int(os.getenv("EVENT_HUB_TOPICS", "10000")),
+    history=int(os.getenv("EVENT_HISTORY", "50")),
+    queue_size=int(os.getenv("EVENT_QUEUE_SIZE", "256")),
+    heartbeat_seconds=float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15")),
+)
@@ -0,0 +1,182 @@
+"""
+Streaming table exports
+
+Export endpoints stream a table as CSV, NDJSON or Parquet without holding it
+in memory. Rows come from a server-side cursor (``yield_per``) on a
+connection owned by the response body. Each chunk is encoded, and
+gzip-compressed when requested, before it is sent, so memory stays bounded
+by EXPORT_CHUNK_SIZE rows whatever the table size. Column projection and
+filters are part of the SELECT, so the database reads only what is exported.
+
+Parquet needs the optional ``pyarrow`` package. Each chunk becomes one row
+group, and compression uses Parquet's own codec instead of an outer gzip.
+"""
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, select
+
+from app.models.database import engine
+
+EXPORT_CHUNK_SIZE = 5000
+FORMAT_PATTERN = "^(csv|ndjson|parquet)$"
+COMPRESSION_PATTERN = "^(none|gzip)$"
+
+# format -> (media type, file extension)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_columns(model, names: Optional[str]) -> List:
+    """Table columns named in the comma-separated ``names``, or every column when empty"""
+    table = model.__table__
+    selected = [name.strip() for name in (names or "").split(",") if name.strip()]
+    if not selected:
+        return list(table.columns)
+    unknown = [name for name in selected if name not in table.columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+    return [table.columns[name] for name in dict.fromkeys(selected)]
+
+
+def _chunks(query) -> Iterator[list]:
+    """Result rows in EXPORT_CHUNK_SIZE lists from a server-side cursor"""
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=EXPORT_CHUNK_SIZE).execute(query)
+        for partition in result.partitions():
+            yield partition
+
+
+def _iso_rows(columns: List, chunks: Iterable[list]) -> Iterator[list]:
+    """Chunks with date and datetime values rendered as ISO 8601 strings"""
+    temporal = [i for i, column in enumerate(columns) if isinstance(column.type, (Date, DateTime))]
+    for rows in chunks:
+        if not temporal:
+            yield rows
+            continue
+        converted = []
+        for row in rows:
+            row = list(row)
+            for i in temporal:
+                if row[i] is not None:
+                    row[i] = row[i].isoformat()
+            converted.append(row)
+        yield converted
+
+
+def _csv(columns: List, chunks: Iterable[list]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in columns])
+    yield buffer.getvalue().encode()
+    for rows in _iso_rows(columns, chunks):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+
+def _ndjson(columns: List, chunks: Iterable[list]) -> Iterator[bytes]:
+    names = [column.name for column in columns]
+    for rows in _iso_rows(columns, chunks):
+        yield "".join(json.dumps(dict(zip(names, row))) + "\n" for row in rows).encode()
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self.parts: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def _arrow_type(pa, sql_type):
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(sql_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def _parquet(columns: List, chunks: Iterable[list], compression: str) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column.name, _arrow_type(pa, column.type)) for column in columns])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression="gzip" if compression == "gzip" else "none")
+    try:
+        for rows in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _gzip(parts: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 writes a gzip header
+    for part in parts:
+        data = compressor.compress(part)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(model, columns: List, filters: List, export_format: str, compression: str,
+                    name: str) -> StreamingResponse:
+    """Stream the ``columns`` of ``model`` rows matching ``filters`` in id order as a file download"""
+    if export_format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires the pyarrow package")
+
+    query = select(*columns).where(*filters).order_by(model.id)
+    media_type, extension = FORMATS[export_format]
+    filename = f"{name}.{extension}"
+    chunks = _chunks(query)
+
+    if export_format == "parquet":
+        body = _parquet(columns, chunks, compression)
+    else:
+        body = (_csv if export_format == "csv" else _ndjson)(columns, chunks)
+        if compression == "gzip":
+            body = _gzip(body)
+            media_type, filename = "application/gzip", filename + ".gz"
+
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"'
+    })
@@ -0,0 +1,265 @@
+"""
+Demand forecasting with per-series exponential smoothing
+
+Every (category, business_unit) pair is a monthly spend series read from the
+spend cube. Each series gets the richest model its history supports: naive,
+simple exponential smoothing, damped Holt trend, or additive Holt-Winters
+(12-month season). Parameters come from a grid search that runs every grid
+point at once as NumPy vectors, minimising one-step-ahead squared error.
+
+Fitted state lives in ForecastModel. The newest month in the data is treated
+as still open. When a month closes, its value is folded into the cached state
+with the stored parameters. The parameter search reruns only after
+REFIT_AFTER_MONTHS new months, or when the series becomes long enough for a
+richer model. Accuracy comes from a holdout backtest: fit without the last
+HOLDOUT_MONTHS closed months, forecast them, and compare to actuals.
+"""
+import json
+from datetime import datetime
+from itertools import product
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.database import ForecastModel, SpendCube
+
+SEASON_LENGTH = 12
+HOLDOUT_MONTHS = 3
+REFIT_AFTER_MONTHS = 6
+DAMPING = 0.98
+Z_95 = 1.96
+
+ALPHA_GRID = np.linspace(0.05, 0.95, 10)
+BETA_GRID = np.array([0.01, 0.05, 0.1, 0.2, 0.3])
+GAMMA_GRID = np.array([0.05, 0.1, 0.2, 0.3, 0.5])
+
+
+def month_index(month: str) -> int:
+    year, mon = month.split("-")
+    return int(year) * 12 + int(mon) - 1
+
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def model_type_for(observations: int) -> str:
+    if observations >= 2 * SEASON_LENGTH:
+        return "holt_winters"
+    if observations >= 4:
+        return "holt"
+    if observations >= 2:
+        return "ses"
+    return "naive"
+
+
+def _grid(model_type: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if model_type == "holt_winters":
+        combos = np.array(list(product(ALPHA_GRID, BETA_GRID, GAMMA_GRID)))
+        return combos[:, 0], combos[:, 1], combos[:, 2]
+    if model_type == "holt":
+        combos = np.array(list(product(ALPHA_GRID, BETA_GRID)))
+        return combos[:, 0], combos[:, 1], np.zeros(len(combos))
+    if model_type == "ses":
+        return ALPHA_GRID, np.zeros(len(ALPHA_GRID)), np.zeros(len(ALPHA_GRID))
+    return np.ones(1), np.zeros(1), np.zeros(1)
+
+
+def _initial_state(y: np.ndarray, model_type: str, size: int):
+    """Level, trend and seasonal starting values broadcast to ``size`` grid points"""
+    if model_type == "holt_winters":
+        first, second = y[:SEASON_LENGTH], y[SEASON_LENGTH:2 * SEASON_LENGTH]
+        level = first.mean()
+        trend = (second.mean() - first.mean()) / SEASON_LENGTH
+        seasonals = first - level
+        start = SEASON_LENGTH
+    else:
+        level = y[0]
+        trend = y[1] - y[0] if model_type == "holt" else 0.0
+        seasonals = np.zeros(1)
+        start = 1
+    return (np.full(size, level, dtype=float), np.full(size, trend, dtype=float),
+            np.tile(seasonals, (size, 1)).astype(float), start)
+
+
+def _run(y, alpha, beta, gamma, phi, level, trend, seasonals, start: int):
+    """Run the additive smoothing recursions from observation ``start`` for every grid point
+
+    Returns final (level, trend, seasonals) and the summed squared one-step errors.
+    """
+    m = seasonals.shape[1]
+    rows = np.arange(len(level))
+    sse = np.zeros(len(level))
+    for t in range(start, len(y)):
+        season = seasonals[:, t % m]
+        error = y[t] - (level + phi * trend + season)
+        sse += error ** 2
+        new_level = alpha * (y[t] - season) + (1 - alpha) * (level + phi * trend)
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        seasonals[rows, t % m] = gamma * (y[t] - new_level) + (1 - gamma) * season
+        level = new_level
+    return level, trend, seasonals, sse
+
+
+def _forecast(level, trend, seasonals, phi, observations: int, horizon: int) -> np.ndarray:
+    steps = np.arange(1, horizon + 1)
+    damped = np.cumsum(phi ** steps) * trend
+    season = np.asarray(seasonals)[(observations + steps - 1) % len(seasonals)]
+    return np.maximum(level + damped + season, 0)
+
+
+def fit_series(y: np.ndarray) -> dict:
+    """Grid-search the best model for ``y``; returns its parameters and final state"""
+    model_type = model_type_for(len(y))
+    alpha, beta, gamma = _grid(model_type)
+    phi = DAMPING if model_type in ("holt", "holt_winters") else 1.0
+
+    if model_type == "naive":
+        level = float(y[-1]) if len(y) else 0.0
+        return {"model_type": model_type, "alpha": 1.0, "beta": 0.0, "gamma": 0.0, "phi": 1.0,
+                "level": level, "trend": 0.0, "seasonals": [0.0], "sse": 0.0, "sse_count": 0}
+
+    level, trend, seasonals, start = _initial_state(y, model_type, len(alpha))
+    level, trend, seasonals, sse = _run(y, alpha, beta, gamma, phi, level, trend, seasonals, start)
+    best = int(np.argmin(sse))
+    return {
+        "model_type": model_type,
+        "alpha": float(alpha[best]), "beta": float(beta[best]), "gamma": float(gamma[best]), "phi": phi,
+        "level": float(level[best]), "trend": float(trend[best]),
+        "seasonals": seasonals[best].tolist(),
+        "sse": float(sse[best]), "sse_count": len(y) - start
+    }
+
+
+def backtest_series(y: np.ndarray) -> Optional[Tuple[int, float, float]]:
+    """Fit on all but the last HOLDOUT_MONTHS and score the forecast: (months, abs error, actual)"""
+    if len(y) < HOLDOUT_MONTHS + 2:
+        return None
+    train, actual = y[:-HOLDOUT_MONTHS], y[-HOLDOUT_MONTHS:]
+    fit = fit_series(train)
+    predicted = _forecast(fit["level"], fit["trend"], fit["seasonals"], fit["phi"], len(train), HOLDOUT_MONTHS)
+    return HOLDOUT_MONTHS, float(np.abs(actual - predicted).sum()), float(np.abs(actual).sum())
+
+
+def _apply_fit(model: ForecastModel, fit: dict) -> None:
+    for key, value in fit.items():
+        setattr(model, key, json.dumps(value) if key == "seasonals" else value)
+
+
+def _update_state(model: ForecastModel, new_values: np.ndarray) -> None:
+    """Fold newly closed months into the cached state using the stored parameters"""
+    if model.model_type == "naive":
+        model.level = float(new_values[-1])
+        return
+    seasonals = np.array([json.loads(model.seasonals)], dtype=float)
+    # Prefix with placeholders so _run's absolute index keeps the seasonal phase
+    y = np.r_[np.zeros(model.observations), new_values]
+    level, trend, seasonals, sse = _run(
+        y, np.array([model.alpha]), np.array([model.beta]), np.array([model.gamma]), model.phi,
+        np.array([model.level]), np.array([model.trend]), seasonals, model.observations
+    )
+    model.level, model.trend = float(level[0]), float(trend[0])
+    model.seasonals = json.dumps(seasonals[0].tolist())
+    model.sse = (model.sse or 0) + float(sse[0])
+    model.sse_count = (model.sse_count or 0) + len(new_values)
+
+
+def _load_series(db: Session):
+    """Monthly spend per (category, business_unit) from the cube, excluding undated spend"""
+    rows = db.query(
+        SpendCube.category, SpendCube.business_unit, SpendCube.month, func.sum(SpendCube.total_amount)
+    ).filter(SpendCube.month != "Unknown").group_by(
+        SpendCube.category, SpendCube.business_unit, SpendCube.month
+    ).all()
+    if not rows:
+        return None, None, {}
+
+    first = min(month_index(month) for _, _, month, _ in rows)
+    last = max(month_index(month) for _, _, month, _ in rows)
+    series: Dict[Tuple[str, str], np.ndarray] = {}
+    for category, business_unit, month, amount in rows:
+        values = series.setdefault((category or "Unknown", business_unit or "Unknown"), np.zeros(last - first + 1))
+        values[month_index(month) - first] += amount or 0
+    return first, last, series
+
+
+def forecast_demand(db: Session, horizon: int = 6) -> dict:
+    """Refresh stale series models and forecast every series ``horizon`` months ahead
+
+    The newest month is open, so forecasts start with it and fits stop just before it.
+    """
+    first, last, series = _load_series(db)
+    if not series:
+        return {"first_month": None, "last_closed_month": None, "months": [], "series": {}, "history": {},
+                "backtest": None, "models": {}}
+
+    closed = last - first  # observations in every series' closed history
+    first_month, last_closed = month_label(first), month_label(last - 1)
+    models = {m.series_key: m for m in db.query(ForecastModel).all()}
+    activity = {"cached": 0, "updated": 0, "refit": 0}
+
+    results = {}
+    for (category, business_unit), values in series.items():
+        key = f"{category}|{business_unit}"
+        y = values[:closed]
+        model = models.get(key)
+
+        if (model is None or model.first_month != first_month or model.observations > closed
+                or model.model_type != model_type_for(closed)
+                or closed - (model.optimized_observations or 0) >= REFIT_AFTER_MONTHS):
+            if model is None:
+                model = ForecastModel(series_key=key, category=category, business_unit=business_unit)
+                db.add(model)
+                models[key] = model
+            _apply_fit(model, fit_series(y))
+            backtest = backtest_series(y)
+            model.backtest_months, model.backtest_abs_error, model.backtest_actual = backtest or (0, 0.0, 0.0)
+            model.season_length = SEASON_LENGTH if model.model_type == "holt_winters" else 1
+            model.optimized_observations = closed
+            model.fitted_at = datetime.utcnow()
+            activity["refit"] += 1
+        elif model.observations < closed:
+            _update_state(model, y[model.observations:])
+            model.fitted_at = datetime.utcnow()
+            activity["updated"] += 1
+        else:
+            activity["cached"] += 1
+
+        model.observations = closed
+        model.first_month, model.last_month = first_month, last_closed
+
+        predicted = _forecast(model.level, model.trend, json.loads(model.seasonals), model.phi, closed, horizon)
+        sigma = np.sqrt(model.sse / model.sse_count) if model.sse_count else 0.0
+        results[(category, business_unit)] = {
+            "model_type": model.model_type,
+            "forecast": predicted,
+            "variance": (sigma ** 2) * np.arange(1, horizon + 1),
+        }
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker created the same series first; its fit is equivalent
+        db.rollback()
+
+    evaluated = [m for m in models.values() if m.backtest_months and m.series_key in
+                 {f"{c}|{b}" for c, b in series}]
+    abs_error = sum(m.backtest_abs_error for m in evaluated)
+    actual = sum(m.backtest_actual for m in evaluated)
+
+    return {
+        "first_month": first_month,
+        "last_closed_month": last_closed,
+        "months": [month_label(last + i) for i in range(horizon)],
+        "series": results,
+        "history": series,
+        "backtest": {
+            "holdout_months": HOLDOUT_MONTHS,
+            "series_evaluated": len(evaluated),
+            "wape": round(abs_error / actual, 4) if actual > 0 else None
+        },
+        "models": activity
+    }
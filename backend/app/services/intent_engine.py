@@ -0,0 +1,432 @@
+"""
+Intent and entity extraction for agent chat
+
+Category keywords, the spend taxonomy in CATEGORIES and a gazetteer of
+delivery locations are compiled once into one Aho-Corasick automaton, so
+a message is matched in a single pass over its characters whatever the
+number of terms. Matches must start and end on word boundaries (a trailing
+plural "s"/"es" is allowed), and overlapping matches resolve to the longest
+term, so "security software" is software rather than facilities security.
+
+Quantity, budget and delivery date are read by precompiled patterns.
+Budgets understand k, lakh and crore, and dates may be explicit or relative
+("within 2 weeks").
+
+When no keyword matches, a multinomial Naive Bayes classifier trained on
+past user messages (each labelled with its conversation's keyword-detected
+category) picks the category if it is confident enough. The classifier is trained at
+startup; the automaton when this module is imported.
+
+Benchmark against the stored conversation history with:
+    python -m app.services.intent_engine
+"""
+import json
+import re
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from dateutil import parser as date_parser
+from dateutil.relativedelta import relativedelta
+from sqlalchemy.orm import Session
+
+from app.data.mock_data_generator import CATEGORIES
+from app.models.database import AgentConversation, ConversationMessage
+
+DEFAULT_CATEGORY = "general"
+CATEGORY_ORDER = ("laptops", "office_supplies", "software", "services")  # Tie-break order
+MIN_CONFIDENCE = 0.6
+MIN_TRAINING_MESSAGES = 20
+TRAINING_LIMIT = 50000  # Most recent user messages used for training
+
+# Agent category -> keywords, on top of the taxonomy terms below
+CATEGORY_KEYWORDS = {
+    "laptops": ["laptop", "computer", "desktop", "monitor", "notebook computer"],
+    "office_supplies": ["office", "supply", "supplies", "stationery", "notebook", "pen"],
+    "software": ["software", "saas", "license", "licence", "subscription"],
+    "services": ["service", "consulting", "support", "maintenance"],
+}
+
+# Spend taxonomy category -> agent category; subcategories may override it
+TAXONOMY_CATEGORIES = {
+    "IT Hardware": "laptops",
+    "IT Software & SaaS": "software",
+    "Corporate Services": "services",
+}
+TAXONOMY_SUBCATEGORIES = {
+    "Office Supplies": "office_supplies",
+}
+
+LOCATIONS = {
+    "Bengaluru": ["bangalore", "bengaluru", "blr"],
+    "Mumbai": ["mumbai", "bombay"],
+    "Navi Mumbai": ["navi mumbai"],
+    "Delhi": ["delhi", "new delhi", "ncr"],
+    "Gurugram": ["gurgaon", "gurugram"],
+    "Noida": ["noida"],
+    "Chennai": ["chennai", "madras"],
+    "Hyderabad": ["hyderabad", "secunderabad"],
+    "Kolkata": ["kolkata", "calcutta"],
+    "Pune": ["pune"],
+    "Ahmedabad": ["ahmedabad"],
+    "Jaipur": ["jaipur"],
+    "Lucknow": ["lucknow"],
+    "Kochi": ["kochi", "cochin"],
+    "Coimbatore": ["coimbatore"],
+    "Indore": ["indore"],
+    "Nagpur": ["nagpur"],
+    "Chandigarh": ["chandigarh"],
+    "Bhubaneswar": ["bhubaneswar"],
+    "Guwahati": ["guwahati"],
+    "Patna": ["patna"],
+    "Thane": ["thane"],
+    "Surat": ["surat"],
+    "Vadodara": ["vadodara", "baroda"],
+    "Visakhapatnam": ["visakhapatnam", "vizag"],
+    "Mysuru": ["mysore", "mysuru"],
+    "Karnataka": ["karnataka"],
+    "Maharashtra": ["maharashtra"],
+    "Tamil Nadu": ["tamil nadu"],
+    "Telangana": ["telangana"],
+    "West Bengal": ["west bengal"],
+    "Gujarat": ["gujarat"],
+}
+
+MULTIPLIERS = {
+    "k": 1e3, "thousand": 1e3, "l": 1e5, "lac": 1e5, "lacs": 1e5, "lakh": 1e5, "lakhs": 1e5,
+    "mn": 1e6, "million": 1e6, "cr": 1e7, "crore": 1e7, "crores": 1e7,
+}
+_MULTIPLIER = r"(k|thousand|lakhs?|lacs?|l|mn|million|crores?|cr)\b"
+_AMOUNT = r"(\d[\d,]*(?:\.\d+)?)"
+BUDGET_PATTERNS = (
+    re.compile(r"(?:₹|\brs\.?|\binr|\$|\busd)\s*" + _AMOUNT + r"\s*(?:" + _MULTIPLIER + r")?"),
+    re.compile(r"\b" + _AMOUNT + r"\s*" + _MULTIPLIER + r"(?:\s*(?:rupees|rs|inr))?"),
+    re.compile(r"\b" + _AMOUNT + r"\s*(?:rupees|rs\b|inr\b)"),
+    re.compile(r"\bbudget\s*(?:is|of|:|=|around|about|upto|up to)?\s*" + _AMOUNT + r"\s*(?:" + _MULTIPLIER + r")?"),
+)
+QUANTITY_PATTERNS = (
+    re.compile(r"\b(?:qty|quantity|count)\s*(?:of|:|=|is)?\s*(\d[\d,]*)\b"),
+    re.compile(r"\b(\d[\d,]*)\s+(?:[a-z-]+\s+)?(?:units?|pcs|pieces|nos|items?|boxes|licen[cs]es|seats|users|"
+               r"employees|people|persons|laptops?|desktops?|monitors?|computers?|notebooks?|pens?)\b"),
+)
+NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*"
+DATE_PATTERNS = (
+    re.compile(r"\b\d{4}-\d{1,2}-\d{1,2}\b"),
+    re.compile(r"\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b"),
+    re.compile(r"\b\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?" + _MONTH + r"(?:,?\s+\d{4})?\b"),
+    re.compile(r"\b" + _MONTH + r"\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s+\d{4})?\b"),
+)
+RELATIVE_DATE = re.compile(r"\b(?:in|within|next)\s+(\d+|a|an|one|two|three|four|six)?\s*(day|week|month)s?\b")
+WORD_NUMBERS = {None: 1, "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "six": 6}
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class Term(NamedTuple):
+    kind: str  # category or location
+    value: str  # Agent category or canonical location
+    detail: Optional[str] = None  # Taxonomy category for taxonomy terms
+
+
+class Intent(NamedTuple):
+    category: str
+    source: str  # keywords, classifier or default
+    confidence: float
+    entities: dict
+
+
+# Keyword automaton
+
+class Automaton:
+    """Aho-Corasick matcher over lowercase terms"""
+
+    def __init__(self, terms: Iterable[Tuple[str, Term]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, Term]]] = [[]]  # (term length, term) ending at each state
+        for text, term in terms:
+            state = 0
+            for char in text:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append((len(text), term))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text: str) -> List[Tuple[int, int, Term]]:
+        """Longest non-overlapping whole-word matches as (start, end, term), in text order"""
+        goto, fail, output = self.goto, self.fail, self.output
+        found = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, term in output[state]:
+                start = end - length
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                stop = end
+                if text[stop:stop + 2] == "es" and not text[stop + 2:stop + 3].isalnum():
+                    stop += 2
+                elif text[stop:stop + 1] == "s" and not text[stop + 1:stop + 2].isalnum():
+                    stop += 1
+                if stop < len(text) and text[stop].isalnum():
+                    continue
+                found.append((start, stop, term))
+
+        found.sort(key=lambda match: (match[0], match[0] - match[1]))
+        matches, covered = [], 0
+        for start, stop, term in found:
+            if start >= covered:
+                matches.append((start, stop, term))
+                covered = stop
+        return matches
+
+
+def _terms() -> Iterable[Tuple[str, Term]]:
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            yield keyword, Term("category", category)
+    for taxonomy, subcategories in CATEGORIES.items():
+        category = TAXONOMY_CATEGORIES.get(taxonomy, "services")
+        yield taxonomy.lower(), Term("category", category, taxonomy)
+        for subcategory in subcategories:
+            yield subcategory.lower(), Term("category", TAXONOMY_SUBCATEGORIES.get(subcategory, category), taxonomy)
+    for location, aliases in LOCATIONS.items():
+        for alias in aliases:
+            yield alias, Term("location", location)
+
+
+AUTOMATON = Automaton(_terms())
+
+
+# Entities
+
+def _amount(number: str, multiplier: Optional[str]) -> float:
+    return float(number.replace(",", "")) * MULTIPLIERS.get(multiplier or "", 1)
+
+
+def extract_budget(text: str) -> Optional[float]:
+    for pattern in BUDGET_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return _amount(match.group(1), match.group(2) if pattern.groups > 1 else None)
+    return None
+
+
+def extract_quantity(text: str) -> Optional[int]:
+    for pattern in QUANTITY_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return int(match.group(1).replace(",", ""))
+    return None
+
+
+def extract_date(text: str, today: Optional[date] = None) -> Optional[date]:
+    today = today or date.today()
+    if "tomorrow" in text:
+        return today + timedelta(days=1)
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        try:
+            parsed = date_parser.parse(match.group(0), dayfirst=True,
+                                       default=datetime.combine(today, datetime.min.time())).date()
+        except (ValueError, OverflowError):
+            continue
+        if parsed < today and not re.search(r"\d{4}", match.group(0)):
+            parsed = parsed.replace(year=parsed.year + 1)
+        return parsed
+    match = RELATIVE_DATE.search(text)
+    if match:
+        count = int(match.group(1)) if match.group(1) and match.group(1).isdigit() else WORD_NUMBERS[match.group(1)]
+        unit = match.group(2)
+        if unit == "month":
+            return today + relativedelta(months=count)
+        return today + timedelta(days=count * (7 if unit == "week" else 1))
+    return None
+
+
+def extract_entities(message: str, today: Optional[date] = None) -> dict:
+    """Category, taxonomy category, quantity, budget, delivery date and location found in ``message``"""
+    text = message.lower()
+    votes: Dict[str, int] = {}
+    entities: dict = {}
+    for _, _, term in AUTOMATON.find(text):
+        if term.kind == "category":
+            votes[term.value] = votes.get(term.value, 0) + 1
+            if term.detail:
+                entities.setdefault("vendor_category", term.detail)
+        else:
+            entities.setdefault("location", term.value)
+    if votes:
+        entities["category"] = max(CATEGORY_ORDER, key=lambda c: (votes.get(c, 0), -CATEGORY_ORDER.index(c)))
+
+    budget = extract_budget(text)
+    if budget is not None:
+        entities["budget"] = budget
+    quantity = extract_quantity(text)
+    if quantity is not None:
+        entities["quantity"] = quantity
+    delivery = extract_date(text, today)
+    if delivery is not None:
+        entities["delivery_date"] = delivery.isoformat()
+    return entities
+
+
+# Field name in the agent's question flows -> entity that answers it
+FIELD_ENTITIES = {
+    "quantity": "quantity",
+    "licenses": "quantity",
+    "budget": "budget",
+    "deadline": "delivery_date",
+    "location": "location",
+}
+
+
+def extract_field(message: str, field: str, today: Optional[date] = None) -> Optional[str]:
+    """Normalized answer to the question for ``field``, or None when the message does not hold one
+
+    A bare number ("50", "4,00,000") answers quantity and budget questions.
+    """
+    entity = FIELD_ENTITIES.get(field)
+    if entity is None or not message:
+        return None
+    value = extract_entities(message, today).get(entity)
+    if value is None and entity in ("quantity", "budget"):
+        numbers = NUMBER.findall(message)
+        if len(numbers) == 1:
+            value = _amount(numbers[0], None)
+    if isinstance(value, float):
+        return f"{value:.0f}" if value == int(value) else f"{value:.2f}"
+    return str(value) if value is not None else None
+
+
+# Classifier
+
+class NaiveBayes:
+    """Multinomial Naive Bayes over lowercase word tokens"""
+
+    def __init__(self, texts: List[str], labels: List[str], alpha: float = 1.0):
+        self.labels = sorted(set(labels))
+        self.vocabulary: Dict[str, int] = {}
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        documents = [[self.vocabulary.setdefault(t, len(self.vocabulary)) for t in TOKEN.findall(text.lower())]
+                     for text in texts]
+
+        counts = np.zeros((len(self.labels), len(self.vocabulary)))
+        priors = np.zeros(len(self.labels))
+        for tokens, label in zip(documents, labels):
+            row = label_index[label]
+            priors[row] += 1
+            np.add.at(counts[row], tokens, 1)
+        self.log_prior = np.log(priors / priors.sum())
+        smoothed = counts + alpha
+        self.log_likelihood = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """(label, posterior probability); unseen words are ignored"""
+        tokens = [self.vocabulary[t] for t in TOKEN.findall(text.lower()) if t in self.vocabulary]
+        if not tokens:
+            return self.labels[int(self.log_prior.argmax())], 0.0
+        scores = self.log_prior + self.log_likelihood[:, tokens].sum(axis=1)
+        best = int(scores.argmax())
+        posterior = 1.0 / np.exp(scores - scores[best]).sum()
+        return self.labels[best], float(posterior)
+
+
+_classifier: Optional[NaiveBayes] = None
+
+
+def training_messages(db: Session, limit: int = TRAINING_LIMIT) -> List[Tuple[str, str]]:
+    """(user message, conversation category) pairs, most recent first
+
+    Only conversations categorized by keywords are used, so the classifier
+    learns the vocabulary around keyword hits (including follow-up answers)
+    and never trains on its own guesses.
+    """
+    rows = db.query(ConversationMessage.conversation_id, ConversationMessage.content).filter(
+        ConversationMessage.role == "user"
+    ).order_by(ConversationMessage.id.desc()).limit(limit).all()
+
+    categories: Dict[int, Optional[str]] = {}
+    conversation_ids = sorted({conversation_id for conversation_id, _ in rows})
+    for start in range(0, len(conversation_ids), 500):
+        for conversation_id, requirements in db.query(AgentConversation.id, AgentConversation.requirements_gathered).filter(
+            AgentConversation.id.in_(conversation_ids[start:start + 500])
+        ):
+            try:
+                parsed = json.loads(requirements) if requirements else {}
+            except ValueError:
+                parsed = {}
+            if parsed.get("category") != DEFAULT_CATEGORY and parsed.get("category_source") != "classifier":
+                categories[conversation_id] = parsed.get("category")
+    return [(content, categories[cid]) for cid, content in rows if content and categories.get(cid)]
+
+
+def train_classifier(db: Session) -> Optional[NaiveBayes]:
+    """Fit the fallback classifier on stored history; leaves it unset when history is too thin"""
+    global _classifier
+    pairs = training_messages(db)
+    labels = {label for _, label in pairs}
+    if len(pairs) < MIN_TRAINING_MESSAGES or len(labels) < 2:
+        _classifier = None
+        return None
+    _classifier = NaiveBayes([text for text, _ in pairs], [label for _, label in pairs])
+    return _classifier
+
+
+def classify(message: str, today: Optional[date] = None) -> Intent:
+    """Category of an opening message, with the entities it mentions"""
+    entities = extract_entities(message or "", today)
+    if "category" in entities:
+        return Intent(entities["category"], "keywords", 1.0, entities)
+    if _classifier is not None and message:
+        label, confidence = _classifier.predict(message)
+        if confidence >= MIN_CONFIDENCE:
+            return Intent(label, "classifier", round(confidence, 3), entities)
+    return Intent(DEFAULT_CATEGORY, "default", 0.0, entities)
+
+
+if __name__ == "__main__":
+    import time
+
+    from app.models.database import SessionLocal, init_db
+
+    init_db()
+    with SessionLocal() as session:
+        started = time.perf_counter()
+        model = train_classifier(session)
+        trained = time.perf_counter() - started
+        messages = [text for text, _ in training_messages(session)] or [
+            "I need 50 laptops in Bangalore by 15th March, budget 40 lakh",
+            "Looking for a security software subscription for 200 users",
+        ]
+
+    print(f"Classifier: {'trained on %d labels in %.3fs' % (len(model.labels), trained) if model else 'not enough history'}")
+    sample = (messages * (20000 // len(messages) + 1))[:20000]
+    for name, function in (("keywords", lambda m: AUTOMATON.find(m.lower())),
+                           ("entities", extract_entities),
+                           ("classify", classify)):
+        started = time.perf_counter()
+        for text in sample:
+            function(text)
+        elapsed = time.perf_counter() - started
+        print(f"{name}: {len(sample) / elapsed:,.0f} messages/s")
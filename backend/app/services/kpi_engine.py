@@ -0,0 +1,362 @@
+"""
+Time-windowed procurement KPIs with stored period snapshots
+
+Every KPI is a ratio of additive sums (cycle days over transactions, on-time
+over paid invoices, ...), so one grouped scan per source table yields the
+sums for every daily, weekly, monthly or quarterly period at once, and any
+window is the ratio of its summed periods:
+
+- transactions, dated by their invoice's payment date, falling back to the
+  invoice date and then the transaction's creation: end-to-end cycle time,
+  first-pass yield and compliance deviation rate
+- invoices, dated by payment, falling back to the invoice date: on-time payment
+- the process event log, dated by stage completion: stage-level cycle times
+
+A rollup writes the per-period values to KPIMetric (dimension ``overall``, or
+``stage`` for stage cycle times), so a 12-month trend reads 12 stored rows
+per metric instead of rescanning. Each granularity is rolled up again once
+its snapshot is older than ROLLUP_INTERVAL. Readers roll up a granularity
+that has never been rolled up, and otherwise read the snapshots and queue a
+due rollup as a background task; cron can run every granularity with:
+    python -m app.services.kpi_engine
+"""
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.database import (
+    Invoice, KPIMetric, KPIRollupState, ProcessEvent, ProcurementTransaction, SessionLocal,
+)
+from app.services.process_mining import refresh_process_events
+from app.services.sql_functions import period_key
+
+# API window -> KPIMetric.period
+WINDOWS = {"day": "daily", "week": "weekly", "month": "monthly", "quarter": "quarterly"}
+ROLLUP_INTERVAL = timedelta(hours=1)
+STABLE_THRESHOLD = 1.0  # Percent change reported as "stable"
+
+# (metric name, unit, lower is better)
+METRICS = (
+    ("End-to-End Cycle Time", "days", True),
+    ("First-Pass Yield", "%", False),
+    ("On-Time Payment", "%", False),
+    ("Compliance Deviation Rate", "%", True),
+)
+STAGE_METRIC = "Stage-Level Cycle Time"
+TRANSACTIONS_METRIC = "Transactions"
+STAGE_LABELS = {
+    "request_intake": "Request Intake",
+    "sourcing": "Sourcing",
+    "contracting": "Contracting",
+    "pr_po_creation": "PR/PO Creation",
+    "invoicing": "Invoicing",
+    "payment": "Payment",
+}
+
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def period_start(day: date, period: str) -> date:
+    """First day of the period containing ``day``"""
+    if period == "weekly":
+        return day - timedelta(days=day.weekday())
+    if period == "monthly":
+        return day.replace(day=1)
+    if period == "quarterly":
+        return date(day.year, (day.month - 1) // 3 * 3 + 1, 1)
+    return day
+
+
+def shift_period(start: date, period: str, count: int) -> date:
+    """Start of the period ``count`` periods after the one beginning at ``start``"""
+    if period in ("monthly", "quarterly"):
+        months = start.year * 12 + start.month - 1 + count * (3 if period == "quarterly" else 1)
+        return date(months // 12, months % 12 + 1, 1)
+    return start + timedelta(days=count * (7 if period == "weekly" else 1))
+
+
+def _bounded(query, anchor, since: Optional[datetime], until: Optional[datetime]):
+    if since is not None:
+        query = query.where(anchor >= since)
+    if until is not None:
+        query = query.where(anchor < until)
+    return query
+
+
+def _empty_sums() -> dict:
+    return {
+        "transactions": 0, "cycle_days": 0, "cycle_count": 0, "with_issues": 0, "deviations": 0,
+        "on_time": 0, "paid": 0, "stages": {}
+    }
+
+
+def _add_sums(total: dict, sums: dict) -> None:
+    for name, value in sums.items():
+        if name == "stages":
+            for stage, (days, count) in value.items():
+                total_days, total_count = total["stages"].get(stage, (0, 0))
+                total["stages"][stage] = (total_days + days, total_count + count)
+        else:
+            total[name] += value
+
+
+def compute_kpis(db: Session, period: Optional[str] = None, since: Optional[datetime] = None,
+                 until: Optional[datetime] = None) -> Dict[Optional[str], dict]:
+    """Additive KPI sums per period start ('YYYY-MM-DD'), from one grouped scan per source
+
+    ``period`` None puts every row in a single "all" bucket. Rows without a
+    date land in a None bucket. ``since``/``until`` bound the window.
+    """
+    def key(anchor):
+        return period_key(db, anchor, period) if period else literal("all")
+
+    refresh_process_events(db)  # Commits its own changes, so run it before any scan
+    sums: Dict[Optional[str], dict] = {}
+
+    def bucket(name):
+        return sums.setdefault(name, _empty_sums())
+
+    txn = ProcurementTransaction
+    anchor = func.coalesce(Invoice.payment_date, Invoice.invoice_date, txn.created_at)
+    query = select(
+        key(anchor).label("bucket"),
+        func.count(txn.id),
+        func.coalesce(func.sum(txn.total_cycle_time_days), 0),
+        func.count(txn.total_cycle_time_days),
+        _count_if((txn.has_bottleneck == True) | (txn.has_control_gap == True)),
+        _count_if(txn.has_control_gap == True),
+    ).select_from(txn).outerjoin(Invoice, Invoice.id == txn.invoice_id)
+    for name, *values in db.execute(_bounded(query, anchor, since, until).group_by("bucket")):
+        bucket(name).update(zip(("transactions", "cycle_days", "cycle_count", "with_issues", "deviations"), values))
+
+    anchor = func.coalesce(Invoice.payment_date, Invoice.invoice_date)
+    query = select(
+        key(anchor).label("bucket"),
+        _count_if(Invoice.payment_date <= Invoice.due_date),
+        _count_if(Invoice.payment_status == "Paid"),
+    )
+    for name, on_time, paid in db.execute(_bounded(query, anchor, since, until).group_by("bucket")):
+        bucket(name).update(on_time=on_time or 0, paid=paid or 0)
+
+    anchor = ProcessEvent.ended_at
+    query = select(
+        key(anchor).label("bucket"),
+        ProcessEvent.stage,
+        func.sum(ProcessEvent.duration_days),
+        func.count(ProcessEvent.duration_days),
+    ).where(ProcessEvent.ended_at.isnot(None))
+    for name, stage, days, count in db.execute(
+        _bounded(query, anchor, since, until).group_by("bucket", ProcessEvent.stage)
+    ):
+        bucket(name)["stages"][stage] = (days or 0, count)
+
+    return sums
+
+
+def kpi_values(sums: dict) -> Tuple[Dict[str, Optional[float]], Dict[str, float]]:
+    """(metric name -> value, stage label -> average days) for one bucket's sums
+
+    A metric whose denominator is empty in the bucket is None.
+    """
+    transactions, paid = sums["transactions"], sums["paid"]
+    values = {
+        "End-to-End Cycle Time": sums["cycle_days"] / sums["cycle_count"] if sums["cycle_count"] else None,
+        "First-Pass Yield": (transactions - sums["with_issues"]) / transactions * 100 if transactions else None,
+        "On-Time Payment": sums["on_time"] / paid * 100 if paid else None,
+        "Compliance Deviation Rate": sums["deviations"] / transactions * 100 if transactions else None,
+    }
+    stages = {
+        STAGE_LABELS[stage]: days / count
+        for stage, (days, count) in sums["stages"].items() if count and stage in STAGE_LABELS
+    }
+    return values, stages
+
+
+def _rollup_rows(db: Session, period: str, now: datetime) -> Tuple[List[dict], int]:
+    """Snapshot rows for every dated period, plus all-time rows with a NULL period_date
+
+    The all-time sums are the sum of every bucket, undated ones included, so
+    they need no extra scan.
+    """
+    rows, periods, total = [], 0, _empty_sums()
+
+    def snapshot(sums, period_date):
+        values, stages = kpi_values(sums)
+        metrics = [(metric, unit, "overall", "all", values[metric]) for metric, unit, _ in METRICS]
+        metrics.append((TRANSACTIONS_METRIC, "count", "overall", "all", sums["transactions"]))
+        metrics += [(STAGE_METRIC, "days", "stage", label, days) for label, days in stages.items()]
+        for metric, unit, dimension, dimension_value, value in metrics:
+            if value is None:
+                continue
+            rows.append({
+                "metric_name": metric, "metric_value": value, "metric_unit": unit,
+                "dimension": dimension, "dimension_value": dimension_value,
+                "period": period, "period_date": period_date, "created_at": now
+            })
+
+    for name, sums in compute_kpis(db, period).items():
+        _add_sums(total, sums)
+        if name is None:
+            continue  # Undated rows count toward all-time figures only
+        periods += 1
+        snapshot(sums, datetime.strptime(name, "%Y-%m-%d"))
+    snapshot(total, None)
+    return rows, periods
+
+
+def rollup_kpis(db: Session, period: str = "monthly", force: bool = False) -> Optional[KPIRollupState]:
+    """Snapshot every ``period`` into kpi_metrics unless the last rollup is recent
+
+    Replaces the granularity's ``overall`` and ``stage`` rows in one
+    transaction; other KPIMetric rows are left alone. Returns None when
+    another worker claimed the rollup first.
+    """
+    state = db.query(KPIRollupState).filter(KPIRollupState.period == period).first()
+    if not state:
+        db.add(KPIRollupState(period=period, version=0))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # Created by a concurrent rollup
+        state = db.query(KPIRollupState).filter(KPIRollupState.period == period).one()
+
+    now = datetime.utcnow()
+    if not force and not rollup_due(state, now):
+        return state
+
+    version = state.version or 0
+    rows, periods = _rollup_rows(db, period, now)
+    claimed = db.query(KPIRollupState).filter(
+        KPIRollupState.period == period,
+        KPIRollupState.version == version
+    ).update({KPIRollupState.version: version + 1}, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        return None
+
+    db.execute(delete(KPIMetric).where(
+        KPIMetric.period == period,
+        KPIMetric.dimension.in_(("overall", "stage"))
+    ))
+    if rows:
+        db.execute(insert(KPIMetric), rows)
+    db.query(KPIRollupState).filter(KPIRollupState.period == period).update({
+        KPIRollupState.period_count: periods,
+        KPIRollupState.rolled_up_at: now
+    }, synchronize_session=False)
+    db.commit()
+    db.refresh(state)
+    return state
+
+
+def rollup_state(db: Session, period: str) -> Optional[KPIRollupState]:
+    return db.query(KPIRollupState).filter(KPIRollupState.period == period).first()
+
+
+def rollup_due(state: Optional[KPIRollupState], now: Optional[datetime] = None) -> bool:
+    """True when the granularity has no snapshot or it is older than ROLLUP_INTERVAL"""
+    if state is None or state.rolled_up_at is None:
+        return True
+    return (now or datetime.utcnow()) - state.rolled_up_at >= ROLLUP_INTERVAL
+
+
+_queued: set = set()  # Periods with a background rollup pending in this process
+_queued_lock = threading.Lock()
+
+
+def queue_rollup(period: str) -> bool:
+    """Reserve this process's background rollup of ``period``; False if one is already queued"""
+    with _queued_lock:
+        if period in _queued:
+            return False
+        _queued.add(period)
+        return True
+
+
+def run_queued_rollup(period: str) -> None:
+    """Background task for a period reserved with ``queue_rollup``"""
+    try:
+        with SessionLocal() as db:
+            rollup_kpis(db, period)
+    finally:
+        with _queued_lock:
+            _queued.discard(period)
+
+
+def run_scheduled_rollups(db: Session, force: bool = False) -> Dict[str, Optional[KPIRollupState]]:
+    """Roll up every granularity that is due"""
+    return {period: rollup_kpis(db, period, force) for period in WINDOWS.values()}
+
+
+def kpi_totals(db: Session, period: str = "monthly") -> Dict[Tuple[str, str], float]:
+    """All-time values stored by the last ``period`` rollup, keyed (metric name, dimension value)"""
+    rows = db.query(KPIMetric.metric_name, KPIMetric.dimension_value, KPIMetric.metric_value).filter(
+        KPIMetric.metric_name.in_([metric for metric, _, _ in METRICS] + [STAGE_METRIC, TRANSACTIONS_METRIC]),
+        KPIMetric.dimension.in_(("overall", "stage")),
+        KPIMetric.period == period,
+        KPIMetric.period_date.is_(None)
+    )
+    return {(metric, dimension_value): value for metric, dimension_value, value in rows}
+
+
+def kpi_trend(db: Session, period: str = "monthly", periods: int = 12,
+              today: Optional[date] = None) -> Tuple[Dict[Tuple[str, str], List[Tuple[date, float]]], date]:
+    """Stored snapshots of the last ``periods`` periods, the current open one included
+
+    Returns ({(metric name, dimension value): [(period start, value), ...]}
+    oldest first, current period start).
+    """
+    current = period_start(today or date.today(), period)
+    since = datetime.combine(shift_period(current, period, 1 - periods), datetime.min.time())
+    names = [metric for metric, _, _ in METRICS] + [STAGE_METRIC]
+    rows = db.query(
+        KPIMetric.metric_name, KPIMetric.dimension_value, KPIMetric.period_date, KPIMetric.metric_value
+    ).filter(
+        KPIMetric.metric_name.in_(names),
+        KPIMetric.dimension.in_(("overall", "stage")),
+        KPIMetric.period == period,
+        KPIMetric.period_date >= since
+    ).order_by(KPIMetric.period_date)
+
+    series: Dict[Tuple[str, str], List[Tuple[date, float]]] = {}
+    for metric, dimension_value, period_date, value in rows:
+        series.setdefault((metric, dimension_value), []).append((period_date.date(), value))
+    return series, current
+
+
+def trend_direction(points: List[Tuple[date, float]], current: date, lower_is_better: bool) -> Tuple[str, float]:
+    """(trend, change percentage) between the two latest closed periods in ``points``"""
+    closed = [value for period_date, value in points if period_date < current]
+    if len(closed) < 2 or not closed[-2]:
+        return "stable", 0.0
+    change = (closed[-1] - closed[-2]) / abs(closed[-2]) * 100
+    if abs(change) < STABLE_THRESHOLD:
+        return "stable", round(change, 1)
+    return ("improving" if (change < 0) == lower_is_better else "declining"), round(change, 1)
+
+
+def kpi_freshness(state: Optional[KPIRollupState], period: str) -> dict:
+    """Rollup block included in snapshot-backed responses"""
+    return {
+        "source": "kpi_metrics",
+        "period": period,
+        "version": state.version if state else None,
+        "rolled_up_at": state.rolled_up_at.isoformat() if state and state.rolled_up_at else None,
+        "stale": rollup_due(state)
+    }
+
+
+if __name__ == "__main__":
+    from app.models.database import init_db
+
+    init_db()
+    with SessionLocal() as session:
+        for period, rollup in run_scheduled_rollups(session).items():
+            print(f"{period}: " + (f"{rollup.period_count} periods as of {rollup.rolled_up_at:%Y-%m-%d %H:%M}"
+                                   if rollup else "claimed by another worker"))
@@ -0,0 +1,89 @@
+"""
+Batched related-row loading for list endpoints
+"""
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.database import get_async_db, get_db
+
+CHUNK_SIZE = 500  # Keeps IN lists under SQLite's bound-parameter limit
+
+
+def _chunks(ids: List[int]):
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+class BatchLoader:
+    """Per-request identity map that resolves related rows with one IN query per model.
+
+    Routers call ``prime`` with every foreign key on the current page, then read
+    rows back with ``get`` while building the response, so a page of N rows costs
+    one query per related model (per CHUNK_SIZE ids) instead of one per row.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._identity_map: Dict[type, Dict[int, object]] = {}
+
+    def prime(self, model, ids: Iterable[Optional[int]]) -> Dict[int, object]:
+        """Load every not-yet-seen id for ``model``, one query per CHUNK_SIZE ids"""
+        cache, missing = self._missing(model, ids)
+        for chunk in _chunks(missing):
+            self._store(cache, chunk, self.db.query(model).filter(model.id.in_(chunk)).all())
+        return cache
+
+    def _missing(self, model, ids: Iterable[Optional[int]]):
+        cache = self._identity_map.setdefault(model, {})
+        return cache, sorted({i for i in ids if i is not None and i not in cache})
+
+    @staticmethod
+    def _store(cache: Dict[int, object], missing: List[int], rows) -> None:
+        for row in rows:
+            cache[row.id] = row
+        # Remember misses too, so a dangling FK is not re-queried
+        for i in missing:
+            cache.setdefault(i, None)
+
+    def get(self, model, id: Optional[int]):
+        """Return a primed row, or None if it does not exist"""
+        if id is None:
+            return None
+        cache = self._identity_map.get(model, {})
+        if id not in cache:
+            self.prime(model, [id])
+            cache = self._identity_map[model]
+        return cache[id]
+
+
+def get_loader(db: Session = Depends(get_db)) -> BatchLoader:
+    """FastAPI dependency providing a fresh loader bound to the request session"""
+    return BatchLoader(db)
+
+
+class AsyncBatchLoader(BatchLoader):
+    """BatchLoader for async handlers; ``prime`` is awaited and ``get`` never queries"""
+
+    db: AsyncSession
+
+    async def prime(self, model, ids: Iterable[Optional[int]]) -> Dict[int, object]:
+        cache, missing = self._missing(model, ids)
+        for chunk in _chunks(missing):
+            rows = await self.db.scalars(select(model).where(model.id.in_(chunk)))
+            self._store(cache, chunk, rows.all())
+        return cache
+
+    def get(self, model, id: Optional[int]):
+        """Return a primed row, or None if it was not primed or does not exist"""
+        if id is None:
+            return None
+        return self._identity_map.get(model, {}).get(id)
+
+
+def get_async_loader(db: AsyncSession = Depends(get_async_db)) -> AsyncBatchLoader:
+    """Async counterpart of ``get_loader``"""
+    return AsyncBatchLoader(db)
@@ -0,0 +1,349 @@
+"""
+Process mining over a persisted stage event log
+
+Every ProcurementTransaction contributes one ProcessEvent per stage it has
+started, taken from the real document timestamps (sourcing request,
+contract, requisition, purchase order, invoice). Events are ordered by start
+time within a transaction, so the sequence of stages is the path the
+transaction actually took.
+
+Flow measures (stage duration histograms, stage-to-stage edges, path
+variants) are additive, so they are kept in ProcessFlowCell and adjusted by
+delta like the spend cube: new transactions are added as their events are
+written, and rebuilt transactions are streamed out of the old log with a
+negative sign first. Serving the flow graph reads a few hundred cells
+whatever the log size.
+
+The log grows by id watermark on ProcurementTransaction. Transactions whose
+``updated_at`` moved past the stored high-water mark are rebuilt; ORM edits
+to their source documents bump it through app.services.change_tracking.
+"""
+import math
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session, aliased
+
+from app.models.database import (
+    Contract, Invoice, ProcessEvent, ProcessEventLogState, ProcessFlowCell, ProcurementTransaction,
+    PurchaseOrder, PurchaseRequisition, SourcingRequest
+)
+from app.services.change_tracking import claim_transaction_delta
+
+# (stage, source system, start timestamp, end timestamp) in canonical order
+STAGES = (
+    ("request_intake", "SAP Ariba", "request_submitted", "request_approved"),
+    ("sourcing", "SAP Ariba", "sourcing_started", "award_decided"),
+    ("contracting", "Simplicontract", "contract_drafted", "contract_executed"),
+    ("pr_po_creation", "Oracle Fusion", "pr_created", "po_sent"),
+    ("invoicing", "Oracle EBS", "po_sent", "invoice_received"),
+    ("payment", "Oracle EBS", "invoice_received", "invoice_paid"),
+)
+STAGE_ORDER = {stage: index for index, (stage, _, _, _) in enumerate(STAGES)}
+CANONICAL_PATH = tuple(STAGE_ORDER)
+
+BUILD_CHUNK_SIZE = 5000
+STREAM_CHUNK_SIZE = 50000
+VARIANT_LIMIT = 10
+DURATION_BUCKETS = ((0, 1), (2, 3), (4, 7), (8, 14), (15, 30), (31, 60), (61, None))
+
+
+class FlowDelta:
+    """Pending changes to ProcessFlowCell as [count, total, total_count] per (kind, key, bucket)"""
+
+    def __init__(self):
+        self.cells: Dict[Tuple[str, str, int], List[int]] = {}
+
+    def _cell(self, kind: str, key: str, bucket: int = 0) -> List[int]:
+        return self.cells.setdefault((kind, key, bucket), [0, 0, 0])
+
+    def add_case(self, events, sign: int = 1) -> None:
+        """Fold one transaction's (stage, duration, wait, elapsed) events, in sequence order"""
+        path, complete, cycle, previous = [], True, 0, None
+        for stage, duration, wait, elapsed in events:
+            path.append(stage)
+            if duration is None:
+                self._cell("in_progress", stage)[0] += sign
+                complete = False
+            else:
+                self._cell("duration", stage, duration)[0] += sign
+                cycle = max(cycle, elapsed)
+            if previous is not None:
+                edge = self._cell("edge", f"{previous}>{stage}")
+                edge[0] += sign
+                if wait is not None:
+                    edge[1] += sign * wait
+                    edge[2] += sign
+            previous = stage
+
+        if path:
+            variant = self._cell("variant", ",".join(path))
+            variant[0] += sign
+            if complete:
+                variant[1] += sign * cycle
+                variant[2] += sign
+
+
+def _timestamps_query(condition):
+    """Stage timestamps for the transactions matching ``condition``"""
+    sr, contract, pr, po, invoice = (
+        aliased(SourcingRequest), aliased(Contract), aliased(PurchaseRequisition),
+        aliased(PurchaseOrder), aliased(Invoice)
+    )
+    txn = ProcurementTransaction
+    return select(
+        txn.id,
+        sr.request_submitted_date.label("request_submitted"),
+        sr.request_approved_date.label("request_approved"),
+        sr.sourcing_event_start.label("sourcing_started"),
+        sr.award_decision_date.label("award_decided"),
+        contract.contract_drafted_date.label("contract_drafted"),
+        contract.contract_executed_date.label("contract_executed"),
+        func.coalesce(pr.pr_created_date, po.po_created_date).label("pr_created"),
+        po.po_sent_to_vendor_date.label("po_sent"),
+        invoice.invoice_received_date.label("invoice_received"),
+        case((invoice.payment_status == "Paid", invoice.payment_date), else_=None).label("invoice_paid"),
+    ).select_from(txn).outerjoin(
+        sr, sr.id == txn.sourcing_request_id
+    ).outerjoin(
+        contract, contract.id == txn.contract_id
+    ).outerjoin(
+        pr, pr.id == txn.pr_id
+    ).outerjoin(
+        po, po.id == txn.po_id
+    ).outerjoin(
+        invoice, invoice.id == txn.invoice_id
+    ).where(condition)
+
+
+def build_events(row) -> List[dict]:
+    """Event rows for one transaction; stages without a start time are left out"""
+    events = []
+    for stage, source_system, start, end in STAGES:
+        started_at, ended_at = getattr(row, start), getattr(row, end)
+        if started_at is None:
+            continue
+        events.append({
+            "transaction_id": row.id,
+            "stage": stage,
+            "started_at": started_at,
+            "ended_at": ended_at,
+            "duration_days": (ended_at - started_at).days if ended_at else None,
+            "source_system": source_system,
+        })
+    events.sort(key=lambda e: (e["started_at"], STAGE_ORDER[e["stage"]]))
+
+    # Day offsets are stored so mining never has to decode timestamps
+    previous_end = None
+    for sequence, event in enumerate(events):
+        event["sequence"] = sequence
+        event["wait_days"] = (event["started_at"] - previous_end).days if sequence and previous_end else None
+        event["elapsed_days"] = (event["ended_at"] - events[0]["started_at"]).days if event["ended_at"] else None
+        previous_end = event["ended_at"]
+    return events
+
+
+def _write_events(db: Session, condition, delta: FlowDelta) -> None:
+    rows = []
+    for row in db.execute(_timestamps_query(condition)):
+        events = build_events(row)
+        delta.add_case((e["stage"], e["duration_days"], e["wait_days"], e["elapsed_days"]) for e in events)
+        rows.extend(events)
+    if rows:
+        db.execute(insert(ProcessEvent), rows)
+
+
+def stream_cases(db: Session, condition=None):
+    """Yield (transaction_id, events) from the log in one ordered server-side pass"""
+    query = select(
+        ProcessEvent.transaction_id, ProcessEvent.stage, ProcessEvent.duration_days,
+        ProcessEvent.wait_days, ProcessEvent.elapsed_days
+    ).order_by(ProcessEvent.transaction_id, ProcessEvent.sequence)
+    if condition is not None:
+        query = query.where(condition)
+
+    current, events = None, []
+    for transaction_id, *event in db.connection().execute(query.execution_options(yield_per=STREAM_CHUNK_SIZE)):
+        if transaction_id != current:
+            if events:
+                yield current, events
+            current, events = transaction_id, []
+        events.append(event)
+    if events:
+        yield current, events
+
+
+def _rebuild_ids(db: Session, transaction_ids: List[int], delta: FlowDelta) -> None:
+    for start in range(0, len(transaction_ids), BUILD_CHUNK_SIZE):
+        chunk = transaction_ids[start:start + BUILD_CHUNK_SIZE]
+        for _, events in stream_cases(db, ProcessEvent.transaction_id.in_(chunk)):
+            delta.add_case(events, sign=-1)
+        db.execute(delete(ProcessEvent).where(ProcessEvent.transaction_id.in_(chunk)))
+        _write_events(db, ProcurementTransaction.id.in_(chunk), delta)
+
+
+def _apply_delta(db: Session, delta: FlowDelta) -> None:
+    cells = {(c.kind, c.key, c.bucket): c for c in db.query(ProcessFlowCell)}
+    for key, (count, total, total_count) in delta.cells.items():
+        if not (count or total or total_count):
+            continue
+        cell = cells.get(key)
+        if cell is None:
+            cell = ProcessFlowCell(kind=key[0], key=key[1], bucket=key[2], count=0, total=0, total_count=0)
+            db.add(cell)
+            cells[key] = cell
+        cell.count += count
+        cell.total += total
+        cell.total_count += total_count
+        if cell.count <= 0:
+            if cell in db.new:
+                db.expunge(cell)
+            else:
+                db.delete(cell)
+            del cells[key]
+
+
+def refresh_process_events(db: Session) -> ProcessEventLogState:
+    """Append new transactions to the event log and rebuild updated ones
+
+    Costs a MAX(id) and MAX(updated_at) lookup when nothing has changed.
+    Concurrent callers are serialised by a compare-and-set on the log version.
+    """
+    delta = claim_transaction_delta(db, ProcessEventLogState)
+    if delta is not None:
+        flow = FlowDelta()
+        if not delta.low_id:
+            db.execute(delete(ProcessEvent))
+            db.execute(delete(ProcessFlowCell))
+        _rebuild_ids(db, delta.updated_ids, flow)
+        for start in range(delta.low_id, delta.high_id, BUILD_CHUNK_SIZE):
+            _write_events(db, (ProcurementTransaction.id > start) &
+                          (ProcurementTransaction.id <= min(start + BUILD_CHUNK_SIZE, delta.high_id)), flow)
+        _apply_delta(db, flow)
+        db.commit()
+    return db.query(ProcessEventLogState).filter(ProcessEventLogState.id == 1).one()
+
+
+def rebuild_process_events(db: Session, transaction_ids: Optional[Iterable[int]] = None) -> ProcessEventLogState:
+    """Rebuild the events of ``transaction_ids``, or the whole log when None"""
+    state = db.query(ProcessEventLogState).filter(ProcessEventLogState.id == 1).first()
+    if transaction_ids is None or state is None:
+        if state is not None:
+            state.last_transaction_id = 0
+            db.commit()
+        return refresh_process_events(db)
+
+    flow = FlowDelta()
+    _rebuild_ids(db, sorted(set(transaction_ids)), flow)
+    _apply_delta(db, flow)
+    state.version = (state.version or 0) + 1
+    state.refreshed_at = datetime.utcnow()
+    db.commit()
+    return state
+
+
+def _percentile(histogram: Counter, total: int, q: float) -> Optional[int]:
+    """Nearest-rank percentile of an integer-day histogram"""
+    if not total:
+        return None
+    rank = max(1, math.ceil(q * total))
+    seen = 0
+    for days in sorted(histogram):
+        seen += histogram[days]
+        if seen >= rank:
+            return days
+    return None
+
+
+def _distribution(histogram: Counter) -> dict:
+    total = sum(histogram.values())
+    buckets = []
+    for low, high in DURATION_BUCKETS:
+        count = sum(n for days, n in histogram.items() if days >= low and (high is None or days <= high))
+        buckets.append({"range": f"{low}+" if high is None else f"{low}-{high}", "count": count})
+    return {
+        "completed": total,
+        "mean": round(sum(days * n for days, n in histogram.items()) / total, 1) if total else None,
+        "p50": _percentile(histogram, total, 0.5),
+        "p90": _percentile(histogram, total, 0.9),
+        "min": min(histogram) if total else None,
+        "max": max(histogram) if total else None,
+        "histogram": buckets,
+    }
+
+
+def _variant_name(path: Tuple[str, ...]) -> str:
+    title = lambda stage: stage.replace("_", " ").title()
+    if path == CANONICAL_PATH:
+        return "Standard Flow"
+    for earlier, later in zip(path, path[1:]):
+        if STAGE_ORDER[later] < STAGE_ORDER[earlier]:
+            return f"{title(earlier)} Before {title(later)}"
+    return "Skips " + ", ".join(title(stage) for stage in CANONICAL_PATH if stage not in path)
+
+
+def process_flow(db: Session) -> Tuple[dict, ProcessEventLogState]:
+    """Refresh the event log and assemble the flow graph from the stored cells"""
+    state = refresh_process_events(db)
+
+    durations: Dict[str, Counter] = {stage: Counter() for stage in STAGE_ORDER}
+    in_progress = Counter()
+    edges, variants = [], []
+    for cell in db.query(ProcessFlowCell):
+        if cell.kind == "duration":
+            durations[cell.key][cell.bucket] += cell.count
+        elif cell.kind == "in_progress":
+            in_progress[cell.key] += cell.count
+        elif cell.kind == "edge":
+            edges.append(cell)
+        elif cell.kind == "variant":
+            variants.append(cell)
+
+    edges.sort(key=lambda c: (-c.count, c.key))
+    variants.sort(key=lambda c: (-c.count, c.key))
+
+    flow = {
+        "total_cases": sum(c.count for c in variants),
+        "stages": {
+            stage: {
+                "transaction_count": sum(durations[stage].values()) + in_progress[stage],
+                "in_progress_count": in_progress[stage],
+                "duration": _distribution(durations[stage]),
+            }
+            for stage in STAGE_ORDER
+        },
+        "edges": [
+            {
+                "from": cell.key.split(">")[0],
+                "to": cell.key.split(">")[1],
+                "count": cell.count,
+                "avg_wait_days": round(cell.total / cell.total_count, 1) if cell.total_count else None,
+            }
+            for cell in edges
+        ],
+        "variant_count": len(variants),
+        "variants": [],
+    }
+    for rank, cell in enumerate(variants[:VARIANT_LIMIT], start=1):
+        path = tuple(cell.key.split(","))
+        flow["variants"].append({
+            "variant_id": "standard" if path == CANONICAL_PATH else f"variant_{rank}",
+            "path": list(path),
+            "name": _variant_name(path),
+            "count": cell.count,
+            "completed": cell.total_count,
+            "avg_cycle_time": round(cell.total / cell.total_count, 1) if cell.total_count else None,
+        })
+    return flow, state
+
+
+def event_log_freshness(state: ProcessEventLogState) -> dict:
+    """Watermark block included in event-log-backed responses"""
+    return {
+        "source": "process_events",
+        "last_transaction_id": state.last_transaction_id,
+        "version": state.version,
+        "refreshed_at": state.refreshed_at.isoformat() if state.refreshed_at else None
+    }
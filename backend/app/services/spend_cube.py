@@ -0,0 +1,176 @@
+"""
+Pre-aggregated spend cube with incremental refresh
+
+The cube holds one row per (category, subcategory, business_unit, vendor_id,
+fiscal_year, fiscal_quarter, month) with additive measures, so analytics
+endpoints aggregate a few thousand cube rows instead of every SpendRecord.
+New spend rows are folded in by id watermark; SpendRecord is treated as
+append-only, so call ``rebuild_spend_cube`` after editing or deleting rows.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.database import SpendCube, SpendCubeState, SpendRecord
+from app.services.sql_functions import month_key
+
+DIMENSIONS = (
+    "category", "subcategory", "business_unit", "vendor_id",
+    "fiscal_year", "fiscal_quarter", "month"
+)
+
+HIGH_CONFIDENCE = 0.9
+MEDIUM_CONFIDENCE = 0.75
+
+
+def _get_state(db: Session) -> SpendCubeState:
+    """The state row, created on first use; call before other writes, as a lost race rolls back"""
+    state = db.query(SpendCubeState).filter(SpendCubeState.id == 1).first()
+    if not state:
+        state = SpendCubeState(id=1, last_spend_record_id=0)
+        db.add(state)
+        try:
+            db.flush()
+        except IntegrityError:
+            # Another worker created it first
+            db.rollback()
+            state = db.query(SpendCubeState).filter(SpendCubeState.id == 1).one()
+    return state
+
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def _delta_query(db: Session, low_id: int, high_id: int):
+    """Aggregate spend rows in (low_id, high_id] to cube grain"""
+    month = func.coalesce(month_key(db, SpendRecord.spend_date), "Unknown").label("month")
+    categorized = SpendRecord.ai_categorized == True
+
+    return db.query(
+        SpendRecord.category,
+        SpendRecord.subcategory,
+        SpendRecord.business_unit,
+        SpendRecord.vendor_id,
+        SpendRecord.fiscal_year,
+        SpendRecord.fiscal_quarter,
+        month,
+        func.coalesce(func.sum(SpendRecord.amount), 0),
+        func.count(SpendRecord.id),
+        func.min(SpendRecord.amount),
+        func.max(SpendRecord.amount),
+        func.sum(case((SpendRecord.is_tail_spend == True, SpendRecord.amount), else_=0)),
+        _count_if(SpendRecord.is_tail_spend == True),
+        func.sum(case((SpendRecord.is_maverick_spend == True, SpendRecord.amount), else_=0)),
+        _count_if(SpendRecord.is_maverick_spend == True),
+        _count_if(categorized),
+        _count_if(and_(categorized, SpendRecord.confidence_score > HIGH_CONFIDENCE)),
+        _count_if(and_(
+            categorized,
+            SpendRecord.confidence_score > MEDIUM_CONFIDENCE,
+            SpendRecord.confidence_score <= HIGH_CONFIDENCE
+        )),
+    ).filter(
+        SpendRecord.id > low_id,
+        SpendRecord.id <= high_id
+    ).group_by(
+        SpendRecord.category,
+        SpendRecord.subcategory,
+        SpendRecord.business_unit,
+        SpendRecord.vendor_id,
+        SpendRecord.fiscal_year,
+        SpendRecord.fiscal_quarter,
+        month
+    )
+
+
+def _merge_cell(cell: SpendCube, row) -> None:
+    (total, count, min_amount, max_amount, tail_amount, tail_count,
+     maverick_amount, maverick_count, categorized, high, medium) = row[len(DIMENSIONS):]
+
+    cell.total_amount = (cell.total_amount or 0) + total
+    cell.record_count = (cell.record_count or 0) + count
+    if min_amount is not None:
+        cell.min_amount = min_amount if cell.min_amount is None else min(cell.min_amount, min_amount)
+    if max_amount is not None:
+        cell.max_amount = max_amount if cell.max_amount is None else max(cell.max_amount, max_amount)
+    cell.tail_amount = (cell.tail_amount or 0) + (tail_amount or 0)
+    cell.tail_count = (cell.tail_count or 0) + tail_count
+    cell.maverick_amount = (cell.maverick_amount or 0) + (maverick_amount or 0)
+    cell.maverick_count = (cell.maverick_count or 0) + maverick_count
+    cell.ai_categorized_count = (cell.ai_categorized_count or 0) + categorized
+    cell.high_confidence_count = (cell.high_confidence_count or 0) + high
+    cell.medium_confidence_count = (cell.medium_confidence_count or 0) + medium
+    cell.low_confidence_count = (cell.low_confidence_count or 0) + categorized - high - medium
+
+
+def refresh_spend_cube(db: Session) -> SpendCubeState:
+    """Fold SpendRecord rows added since the last refresh into the cube
+
+    Costs a single MAX(id) lookup when nothing new has arrived. Concurrent
+    callers are serialised by a compare-and-set on the watermark, so a
+    delta is never applied twice.
+    """
+    state = _get_state(db)
+    low_id = state.last_spend_record_id or 0
+    high_id = db.query(func.max(SpendRecord.id)).scalar() or 0
+
+    if high_id <= low_id:
+        db.commit()
+        return state
+
+    claimed = db.query(SpendCubeState).filter(
+        SpendCubeState.id == 1,
+        SpendCubeState.last_spend_record_id == low_id
+    ).update({
+        SpendCubeState.last_spend_record_id: high_id,
+        SpendCubeState.refreshed_at: datetime.utcnow()
+    }, synchronize_session=False)
+
+    if not claimed:
+        # Another worker applied this delta first
+        db.rollback()
+        state = _get_state(db)
+        db.commit()
+        return state
+
+    delta = _delta_query(db, low_id, high_id).all()
+
+    months = {row[DIMENSIONS.index("month")] for row in delta}
+    cells = {
+        tuple(getattr(cell, dim) for dim in DIMENSIONS): cell
+        for cell in db.query(SpendCube).filter(SpendCube.month.in_(months)).all()
+    }
+
+    for row in delta:
+        key = tuple(row[:len(DIMENSIONS)])
+        cell = cells.get(key)
+        if cell is None:
+            cell = SpendCube(**dict(zip(DIMENSIONS, key)))
+            db.add(cell)
+            cells[key] = cell
+        _merge_cell(cell, row)
+
+    db.commit()
+    db.refresh(state)
+    return state
+
+
+def rebuild_spend_cube(db: Session) -> SpendCubeState:
+    """Drop every cube row and rebuild from scratch"""
+    state = _get_state(db)
+    db.query(SpendCube).delete(synchronize_session=False)
+    state.last_spend_record_id = 0
+    db.commit()
+    return refresh_spend_cube(db)
+
+
+def cube_freshness(state: SpendCubeState) -> dict:
+    """Watermark block included in cube-backed responses"""
+    return {
+        "source": "spend_cube",
+        "last_spend_record_id": state.last_spend_record_id,
+        "refreshed_at": state.refreshed_at.isoformat() if state.refreshed_at else None
+    }
@@ -0,0 +1,31 @@
+"""
+Dialect-aware SQL expressions shared by the aggregation endpoints
+"""
+from typing import Union
+
+from sqlalchemy import Integer, String, cast, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+def month_key(db: Union[Session, AsyncSession], column):
+    """SQL expression rendering a datetime column as a 'YYYY-MM' string"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def period_key(db: Union[Session, AsyncSession], column, period: str):
+    """SQL expression rendering a datetime column as the 'YYYY-MM-DD' start of its
+    daily, weekly (Monday), monthly or quarterly period"""
+    if db.get_bind().dialect.name == "postgresql":
+        unit = {"daily": "day", "weekly": "week", "monthly": "month", "quarterly": "quarter"}[period]
+        return func.to_char(func.date_trunc(unit, column), "YYYY-MM-DD")
+    if period == "daily":
+        return func.strftime("%Y-%m-%d", column)
+    if period == "weekly":
+        return func.date(column, "weekday 0", "-6 days")
+    if period == "monthly":
+        return func.strftime("%Y-%m-01", column)
+    month = cast(func.strftime("%m", column), Integer)
+    return func.strftime("%Y-", column, type_=String) + func.printf("%02d", (month - 1) // 3 * 3 + 1) + "-01"
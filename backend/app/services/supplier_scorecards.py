@@ -0,0 +1,407 @@
+"""
+Precomputed supplier scorecards
+
+One SupplierScorecard row per vendor holds spend, on-time payment and
+delivery rates, leakage counts, the risk band and compliance status, so the
+supplier endpoints read a single indexed row instead of scanning a vendor's
+invoices and purchase orders.
+
+A refresh recomputes only the vendors that changed: vendors touched by
+vendor, invoice, PO, leakage case or spend rows above the stored id
+watermarks, plus rows flagged ``stale``. Code that edits existing rows calls
+``mark_scorecards_stale`` (or ``mark_invoice_vendors_stale`` for leakage
+cases) so the next refresh picks the vendor up. Every vendor is recomputed
+once per day so the rolling spend window moves forward; requests queue that
+as a background task and cron can run it with:
+    python -m app.services.supplier_scorecards
+
+Concurrent refreshes are serialised by a compare-and-set on the state row's
+version, so a scorecard or category row is never written twice.
+
+Recomputing a vendor also rewrites its VendorCategory rows, one per category
+with the scorecard's rank score. The (category, is_active, rank_score) index
+answers "best vendors in a category" by reading the top few index entries.
+``category_ranking`` caches those answers per refresh.
+"""
+import json
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from fastapi import BackgroundTasks
+from sqlalchemy import case, delete, distinct, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.database import (
+    Invoice, LeakageCase, PurchaseOrder, SessionLocal, SpendRecord, SupplierScorecard, SupplierScorecardState,
+    Vendor, VendorCategory
+)
+from app.services.cache import category_ranking_cache
+
+ROLLING_DAYS = 365
+OPEN_CASE_STATUSES = ("New", "Under Investigation")
+CHUNK_SIZE = 500  # Keeps IN lists under SQLite's bound-parameter limit
+
+# (state column, source model) pairs tracked by id watermark
+WATERMARKS = (
+    ("last_vendor_id", Vendor),
+    ("last_invoice_id", Invoice),
+    ("last_po_id", PurchaseOrder),
+    ("last_leakage_case_id", LeakageCase),
+    ("last_spend_record_id", SpendRecord),
+)
+
+
+def risk_band(risk_score: Optional[float]) -> str:
+    score = risk_score or 0
+    return "Low" if score < 40 else "Medium" if score < 70 else "High"
+
+
+def rank_score(performance_score, risk_score):
+    """Vendor ranking score; works on plain values and on SQL column expressions"""
+    if performance_score is None or risk_score is None:
+        return None
+    return performance_score * 0.4 - risk_score * 0.3
+
+
+def _get_state(db: Session) -> SupplierScorecardState:
+    """The state row, created on first use; call before other writes, as a lost race rolls back"""
+    state = db.query(SupplierScorecardState).filter(SupplierScorecardState.id == 1).first()
+    if not state:
+        state = SupplierScorecardState(id=1, version=0)
+        db.add(state)
+        try:
+            db.flush()
+        except IntegrityError:
+            # Another worker created it first
+            db.rollback()
+            state = db.query(SupplierScorecardState).filter(SupplierScorecardState.id == 1).one()
+    return state
+
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def _chunks(ids: List[int]):
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _changed_vendor_ids(db: Session, state: SupplierScorecardState, highs: Dict[str, int]) -> Set[int]:
+    """Vendors with rows above the watermarks, plus scorecards flagged stale"""
+    def in_range(column, name):
+        return (column > (getattr(state, name) or 0), column <= highs[name])
+
+    vendor_ids = {row[0] for row in db.query(SupplierScorecard.vendor_id).filter(SupplierScorecard.stale == True)}
+    queries = (
+        db.query(Vendor.id).filter(*in_range(Vendor.id, "last_vendor_id")),
+        db.query(distinct(Invoice.vendor_id)).filter(*in_range(Invoice.id, "last_invoice_id")),
+        db.query(distinct(PurchaseOrder.vendor_id)).filter(*in_range(PurchaseOrder.id, "last_po_id")),
+        db.query(distinct(Invoice.vendor_id)).join(LeakageCase, LeakageCase.invoice_id == Invoice.id).filter(
+            *in_range(LeakageCase.id, "last_leakage_case_id")),
+        db.query(distinct(SpendRecord.vendor_id)).filter(*in_range(SpendRecord.id, "last_spend_record_id")),
+    )
+    for query in queries:
+        vendor_ids.update(row[0] for row in query if row[0] is not None)
+    return vendor_ids
+
+
+def _aggregate(db: Session, vendor_filter, cutoff: datetime) -> Dict[int, dict]:
+    """Scorecard measures for the vendors matched by ``vendor_filter(column)``"""
+    measures: Dict[int, dict] = {}
+
+    def merge(query, names):
+        for vendor_id, *values in query:
+            measures.setdefault(vendor_id, {}).update(zip(names, values))
+
+    merge(db.query(
+        Vendor.id, Vendor.vendor_name, Vendor.vendor_code, Vendor.categories, Vendor.is_active,
+        Vendor.risk_score, Vendor.performance_score, Vendor.compliance_status
+    ).filter(vendor_filter(Vendor.id)), (
+        "vendor_name", "vendor_code", "categories", "is_active",
+        "risk_score", "performance_score", "compliance_status"
+    ))
+
+    merge(db.query(
+        Invoice.vendor_id,
+        func.count(Invoice.id),
+        func.coalesce(func.sum(Invoice.total_amount), 0),
+        func.coalesce(func.sum(case((Invoice.invoice_date >= cutoff, Invoice.total_amount), else_=0)), 0),
+        func.max(Invoice.invoice_date),
+        _count_if(Invoice.payment_date <= Invoice.due_date),
+    ).filter(vendor_filter(Invoice.vendor_id)).group_by(Invoice.vendor_id), (
+        "invoice_count", "total_spend", "rolling_spend", "last_invoice_date", "on_time_payment_count"
+    ))
+
+    merge(db.query(
+        PurchaseOrder.vendor_id,
+        func.count(PurchaseOrder.id),
+        _count_if(PurchaseOrder.actual_delivery_date.isnot(None)),
+        _count_if(PurchaseOrder.actual_delivery_date <= PurchaseOrder.expected_delivery_date),
+    ).filter(vendor_filter(PurchaseOrder.vendor_id)).group_by(PurchaseOrder.vendor_id), (
+        "po_count", "delivered_po_count", "on_time_delivery_count"
+    ))
+
+    merge(db.query(
+        Invoice.vendor_id,
+        func.count(LeakageCase.id),
+        _count_if(LeakageCase.status.in_(OPEN_CASE_STATUSES)),
+        func.coalesce(func.sum(LeakageCase.leakage_amount), 0),
+        func.coalesce(func.sum(LeakageCase.recovered_amount), 0),
+    ).join(LeakageCase, LeakageCase.invoice_id == Invoice.id).filter(
+        vendor_filter(Invoice.vendor_id)
+    ).group_by(Invoice.vendor_id), (
+        "leakage_case_count", "open_leakage_count", "leakage_amount", "recovered_amount"
+    ))
+
+    merge(db.query(
+        SpendRecord.vendor_id,
+        func.coalesce(func.sum(SpendRecord.amount), 0),
+    ).filter(vendor_filter(SpendRecord.vendor_id)).group_by(SpendRecord.vendor_id), (
+        "spend_record_amount",
+    ))
+
+    return measures
+
+
+def _apply(card: SupplierScorecard, values: dict, now: datetime) -> None:
+    invoices = values.get("invoice_count") or 0
+    delivered = values.get("delivered_po_count") or 0
+    on_time_payments = values.get("on_time_payment_count") or 0
+    on_time_deliveries = values.get("on_time_delivery_count") or 0
+
+    card.vendor_name = values["vendor_name"]
+    card.vendor_code = values["vendor_code"]
+    card.categories = values["categories"]
+    card.is_active = bool(values["is_active"])
+    card.risk_score = values["risk_score"]
+    card.performance_score = values["performance_score"]
+    card.risk_band = risk_band(values["risk_score"])
+    card.compliance_status = values["compliance_status"]
+    card.invoice_count = invoices
+    card.total_spend = values.get("total_spend") or 0
+    card.rolling_spend = values.get("rolling_spend") or 0
+    card.last_invoice_date = values.get("last_invoice_date")
+    card.on_time_payment_count = on_time_payments
+    card.on_time_payment_rate = round(on_time_payments / invoices * 100, 1) if invoices else 0
+    card.po_count = values.get("po_count") or 0
+    card.delivered_po_count = delivered
+    card.on_time_delivery_count = on_time_deliveries
+    card.on_time_delivery_rate = round(on_time_deliveries / delivered * 100, 1) if delivered else 0
+    card.leakage_case_count = values.get("leakage_case_count") or 0
+    card.open_leakage_count = values.get("open_leakage_count") or 0
+    card.leakage_amount = values.get("leakage_amount") or 0
+    card.recovered_amount = values.get("recovered_amount") or 0
+    card.spend_record_amount = values.get("spend_record_amount") or 0
+    card.stale = False
+    card.refreshed_at = now
+
+
+def _category_rows(vendor_id: int, values: dict) -> List[dict]:
+    categories = json.loads(values["categories"]) if values["categories"] else []
+    score = rank_score(values["performance_score"], values["risk_score"])
+    return [
+        {"vendor_id": vendor_id, "category": category, "is_active": bool(values["is_active"]), "rank_score": score}
+        for category in dict.fromkeys(categories)
+    ]
+
+
+def _recompute(db: Session, vendor_ids: Optional[Iterable[int]], as_of: date) -> int:
+    """Recompute scorecards for ``vendor_ids``, or for every vendor when None"""
+    cutoff = datetime.combine(as_of - timedelta(days=ROLLING_DAYS), datetime.min.time())
+    now = datetime.utcnow()
+
+    if vendor_ids is None:
+        batches = [(lambda column: column.isnot(None), None)]
+    else:
+        batches = [(lambda column, chunk=chunk: column.in_(chunk), chunk) for chunk in _chunks(sorted(vendor_ids))]
+
+    updated = 0
+    for vendor_filter, chunk in batches:
+        measures = _aggregate(db, vendor_filter, cutoff)
+        query = db.query(SupplierScorecard)
+        if chunk is not None:
+            query = query.filter(SupplierScorecard.vendor_id.in_(chunk))
+        cards = {card.vendor_id: card for card in query}
+
+        category_rows = []
+        for vendor_id, values in measures.items():
+            if "vendor_name" not in values:
+                continue  # Rows pointing at a vendor that no longer exists
+            card = cards.get(vendor_id)
+            if card is None:
+                card = SupplierScorecard(vendor_id=vendor_id)
+                db.add(card)
+            _apply(card, values, now)
+            category_rows.extend(_category_rows(vendor_id, values))
+            updated += 1
+
+        stale_rows = delete(VendorCategory)
+        if chunk is not None:
+            stale_rows = stale_rows.where(VendorCategory.vendor_id.in_(chunk))
+        db.execute(stale_rows)
+        if category_rows:
+            db.execute(insert(VendorCategory), category_rows)
+    return updated
+
+
+def refresh_supplier_scorecards(db: Session, background_tasks: Optional[BackgroundTasks] = None
+                                ) -> SupplierScorecardState:
+    """Bring scorecards up to date with the source tables
+
+    Costs one MAX(id) per source table plus a stale-flag probe when nothing
+    has changed. Every vendor is recomputed when a watermark is above MAX(id),
+    meaning a table was rebuilt, or when no full recompute has run yet. The
+    first refresh of a new day recomputes every vendor too, unless
+    ``background_tasks`` is given: requests pass theirs so that recompute runs
+    after the response while they get the changed vendors only.
+    """
+    state = _get_state(db)
+    today = date.today().isoformat()
+    highs = {name: db.query(func.max(model.id)).scalar() or 0 for name, model in WATERMARKS}
+    rebuilt = any(highs[name] < (getattr(state, name) or 0) for name, _ in WATERMARKS)
+    full = rebuilt or state.as_of is None
+    if not full and state.as_of != today:
+        if background_tasks is None:
+            full = True
+        elif _queue_daily_recompute():
+            background_tasks.add_task(run_daily_recompute)
+
+    if not full:
+        unchanged = all(highs[name] == (getattr(state, name) or 0) for name, _ in WATERMARKS)
+        if unchanged and not db.query(SupplierScorecard.id).filter(SupplierScorecard.stale == True).first():
+            db.commit()
+            return state
+
+    version = state.version or 0
+    claimed = db.query(SupplierScorecardState).filter(
+        SupplierScorecardState.id == 1,
+        SupplierScorecardState.version == version
+    ).update({SupplierScorecardState.version: version + 1}, synchronize_session=False)
+    if not claimed:
+        # Another worker refreshed first
+        db.rollback()
+        state = _get_state(db)
+        db.commit()
+        return state
+
+    _recompute(db, None if full else _changed_vendor_ids(db, state, highs), date.fromisoformat(today))
+
+    for name, _ in WATERMARKS:
+        setattr(state, name, highs[name])
+    if full:
+        state.as_of = today
+    state.refreshed_at = datetime.utcnow()
+    db.commit()
+    return state
+
+
+_daily_queued = False  # A background daily recompute is pending in this process
+_daily_lock = threading.Lock()
+
+
+def _queue_daily_recompute() -> bool:
+    global _daily_queued
+    with _daily_lock:
+        if _daily_queued:
+            return False
+        _daily_queued = True
+        return True
+
+
+def run_daily_recompute() -> None:
+    """Background task queued by ``refresh_supplier_scorecards``"""
+    global _daily_queued
+    try:
+        with SessionLocal() as db:
+            refresh_supplier_scorecards(db)
+    finally:
+        with _daily_lock:
+            _daily_queued = False
+
+
+def rebuild_supplier_scorecards(db: Session) -> SupplierScorecardState:
+    """Drop every scorecard and recompute from scratch"""
+    state = _get_state(db)
+    # Bumping the version makes any refresh already under way lose its claim
+    db.query(SupplierScorecardState).filter(SupplierScorecardState.id == 1).update(
+        {SupplierScorecardState.version: SupplierScorecardState.version + 1}, synchronize_session=False
+    )
+    db.query(SupplierScorecard).delete(synchronize_session=False)
+    for name, _ in WATERMARKS:
+        setattr(state, name, 0)
+    state.as_of = None
+    db.commit()
+    return refresh_supplier_scorecards(db)
+
+
+def mark_scorecards_stale(db: Session, vendor_ids: Iterable[Optional[int]]) -> None:
+    """Flag vendors whose invoices, POs or vendor record were edited in place
+
+    Joins the caller's transaction; the flag is committed with the edit.
+    """
+    ids = sorted({v for v in vendor_ids if v is not None})
+    for chunk in _chunks(ids):
+        db.execute(update(SupplierScorecard).where(
+            SupplierScorecard.vendor_id.in_(chunk)
+        ).values(stale=True).execution_options(synchronize_session=False))
+
+
+def mark_invoice_vendors_stale(db: Session, invoice_ids: Iterable[Optional[int]]) -> None:
+    """Flag the vendors behind ``invoice_ids``; used when leakage cases change"""
+    ids = sorted({i for i in invoice_ids if i is not None})
+    for chunk in _chunks(ids):
+        vendors = db.query(Invoice.vendor_id).filter(Invoice.id.in_(chunk)).distinct()
+        db.execute(update(SupplierScorecard).where(
+            SupplierScorecard.vendor_id.in_(vendors.scalar_subquery())
+        ).values(stale=True).execution_options(synchronize_session=False))
+
+
+def scorecard_freshness(state: SupplierScorecardState) -> dict:
+    """Watermark block included in scorecard-backed responses"""
+    return {
+        "source": "supplier_scorecards",
+        "as_of": state.as_of,
+        "refreshed_at": state.refreshed_at.isoformat() if state.refreshed_at else None
+    }
+
+
+def categories_of(card: SupplierScorecard) -> List[str]:
+    return json.loads(card.categories) if card.categories else []
+
+
+def category_ranking(db: Session, state: SupplierScorecardState, category: str, limit: int = 5,
+                     tie_margin: float = 0.1) -> List[int]:
+    """Active vendor ids in ``category``, best rank score first
+
+    Returns the top ``limit`` plus any vendor within ``tie_margin`` of the
+    last one, so near-ties are never cut arbitrarily. The answer is cached
+    until the next refresh that recomputes a scorecard.
+    """
+    key = (category, limit, tie_margin)
+    cached = category_ranking_cache.get(key)
+    if cached is not None and cached[0][0] == state.refreshed_at:
+        return cached[0][1]
+
+    ranked = db.query(VendorCategory.vendor_id, VendorCategory.rank_score).filter(
+        VendorCategory.category == category,
+        VendorCategory.is_active == True
+    ).order_by(VendorCategory.rank_score.desc(), VendorCategory.vendor_id.desc())
+    rows = ranked.limit(limit).all()
+    if len(rows) == limit and rows[-1].rank_score is not None:
+        rows = ranked.filter(VendorCategory.rank_score >= rows[-1].rank_score - tie_margin).all()
+
+    vendor_ids = [row.vendor_id for row in rows]
+    category_ranking_cache.set(key, (state.refreshed_at, vendor_ids))
+    return vendor_ids
+
+
+if __name__ == "__main__":
+    from app.models.database import init_db
+
+    init_db()
+    with SessionLocal() as session:
+        refreshed = refresh_supplier_scorecards(session)
+        print(f"Scorecards as of {refreshed.as_of}, refreshed at {refreshed.refreshed_at}")
@@ -0,0 +1,231 @@
+"""
+Denormalized transaction timelines
+
+Each ProcurementTransaction's timeline (request intake, sourcing,
+contracting, PR and PO creation, payment) is materialized as
+TransactionStage rows with the document fields the timeline shows, so any
+number of timelines are served from one IN query instead of up to seven
+lookups per transaction. The store follows the process event log: new
+transactions by id watermark, and rebuilds for transactions whose
+``updated_at`` moved, which ORM edits to their documents trigger through
+app.services.change_tracking.
+"""
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session, aliased
+
+from app.models.database import (
+    Contract, Invoice, ProcurementTransaction, PurchaseOrder, PurchaseRequisition,
+    SourcingRequest, TransactionStage, TransactionStageState
+)
+from app.services.change_tracking import claim_transaction_delta
+
+BUILD_CHUNK_SIZE = 2000
+
+
+def _days(start: Optional[datetime], end: Optional[datetime]) -> Optional[int]:
+    return (end - start).days if start and end else None
+
+
+def _stage(stage, stage_name, start, end, status, source_system, details) -> dict:
+    return {
+        "stage": stage,
+        "stage_name": stage_name,
+        "start_date": start,
+        "end_date": end,
+        "duration_days": _days(start, end),
+        "status": status,
+        "source_system": source_system,
+        "details": details,
+    }
+
+
+def build_timeline(txn, sr, contract, pr, po, invoice) -> List[dict]:
+    """Timeline stages for one transaction from its source documents"""
+    stages = []
+
+    # Request Intake and Sourcing (SAP Ariba)
+    if sr:
+        stages.append(_stage(
+            "request_intake", "Request Intake", sr.request_submitted_date, sr.request_approved_date,
+            "completed" if sr.request_approved_date else "in_progress", "SAP Ariba",
+            {"ariba_id": sr.ariba_id, "requirement": sr.requirement_description,
+             "estimated_value": sr.estimated_value}
+        ))
+        if sr.sourcing_event_start:
+            stages.append(_stage(
+                "sourcing", "Sourcing", sr.sourcing_event_start, sr.award_decision_date,
+                "completed" if sr.award_decision_date else "in_progress", "SAP Ariba",
+                {"category": sr.category, "subcategory": sr.subcategory}
+            ))
+
+    # Contracting (Simplicontract)
+    if contract:
+        stages.append(_stage(
+            "contracting", "Contracting", contract.contract_drafted_date, contract.contract_executed_date,
+            "completed" if contract.contract_executed_date else "in_progress", "Simplicontract",
+            {"contract_id": contract.contract_id, "contract_type": contract.contract_type,
+             "contract_value": contract.contract_value, "payment_terms": contract.payment_terms}
+        ))
+
+    # PR/PO Creation (Oracle Fusion)
+    if txn.po_id:
+        if pr:
+            stages.append(_stage(
+                "pr_creation", "PR Creation", pr.pr_created_date, pr.pr_approved_date,
+                "completed", "Oracle Fusion",
+                {"pr_number": pr.pr_number, "business_unit": pr.business_unit}
+            ))
+        if po:
+            stages.append(_stage(
+                "po_creation", "PO Creation", po.po_created_date, po.po_sent_to_vendor_date,
+                "completed" if po.po_sent_to_vendor_date else "in_progress", "Oracle Fusion",
+                {"po_number": po.po_number, "total_amount": po.total_amount, "category": po.category}
+            ))
+
+    # Payment (Oracle EBS)
+    if invoice:
+        stages.append(_stage(
+            "payment", "Payment", invoice.invoice_received_date, invoice.payment_date,
+            (invoice.payment_status or "unknown").lower(), "Oracle EBS",
+            {"invoice_number": invoice.invoice_number, "invoice_amount": invoice.invoice_amount,
+             "total_amount": invoice.total_amount, "payment_method": invoice.payment_method}
+        ))
+
+    return stages
+
+
+def _write_stages(db: Session, condition) -> None:
+    sr, contract, pr, po, invoice = (
+        aliased(SourcingRequest), aliased(Contract), aliased(PurchaseRequisition),
+        aliased(PurchaseOrder), aliased(Invoice)
+    )
+    txn = ProcurementTransaction
+    query = select(txn, sr, contract, pr, po, invoice).outerjoin(
+        sr, sr.id == txn.sourcing_request_id
+    ).outerjoin(
+        contract, contract.id == txn.contract_id
+    ).outerjoin(
+        pr, pr.id == txn.pr_id
+    ).outerjoin(
+        po, po.id == txn.po_id
+    ).outerjoin(
+        invoice, invoice.id == txn.invoice_id
+    ).where(condition)
+
+    rows = []
+    for documents in db.execute(query):
+        for sequence, stage in enumerate(build_timeline(*documents)):
+            stage["transaction_id"] = documents[0].id
+            stage["sequence"] = sequence
+            stage["details"] = json.dumps(stage["details"])
+            rows.append(stage)
+    if rows:
+        db.execute(insert(TransactionStage), rows)
+
+
+def _rebuild_ids(db: Session, transaction_ids: List[int]) -> None:
+    for start in range(0, len(transaction_ids), BUILD_CHUNK_SIZE):
+        chunk = transaction_ids[start:start + BUILD_CHUNK_SIZE]
+        db.execute(delete(TransactionStage).where(TransactionStage.transaction_id.in_(chunk)))
+        _write_stages(db, ProcurementTransaction.id.in_(chunk))
+
+
+def refresh_timeline_store(db: Session) -> TransactionStageState:
+    """Add new transactions to the store and rebuild updated ones
+
+    Costs a MAX(id) and MAX(updated_at) lookup when nothing has changed.
+    """
+    delta = claim_transaction_delta(db, TransactionStageState)
+    if delta is not None:
+        if not delta.low_id:
+            db.execute(delete(TransactionStage))
+        _rebuild_ids(db, delta.updated_ids)
+        for start in range(delta.low_id, delta.high_id, BUILD_CHUNK_SIZE):
+            _write_stages(db, (ProcurementTransaction.id > start) &
+                          (ProcurementTransaction.id <= min(start + BUILD_CHUNK_SIZE, delta.high_id)))
+        db.commit()
+    return db.query(TransactionStageState).filter(TransactionStageState.id == 1).one()
+
+
+def rebuild_timeline_store(db: Session, transaction_ids: Optional[Iterable[int]] = None) -> TransactionStageState:
+    """Rebuild the timelines of ``transaction_ids``, or the whole store when None"""
+    state = db.query(TransactionStageState).filter(TransactionStageState.id == 1).first()
+    if transaction_ids is None or state is None:
+        if state is not None:
+            state.last_transaction_id = 0
+            db.commit()
+        return refresh_timeline_store(db)
+
+    _rebuild_ids(db, sorted(set(transaction_ids)))
+    state = db.query(TransactionStageState).filter(TransactionStageState.id == 1).one()
+    state.version = (state.version or 0) + 1
+    state.refreshed_at = datetime.utcnow()
+    db.commit()
+    return state
+
+
+def load_stages(db: Session, transaction_ids: Iterable[int]) -> Dict[int, list]:
+    """Stored stage rows for many transactions with one IN query, in timeline order"""
+    stages: Dict[int, list] = {}
+    ids = list(set(transaction_ids))
+    if not ids:
+        return stages
+    rows = db.execute(select(
+        TransactionStage.transaction_id, TransactionStage.stage, TransactionStage.stage_name,
+        TransactionStage.start_date, TransactionStage.end_date, TransactionStage.duration_days,
+        TransactionStage.status, TransactionStage.source_system, TransactionStage.details
+    ).where(TransactionStage.transaction_id.in_(ids)).order_by(
+        TransactionStage.transaction_id, TransactionStage.sequence
+    ))
+    for row in rows:
+        stages.setdefault(row.transaction_id, []).append(row)
+    return stages
+
+
+def timeline_payload(txn: ProcurementTransaction, stages: list, vendor) -> dict:
+    """Response body of the timeline endpoints"""
+    timeline = []
+    total_value = 0
+    for stage in stages:
+        details = json.loads(stage.details) if stage.details else {}
+        if stage.stage == "payment":
+            total_value = details.get("total_amount")
+        timeline.append({
+            "stage": stage.stage,
+            "stage_name": stage.stage_name,
+            "start_date": stage.start_date.isoformat() if stage.start_date else None,
+            "end_date": stage.end_date.isoformat() if stage.end_date else None,
+            "duration_days": stage.duration_days,
+            "status": stage.status,
+            "source_system": stage.source_system,
+            "details": details
+        })
+
+    return {
+        "transaction_id": txn.transaction_id,
+        "vendor_name": vendor.vendor_name if vendor else "Unknown",
+        "total_value": total_value,
+        "currency": "INR",
+        "current_stage": txn.current_stage,
+        "total_cycle_time_days": txn.total_cycle_time_days,
+        "has_bottleneck": txn.has_bottleneck,
+        "bottleneck_stage": txn.bottleneck_stage,
+        "has_control_gap": txn.has_control_gap,
+        "control_gap_description": txn.control_gap_description,
+        "compliance_score": txn.compliance_score,
+        "timeline": timeline
+    }
+
+
+def timeline_freshness(state: TransactionStageState) -> dict:
+    """Watermark block included in timeline responses"""
+    return {
+        "source": "transaction_stages",
+        "last_transaction_id": state.last_transaction_id,
+        "version": state.version,
+        "refreshed_at": state.refreshed_at.isoformat() if state.refreshed_at else None
+    }
@@ -0,0 +1,146 @@
+"""
+HTTP Load Test
+Drives the hot read endpoints with N concurrent clients and reports throughput
+and latency percentiles per endpoint.
+
+Starts a local uvicorn server against the configured DATABASE_URL unless --url
+points at one that is already running.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --concurrency 200 --duration 15
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 50 200 400
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+HOT_ENDPOINTS = [
+    "/api/stats",
+    "/api/lifecycle/transactions",
+    "/api/analytics/spend/overview",
+    "/api/leakage/dashboard",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/api/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become healthy within {timeout}s")
+
+
+async def run_load(base_url: str, path: str, concurrency: int, duration: float) -> dict:
+    """Hammer one endpoint from ``concurrency`` clients for ``duration`` seconds"""
+    latencies = []
+    errors = 0
+    first_error = None
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        # One untimed request so one-off work (e.g. a cube refresh) is not measured
+        await client.get(path)
+        deadline = time.monotonic() + duration
+
+        async def worker():
+            nonlocal errors, first_error
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                        first_error = first_error or f"HTTP {response.status_code}"
+                        continue
+                except httpx.HTTPError as e:
+                    errors += 1
+                    first_error = first_error or repr(e)
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "first_error": first_error,
+        "rps": len(latencies) / elapsed if elapsed else 0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0
+    }
+
+
+async def run(args) -> None:
+    base_url = args.url
+    server = None
+    if base_url is None:
+        port = _free_port()
+        server = start_server(port, args.workers)
+        base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        await wait_until_healthy(base_url)
+        print(f"{'endpoint':<34} {'clients':>7} {'requests':>9} {'errors':>6} "
+              f"{'req/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8}")
+        for concurrency in args.concurrency:
+            for path in args.endpoints:
+                result = await run_load(base_url, path, concurrency, args.duration)
+                print(f"{path:<34} {concurrency:>7} {result['requests']:>9} {result['errors']:>6} "
+                      f"{result['rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+                      f"{result['p99_ms']:>8.1f}")
+                if result["first_error"]:
+                    print(f"  first error: {result['first_error']}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Target an already running server instead of starting one")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[200])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per endpoint and concurrency level")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local server")
+    parser.add_argument("--endpoints", nargs="+", default=HOT_ENDPOINTS)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
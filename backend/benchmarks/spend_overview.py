@@ -0,0 +1,150 @@
+"""
+Spend Overview Benchmark
+Compares the SQL GROUP BY implementation of /api/analytics/spend/overview
+against the previous load-everything implementation for latency and peak memory.
+
+Usage (from backend/):
+    python -m benchmarks.spend_overview --rows 10000 1000000 10000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.models.database import Base, SpendRecord, Vendor
+from app.routers.analytics import get_spend_overview, CATEGORIES
+from app.services.spend_cube import refresh_spend_cube
+
+BUSINESS_UNITS = ["E-commerce", "Logistics", "Corporate", "Technology", "Marketing", "Finance", "HR"]
+VENDOR_COUNT = 500
+BATCH_SIZE = 50000
+
+
+def legacy_spend_overview(db):
+    """Previous implementation, kept here as the comparison baseline"""
+    records = db.query(SpendRecord).all()
+    total_spend = sum(r.amount for r in records)
+
+    category_spend = {}
+    for record in records:
+        category_spend[record.category] = category_spend.get(record.category, 0) + record.amount
+
+    bu_spend = {}
+    for record in records:
+        bu_spend[record.business_unit] = bu_spend.get(record.business_unit, 0) + record.amount
+
+    vendor_spend = {}
+    for record in records:
+        vid = record.vendor_id
+        if vid not in vendor_spend:
+            vendor = db.query(Vendor).filter(Vendor.id == vid).first()
+            vendor_spend[vid] = {
+                "vendor_id": vid,
+                "vendor_name": vendor.vendor_name if vendor else "Unknown",
+                "amount": 0
+            }
+        vendor_spend[vid]["amount"] += record.amount
+    top_vendors = sorted(vendor_spend.values(), key=lambda x: x["amount"], reverse=True)[:10]
+
+    monthly_trend = {}
+    for record in records:
+        month_key = record.spend_date.strftime("%Y-%m") if record.spend_date else "Unknown"
+        monthly_trend[month_key] = monthly_trend.get(month_key, 0) + record.amount
+
+    return total_spend, category_spend, bu_spend, top_vendors, monthly_trend
+
+
+def build_database(path: str, rows: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(rows)
+    categories = list(CATEGORIES.keys())
+    start = datetime(2023, 1, 1)
+
+    with engine.begin() as conn:
+        conn.execute(insert(Vendor), [
+            {"id": i, "vendor_code": f"VND{str(i).zfill(5)}", "vendor_name": f"Vendor {i}", "is_active": True}
+            for i in range(1, VENDOR_COUNT + 1)
+        ])
+        for offset in range(0, rows, BATCH_SIZE):
+            batch = []
+            for _ in range(min(BATCH_SIZE, rows - offset)):
+                category = rng.choice(categories)
+                batch.append({
+                    "vendor_id": rng.randint(1, VENDOR_COUNT),
+                    "category": category,
+                    "subcategory": rng.choice(CATEGORIES[category]),
+                    "business_unit": rng.choice(BUSINESS_UNITS),
+                    "amount": round(rng.uniform(1000, 500000), 2),
+                    "spend_date": start + timedelta(days=rng.randint(0, 730)),
+                    "fiscal_year": "FY23-24",
+                })
+            conn.execute(insert(SpendRecord), batch)
+    return engine
+
+
+def measure(fn):
+    started = time.perf_counter()
+    fn()
+    latency = time.perf_counter() - started
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latency, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000, 10000000])
+    parser.add_argument("--skip-legacy-above", type=int, default=None,
+                        help="Skip the legacy run for datasets larger than this many rows")
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'impl':>8} {'latency_s':>10} {'peak_mb':>10}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            engine = build_database(path, rows)
+            Session = sessionmaker(bind=engine)
+            # Build the cube up front so the timings below are steady-state reads
+            with Session() as db:
+                refresh_spend_cube(db)
+            # NullPool: each asyncio.run() below gets its own event loop
+            async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+            AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+            async def overview():
+                async with AsyncSession() as db:
+                    await get_spend_overview(db=db, fiscal_year=None, business_unit=None)
+
+            def run_sql():
+                asyncio.run(overview())
+
+            def run_legacy():
+                with Session() as db:
+                    legacy_spend_overview(db)
+
+            impls = [("sql", run_sql)]
+            if args.skip_legacy_above is None or rows <= args.skip_legacy_above:
+                impls.append(("legacy", run_legacy))
+
+            for name, fn in impls:
+                latency, peak = measure(fn)
+                print(f"{rows:>12} {name:>8} {latency:>10.3f} {peak / 1024 / 1024:>10.1f}")
+            engine.dispose()
+            asyncio.run(async_engine.dispose())
+
+
+if __name__ == "__main__":
+    main()
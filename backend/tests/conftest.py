@@ -0,0 +1,42 @@
+"""
+Shared fixtures: one seeded SQLite database per test session
+
+DATABASE_URL points at a temporary file before any app module is imported,
+so the tests never touch procurement.db. Run from backend/ with:
+    python -m pytest -q
+"""
+import os
+import random
+import shutil
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="procurement-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'procurement.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from app.data.mock_data_generator import fake, seed_database  # noqa: E402
+from app.models.database import SessionLocal, engine, init_db  # noqa: E402
+
+SEED = 1234
+
+
+@pytest.fixture(scope="session")
+def seeded_db():
+    random.seed(SEED)
+    fake.seed_instance(SEED)
+    init_db()
+    with SessionLocal() as session:
+        seed_database(session)
+    yield engine
+    engine.dispose()
+    shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db(seeded_db):
+    """A session whose changes are rolled back after the test"""
+    with SessionLocal() as session:
+        yield session
+        session.rollback()
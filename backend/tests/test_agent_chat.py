@@ -0,0 +1,51 @@
+"""
+The agent's question flow stores each answer and moves on to the next question
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers.agent import CATEGORY_QUESTIONS
+
+
+@pytest.fixture
+def client(seeded_db):
+    return TestClient(app)
+
+
+def test_laptop_flow_stores_answers_in_order(client):
+    questions = CATEGORY_QUESTIONS["laptops"]
+    first = client.post("/api/agent/chat", json={"message": "I need laptops for the new Pune team"}).json()
+    session_id = first["session_id"]
+    assert first["next_prompt"] == questions[0]["question"]
+
+    answers = ["14 inch", "i7", "16GB", "512GB SSD", "any brand", "40 units", "by 1 Dec 2026", "30 lakh"]
+    for number, answer in enumerate(answers, 1):
+        reply = client.post("/api/agent/chat", json={"message": answer, "session_id": session_id}).json()
+        if number < len(questions):
+            assert reply["next_prompt"] == questions[number]["question"]
+            assert not reply["requirements_complete"]
+
+    assert reply["requirements_complete"] and reply["rfq_ready"]
+    assert reply["next_prompt"] is None
+    assert len(reply["suggested_vendors"]) >= 3
+
+    fields = client.get(f"/api/agent/conversations/{session_id}").json()["requirements"]["fields"]
+    assert list(fields) == [q["field"] for q in questions]
+    assert fields["screen_size"] == "14 inch"
+    assert fields["processor"] == "i7"
+    assert fields["quantity"] == "40"
+    assert fields["budget"] == "3000000"
+
+
+def test_reply_after_the_summary_keeps_the_answers(client):
+    session_id = client.post("/api/agent/chat", json={"message": "We need office supplies"}).json()["session_id"]
+    answers = ["notebooks and pens", "25", "Standard", "next week", "50000"]
+    for answer in answers:
+        client.post("/api/agent/chat", json={"message": answer, "session_id": session_id})
+
+    again = client.post("/api/agent/chat", json={"message": "thanks", "session_id": session_id}).json()
+    fields = client.get(f"/api/agent/conversations/{session_id}").json()["requirements"]["fields"]
+    assert again["requirements_complete"]
+    assert fields["items"] == "notebooks and pens"
+    assert "thanks" not in fields.values()
@@ -0,0 +1,40 @@
+"""
+Anomaly detection reads a consistent snapshot of the process-wide spend columns
+"""
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import anomaly_engine
+from app.services.anomaly_engine import SpendColumns, detect_anomalies, load_spend_columns
+
+ARRAYS = ("ids", "amount", "vendor", "category", "month", "maverick")
+
+
+def test_snapshot_is_unchanged_by_a_concurrent_append(db):
+    snapshot = load_spend_columns(db)
+    try:
+        with anomaly_engine._columns_lock:
+            anomaly_engine._columns.append([(snapshot.last_id + 1, 10.0, 1, "New Category", "2026-10", False)])
+
+        assert {len(getattr(snapshot, name)) for name in ARRAYS} == {len(snapshot.ids)}
+        assert "New Category" not in snapshot.labels["category"]
+        assert len(anomaly_engine._columns.snapshot().ids) == len(snapshot.ids) + 1
+    finally:
+        with anomaly_engine._columns_lock:
+            anomaly_engine._columns = SpendColumns()  # Reload from the table on next use
+
+
+def test_detect_anomalies_on_a_fresh_load(db):
+    result = detect_anomalies(db, limit=10)
+    snapshot = load_spend_columns(db)
+    assert len(result["page"]) <= 10
+    assert set(record_id for record_id, _, _ in result["page"]) <= set(snapshot.ids.tolist())
+
+
+def test_anomaly_page_bounds_are_validated(seeded_db):
+    client = TestClient(app)
+    assert client.get("/api/analytics/spend/anomalies", params={"limit": 0}).status_code == 422
+    assert client.get("/api/analytics/spend/anomalies", params={"limit": 501}).status_code == 422
+    assert client.get("/api/analytics/spend/anomalies", params={"skip": -1}).status_code == 422
+    page = client.get("/api/analytics/spend/anomalies", params={"limit": 5}).json()
+    assert len(page["anomalies"]) <= 5
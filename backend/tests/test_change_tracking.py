@@ -0,0 +1,25 @@
+"""
+Stores fed by claim_transaction_delta survive a concurrent first refresh
+"""
+import pytest
+from sqlalchemy import event
+
+from app.models.database import ProcessEventLogState, SessionLocal, TransactionStageState
+from app.services.change_tracking import claim_transaction_delta
+
+
+@pytest.mark.parametrize("state_model", [TransactionStageState, ProcessEventLogState])
+def test_first_claim_rereads_a_state_row_created_concurrently(db, state_model):
+    db.query(state_model).delete()
+    db.commit()
+
+    def create_elsewhere(session, flush_context, instances):
+        with SessionLocal() as other:
+            other.add(state_model(id=1, last_transaction_id=0, version=0))
+            other.commit()
+    event.listen(db, "before_flush", create_elsewhere, once=True)
+
+    delta = claim_transaction_delta(db, state_model)
+    assert delta is not None and delta.low_id == 0 and delta.high_id > 0
+    db.rollback()
+    assert db.query(state_model).filter(state_model.id == 1).one().version == 0
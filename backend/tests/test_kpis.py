@@ -0,0 +1,88 @@
+"""
+GET /api/lifecycle/kpis serves stored snapshots and never rescans in the request
+"""
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.database import KPIMetric, KPIRollupState, SessionLocal
+from app.services import kpi_engine
+
+
+@pytest.fixture
+def client(seeded_db):
+    with SessionLocal() as session:
+        session.query(KPIMetric).filter(KPIMetric.dimension.in_(("overall", "stage"))).delete()
+        session.query(KPIRollupState).delete()
+        session.commit()
+    return TestClient(app)
+
+
+def test_first_read_rolls_up_in_the_request(client, monkeypatch):
+    queued = []
+    monkeypatch.setattr("app.routers.lifecycle.run_queued_rollup", queued.append)
+
+    first = client.get("/api/lifecycle/kpis").json()
+    assert first["freshness"]["stale"] is False
+    assert first["freshness"]["rolled_up_at"] is not None
+    assert first["total_transactions"] > 0
+    assert any(item["value"] for item in first["summary"])
+    assert queued == []
+
+
+def test_stale_snapshot_queues_a_background_rollup(client, monkeypatch):
+    queued = []
+    monkeypatch.setattr("app.routers.lifecycle.run_queued_rollup", queued.append)
+    with SessionLocal() as session:
+        kpi_engine.rollup_kpis(session, "monthly", force=True)
+        session.query(KPIRollupState).update({KPIRollupState.rolled_up_at: datetime(2000, 1, 1)})
+        session.commit()
+
+    try:
+        body = client.get("/api/lifecycle/kpis").json()
+    finally:
+        kpi_engine.run_queued_rollup("monthly")  # Releases the process's reservation
+
+    assert body["freshness"]["stale"] is True
+    assert body["total_transactions"] > 0
+    assert queued == ["monthly"]
+
+
+@pytest.mark.parametrize("window", ["day", "month", "quarter"])
+def test_snapshot_matches_a_full_rescan(client, monkeypatch, window):
+    with SessionLocal() as session:
+        kpi_engine.rollup_kpis(session, kpi_engine.WINDOWS[window], force=True)
+        sums = kpi_engine.compute_kpis(session)["all"]
+    values, stages = kpi_engine.kpi_values(sums)
+
+    def rescan(*args, **kwargs):
+        raise AssertionError("GET /kpis must not rescan the source tables")
+    monkeypatch.setattr(kpi_engine, "compute_kpis", rescan)
+
+    body = client.get("/api/lifecycle/kpis", params={"window": window}).json()
+    assert body["freshness"]["stale"] is False
+    assert body["total_transactions"] == sums["transactions"]
+    assert {item["metric_name"]: item["value"] for item in body["summary"]} == {
+        metric: round(value or 0, 1) for metric, value in values.items()
+    }
+    assert body["stage_cycle_times"] == {label: round(days, 1) for label, days in stages.items()}
+
+
+def test_stale_snapshot_is_served_while_one_rollup_is_queued(client):
+    with SessionLocal() as session:
+        kpi_engine.rollup_kpis(session, "monthly", force=True)
+        session.query(KPIRollupState).update({KPIRollupState.rolled_up_at: datetime(2000, 1, 1)})
+        session.commit()
+    assert kpi_engine.queue_rollup("monthly")  # A rollup already pending in this process
+
+    try:
+        body = client.get("/api/lifecycle/kpis").json()
+    finally:
+        kpi_engine.run_queued_rollup("monthly")
+
+    assert body["freshness"]["stale"] is True
+    assert body["total_transactions"] > 0
+    assert kpi_engine.queue_rollup("monthly")
+    kpi_engine.run_queued_rollup("monthly")
@@ -0,0 +1,111 @@
+"""
+The hot router and service queries must be index lookups, not table scans
+
+Each statement below mirrors a filter from the routers or the engines behind
+them. SQLite's EXPLAIN QUERY PLAN has to report ``SEARCH <table> USING ...
+INDEX`` for it and no ``SCAN`` of that table, so dropping or renaming one of
+the migration indexes fails here.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import and_, inspect, select, text
+
+from app.models.database import (
+    Contract, Invoice, InvoiceLineItem, KPIMetric, LeakageCase, POLineItem,
+    ProcurementTransaction, SpendRecord, SupplierBid,
+)
+from app.models.migrations import (
+    FK_AND_FILTER_INDEXES, KPI_SNAPSHOT_INDEXES, TRANSACTION_UPDATED_AT_INDEXES, run_migrations,
+)
+
+SINCE = datetime(2024, 1, 1)
+UNTIL = SINCE + timedelta(days=90)
+
+HOT_QUERIES = {
+    # leakage: case list filtered by status, and the new-case window
+    "leakage_cases_by_status": (
+        "leakage_cases", select(LeakageCase.id).where(LeakageCase.status == "Open")),
+    "leakage_cases_by_created_at": (
+        "leakage_cases", select(LeakageCase.id).where(LeakageCase.created_at.between(SINCE, UNTIL))),
+    # audit_engine: de-duplicating findings against existing cases
+    "leakage_cases_existing_findings": (
+        "leakage_cases", select(LeakageCase.invoice_id, LeakageCase.leakage_type).where(
+            LeakageCase.invoice_id.in_([1, 2, 3]),
+            LeakageCase.leakage_type.in_(["Price Variance", "Duplicate Payment"]))),
+    # leakage case detail: invoice and PO line items
+    "invoice_line_items_by_invoice": (
+        "invoice_line_items", select(InvoiceLineItem.id).where(InvoiceLineItem.invoice_id == 1)),
+    "po_line_items_by_po": (
+        "po_line_items", select(POLineItem.id).where(POLineItem.po_id == 1)),
+    # audit_engine: invoices paid in the scan window
+    "invoices_by_payment_date": (
+        "invoices", select(Invoice.id).where(Invoice.payment_date.between(SINCE, UNTIL))),
+    # lifecycle: bottleneck and control-gap lists
+    "transactions_with_bottleneck": (
+        "procurement_transactions",
+        select(ProcurementTransaction.id).where(ProcurementTransaction.has_bottleneck == True)),  # noqa: E712
+    "transactions_with_control_gap": (
+        "procurement_transactions",
+        select(ProcurementTransaction.id).where(ProcurementTransaction.has_control_gap == True)),  # noqa: E712
+    # change_tracking: transactions updated since the watermark
+    "transactions_updated_since": (
+        "procurement_transactions",
+        select(ProcurementTransaction.id).where(ProcurementTransaction.updated_at > SINCE)),
+    # analytics: spend by category and by fiscal year
+    "spend_by_category": (
+        "spend_records", select(SpendRecord.amount).where(SpendRecord.category == "IT Hardware")),
+    "spend_by_fiscal_year": (
+        "spend_records", select(SpendRecord.amount).where(SpendRecord.fiscal_year == "FY24-25")),
+    "spend_by_vendor": (
+        "spend_records", select(SpendRecord.amount).where(SpendRecord.vendor_id == 1)),
+    # contracts: expiring in the next window
+    "contracts_by_end_date": (
+        "contracts", select(Contract.id).where(Contract.end_date.between(SINCE, UNTIL))),
+    # agent: bids for one RFQ
+    "bids_by_rfq": (
+        "supplier_bids", select(SupplierBid.id).where(SupplierBid.sourcing_request_id == 1)),
+    # kpi_engine: the current period's snapshots
+    "kpi_snapshots_for_period": (
+        "kpi_metrics", select(KPIMetric.metric_value).where(and_(
+            KPIMetric.metric_name.in_(["cycle_time_days", "touchless_rate"]),
+            KPIMetric.dimension == "overall",
+            KPIMetric.period == "monthly",
+            KPIMetric.period_date == SINCE,
+        ))),
+}
+
+
+def query_plan(engine, statement) -> list:
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.construct_params()
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {compiled}", tuple(params[name] for name in compiled.positiontup)
+        ).all()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(seeded_db, name):
+    table, statement = HOT_QUERIES[name]
+    plan = query_plan(seeded_db, statement)
+
+    assert any(step.startswith(f"SEARCH {table} USING") and "INDEX" in step for step in plan), plan
+    assert not any(step.startswith(f"SCAN {table}") for step in plan), plan
+
+
+def test_migrations_recreate_dropped_indexes(seeded_db):
+    """Migrations 1-3 build their fixed index lists on a database that lacks them"""
+    indexes = FK_AND_FILTER_INDEXES + TRANSACTION_UPDATED_AT_INDEXES + KPI_SNAPSHOT_INDEXES
+    with seeded_db.begin() as conn:
+        for name, _, _ in indexes:
+            conn.execute(text(f"DROP INDEX {name}"))
+        conn.execute(text("DELETE FROM schema_migrations WHERE version IN (1, 2, 3)"))
+
+    assert run_migrations(seeded_db) == [1, 2, 3]
+
+    inspector = inspect(seeded_db)
+    for name, table, columns in indexes:
+        built = {ix["name"]: ", ".join(ix["column_names"]) for ix in inspector.get_indexes(table)}
+        assert built.get(name) == columns
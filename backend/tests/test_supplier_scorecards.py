@@ -0,0 +1,90 @@
+"""
+Concurrent scorecard refreshes claim the state row; the daily recompute runs off the request
+"""
+from datetime import date, datetime
+
+from fastapi import BackgroundTasks
+from sqlalchemy import event, update
+
+from app.models.database import SessionLocal, SupplierScorecard, SupplierScorecardState, VendorCategory
+from app.services import supplier_scorecards
+from app.services.cache import category_ranking_cache
+from app.services.supplier_scorecards import (
+    category_ranking, mark_scorecards_stale, refresh_supplier_scorecards, run_daily_recompute,
+)
+
+
+def test_refresh_that_loses_the_claim_does_not_recompute(db, monkeypatch):
+    refresh_supplier_scorecards(db)
+    vendor_id = db.query(SupplierScorecard.vendor_id).first()[0]
+    mark_scorecards_stale(db, [vendor_id])
+    db.commit()
+
+    recomputed = []
+    monkeypatch.setattr(supplier_scorecards, "_recompute", lambda *args: recomputed.append(args))
+    get_state = supplier_scorecards._get_state
+    raced = []
+
+    def racing_get_state(session):
+        state = get_state(session)
+        if not raced:
+            # Another worker claims the version between our read and our claim
+            raced.append(True)
+            session.execute(update(SupplierScorecardState).values(
+                version=SupplierScorecardState.version + 1
+            ).execution_options(synchronize_session=False))
+        return state
+    monkeypatch.setattr(supplier_scorecards, "_get_state", racing_get_state)
+
+    refresh_supplier_scorecards(db)
+    assert raced and not recomputed
+
+
+def test_concurrent_first_refresh_rereads_the_state_row(db):
+    db.query(SupplierScorecardState).delete()
+    db.commit()
+
+    def create_elsewhere(session, flush_context, instances):
+        with SessionLocal() as other:
+            other.add(SupplierScorecardState(id=1, version=0))
+            other.commit()
+    event.listen(db, "before_flush", create_elsewhere, once=True)
+
+    state = supplier_scorecards._get_state(db)
+    assert state.id == 1
+    db.commit()
+    assert refresh_supplier_scorecards(db).as_of == date.today().isoformat()
+
+
+def test_daily_recompute_runs_after_the_response(db):
+    state = refresh_supplier_scorecards(db)
+    state.as_of = "2000-01-01"
+    db.commit()
+
+    tasks = BackgroundTasks()
+    assert refresh_supplier_scorecards(db, tasks).as_of == "2000-01-01"
+    assert [task.func for task in tasks.tasks] == [run_daily_recompute]
+
+    again = BackgroundTasks()
+    refresh_supplier_scorecards(db, again)
+    assert not again.tasks  # Already queued in this process
+
+    run_daily_recompute()
+    db.expire_all()
+    assert refresh_supplier_scorecards(db, BackgroundTasks()).as_of == date.today().isoformat()
+
+
+def test_category_ranking_keeps_one_entry_per_query(db):
+    category_ranking_cache.invalidate()
+    state = refresh_supplier_scorecards(db)
+    category = db.query(VendorCategory.category).first()[0]
+    first = category_ranking(db, state, category)
+
+    state.refreshed_at = datetime(2000, 1, 1)  # As if another refresh had run
+    db.query(VendorCategory).filter(VendorCategory.category == category).update(
+        {VendorCategory.is_active: False}, synchronize_session=False
+    )
+    assert first and category_ranking(db, state, category) == []
+    assert list(category_ranking_cache._entries) == [(category, 5, 0.1)]
+    db.rollback()
+    category_ranking_cache.invalidate()